@@ -3,4 +3,16 @@
 poetry run python manage.py collectstatic --noinput
 poetry run python manage.py migrate --no-input
 poetry run python superuser_creation.py
-poetry run gunicorn -b :8003 settings.wsgi
\ No newline at end of file
+# Sends the queued notifications outside of the web requests
+poetry run python manage.py process_outbox --daemon &
+# Generates the label sheets requested from the administration
+poetry run python manage.py process_label_jobs --daemon &
+# Moves the old trips out of the table read by every page, once a day
+poetry run python manage.py archive_trips --daemon &
+if [ "${DJANGO_SERVER:-wsgi}" = "asgi" ]; then
+    # Async workers serve the public vehicle pages with the async views
+    export DJANGO_ASYNC_VIEWS=1
+    poetry run gunicorn -b :8003 -k uvicorn_worker.UvicornWorker settings.asgi
+else
+    poetry run gunicorn -b :8003 settings.wsgi
+fi
@@ -1,27 +1,115 @@
 from __future__ import annotations
 
-from django.contrib import admin
+import csv
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count
 from django.db.models.query import QuerySet
-from django.http import HttpRequest
-from django.shortcuts import render
-from django.urls import reverse
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+)
+from django.shortcuts import get_object_or_404, render
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.translation import gettext as _
 
-from main.models import Defect, FuelExpense, Location, Setting, Trip, Vehicle
+from main import consumption, exports, qr_codes, usage
+from main.forms import ExportForm, PeriodForm, UsageDashboardForm
+from main.models import (
+    ApiToken,
+    Defect,
+    FuelExpense,
+    LabelSheetJob,
+    Location,
+    Notification,
+    Setting,
+    Trip,
+    TripHistory,
+    Vehicle,
+)
+from main.routers import use_replica
+
+
+class ReplicaChangeListMixin:
+    """
+    Reads the list from the replica database, if any, except just after a
+    change: its message would be shown with a list not updated yet.
+    """
+
+    def changelist_view(self, request: HttpRequest, extra_context=None):
+        if request.method != "GET" or len(messages.get_messages(request)):
+            return super().changelist_view(request, extra_context)
+
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # The results are queried when the template is rendered
+            if isinstance(response, TemplateResponse):
+                response.render()
+
+        return response
+
+
+class CsvExportMixin:
+    """
+    Streams the rows as CSV, either those selected with the action or those
+    of the export URL, filtered by its start, end and vehicle parameters.
+    """
+
+    export: exports.Export
+    actions = ["export_csv"]
+    change_list_template = "admin/main/export_change_list.html"
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "export/",
+                self.admin_site.admin_view(self.export_view),
+                name=f"{opts.app_label}_{opts.model_name}_export",
+            ),
+            *super().get_urls(),
+        ]
+
+    @admin.action(description=_("Exporter en CSV"))
+    def export_csv(self, request: HttpRequest, queryset: QuerySet):
+        return self.export.stream(queryset)
+
+    def export_view(self, request: HttpRequest):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
 
+        form = ExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
 
-@admin.display(description=_("Nombre de véhicules"))
+        return self.export.stream(
+            self.export.filter(self.export.model.objects.all(), **form.cleaned_data)
+        )
+
+
+@admin.display(description=_("Nombre de véhicules"), ordering="vehicle_total")
 def vehicle_count(obj: Location):
-    return obj.vehicle_set.count()
+    return obj.vehicle_total
 
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     list_display = ["name", vehicle_count]
 
+    def get_queryset(self, request: HttpRequest):
+        return super().get_queryset(request).annotate(vehicle_total=Count("vehicle"))
+
 
 @admin.register(Trip)
-class TripAdmin(admin.ModelAdmin):
+class TripAdmin(CsvExportMixin, ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = [
         "vehicle",
         "starting_time",
@@ -35,6 +123,64 @@ class TripAdmin(admin.ModelAdmin):
         "finished",
     ]
     list_filter = ["vehicle", "starting_time"]
+    export = exports.TRIPS
+
+    def delete_queryset(self, request: HttpRequest, queryset: QuerySet[Trip]):
+        vehicles = list(Vehicle.objects.filter(trip__in=queryset).distinct())
+        cells = [trip.get_usage_cell() for trip in queryset if trip.finished]
+        super().delete_queryset(request, queryset)
+
+        for vehicle in vehicles:
+            vehicle.refresh_mileage()
+        usage.refresh(cells)
+
+
+@admin.register(TripHistory)
+class TripHistoryAdmin(CsvExportMixin, ReplicaChangeListMixin, admin.ModelAdmin):
+    """
+    Trips and archived trips together, read only.
+    """
+
+    list_display = [
+        "vehicle",
+        "starting_time",
+        "ending_time",
+        "starting_mileage",
+        "ending_mileage",
+        "driver_name",
+        "distance",
+        "duration",
+        "purpose",
+        "finished",
+        "archived",
+    ]
+    list_filter = ["archived", "vehicle", "starting_time"]
+    list_select_related = ["vehicle"]
+    export = exports.TRIPS
+
+    def has_add_permission(self, request: HttpRequest):
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj=None):
+        return False
+
+    def has_delete_permission(self, request: HttpRequest, obj=None):
+        return False
+
+
+@admin.register(Defect)
+class DefectAdmin(CsvExportMixin, admin.ModelAdmin):
+    list_display = [
+        "vehicle",
+        "creation_date",
+        "status",
+        "severity",
+        "reporter_name",
+        "solution_date",
+    ]
+    list_filter = ["status", "severity", "vehicle", "creation_date"]
+    list_select_related = ["vehicle"]
+    export = exports.DEFECTS
 
 
 class DefectInline(admin.TabularInline):
@@ -51,9 +197,9 @@ class DefectInline(admin.TabularInline):
     readonly_fields = ["creation_date", "solution_date"]
 
 
-@admin.display(description="Nombre d'anomalies ouvertes")
+@admin.display(description="Nombre d'anomalies ouvertes", ordering="open_defect_total")
 def open_defect_count(obj: Vehicle):
-    return obj.open_defects.count()
+    return obj.open_defect_count
 
 
 @admin.register(Vehicle)
@@ -70,26 +216,97 @@ class VehicleAdmin(admin.ModelAdmin):
         "mileage",
     ]
     inlines = [DefectInline]
-    actions = ["get_qr_code"]
+    actions = ["get_qr_code", "generate_label_sheets"]
     list_editable = ["status", "parking_location"]
+    list_select_related = ["parking_location"]
+
+    def get_queryset(self, request: HttpRequest):
+        return super().get_queryset(request).with_open_defect_count()
+
+    def get_urls(self):
+        return [
+            path(
+                "usage/",
+                self.admin_site.admin_view(self.usage_dashboard),
+                name="main_vehicle_usage",
+            ),
+            *super().get_urls(),
+        ]
+
+    def usage_dashboard(self, request: HttpRequest):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        form = UsageDashboardForm(request.GET or {"year": timezone.localdate().year})
+        vehicles = []
+        if form.is_valid():
+            # Only reads the monthly rollups
+            with use_replica():
+                vehicles = usage.get_dashboard(form.cleaned_data["year"])
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": _("Utilisation mensuelle"),
+            "opts": self.model._meta,
+            "form": form,
+            "vehicles": vehicles,
+        }
+        return TemplateResponse(request, "admin/main/vehicle/usage.html", context)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "parking_location":
+            # Evaluated once, instead of once per row of the changelist
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+    def save_model(self, request: HttpRequest, obj: Vehicle, form, change: bool):
+        super().save_model(request, obj, form, change)
+
+        if not change:
+            # Encoded now, so that printing the labels only reads the cache
+            url = qr_codes.get_vehicle_url(qr_codes.get_site_url(request), obj.pk)
+            transaction.on_commit(lambda: qr_codes.get_qr_codes([url]))
 
     @admin.action(description=_("Obtenir les QR codes"))
     def get_qr_code(self, request: HttpRequest, queryset: QuerySet["Vehicle"]):
+        site_url = qr_codes.get_site_url(request)
+        vehicles = list(queryset)
+        urls = [qr_codes.get_vehicle_url(site_url, q.pk) for q in vehicles]
+        svgs = qr_codes.get_qr_codes(urls)
+
         context = {
             "vehicles": [
-                (
-                    q.name,
-                    q.registration_number,
-                    request.build_absolute_uri(reverse("vehicle_details", args=[q.pk])),
-                )
-                for q in queryset
+                (q.name, q.registration_number, svgs[url])
+                for q, url in zip(vehicles, urls)
             ]
         }
         return render(request, "admin/qr_codes.html", context)
 
+    @admin.action(description=_("Générer les planches d'étiquettes à imprimer"))
+    def generate_label_sheets(
+        self, request: HttpRequest, queryset: QuerySet["Vehicle"]
+    ):
+        job = LabelSheetJob.objects.create(
+            site_url=qr_codes.get_site_url(request), created_by=request.user
+        )
+        job.vehicles.set(queryset)
+
+        self.message_user(
+            request,
+            format_html(
+                _("Les planches sont en cours de génération : {}"),
+                format_html(
+                    '<a href="{}">{}</a>',
+                    reverse("admin:main_labelsheetjob_change", args=[job.pk]),
+                    job,
+                ),
+            ),
+        )
+
 
 @admin.register(FuelExpense)
-class FuelExpenseAdmin(admin.ModelAdmin):
+class FuelExpenseAdmin(CsvExportMixin, ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = [
         "vehicle",
         "date",
@@ -99,6 +316,79 @@ class FuelExpenseAdmin(admin.ModelAdmin):
         "form_of_payment",
     ]
     list_filter = ["vehicle", "date", "form_of_payment"]
+    export = exports.FUEL_EXPENSES
+    change_list_template = "admin/main/fuelexpense/change_list.html"
+
+    def get_urls(self):
+        return [
+            path(
+                "consumption/",
+                self.admin_site.admin_view(self.consumption_report),
+                name="main_fuelexpense_consumption",
+            ),
+            *super().get_urls(),
+        ]
+
+    def consumption_report(self, request: HttpRequest):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        form = PeriodForm(request.GET)
+        rows = []
+        if form.is_valid():
+            with use_replica():
+                rows = consumption.get_report(
+                    form.cleaned_data["start"], form.cleaned_data["end"]
+                )
+
+        if request.GET.get("format") == "csv":
+            return self.consumption_csv(rows)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": _("Consommation de carburant"),
+            "opts": self.model._meta,
+            "form": form,
+            "rows": rows,
+            "csv_query": request.GET.copy(),
+        }
+        context["csv_query"]["format"] = "csv"
+        return TemplateResponse(
+            request, "admin/main/fuelexpense/consumption.html", context
+        )
+
+    def consumption_csv(self, rows: list[consumption.VehicleConsumption]):
+        response = HttpResponse(
+            content_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="consommation.csv"'},
+        )
+        writer = csv.writer(response)
+        writer.writerow(
+            [
+                _("Véhicule"),
+                _("Pleins"),
+                _("Quantité / L"),
+                _("Montant / €"),
+                _("Distance / km"),
+                _("L/100 km"),
+                _("€/km"),
+                _("€/L"),
+            ]
+        )
+        for row in rows:
+            writer.writerow(
+                [
+                    row.vehicle,
+                    row.fill_ups,
+                    row.quantity,
+                    row.amount,
+                    row.distance,
+                    row.litres_per_100_km,
+                    row.cost_per_km,
+                    row.price_per_litre,
+                ]
+            )
+        return response
 
 
 @admin.register(Setting)
@@ -107,3 +397,115 @@ class SettingAdmin(admin.ModelAdmin):
     list_editable = ["value"]
     search_fields = ["key"]
     list_filter = ["key"]
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = [
+        "subject",
+        "kind",
+        "recipients",
+        "status",
+        "attempts",
+        "created_at",
+        "next_attempt_at",
+        "sent_at",
+    ]
+    list_filter = ["status", "kind", "created_at"]
+    readonly_fields = [field.name for field in Notification._meta.fields]
+    actions = ["retry"]
+
+    def has_add_permission(self, request: HttpRequest):
+        return False
+
+    @admin.action(description=_("Renvoyer les notifications"))
+    def retry(self, request: HttpRequest, queryset: QuerySet[Notification]):
+        queryset.update(
+            status=Notification.NotificationStatus.PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ["name", "user", "created_at"]
+    list_filter = ["user"]
+    readonly_fields = ["key", "created_at"]
+    fields = ["name", "user", "key", "created_at"]
+
+
+@admin.register(LabelSheetJob)
+class LabelSheetJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "__str__",
+        "status",
+        "progress",
+        "created_by",
+        "created_at",
+        "finished_at",
+        "download_link",
+    ]
+    list_filter = ["status", "created_at"]
+    readonly_fields = [
+        "status",
+        "progress",
+        "download_link",
+        "created_by",
+        "created_at",
+        "finished_at",
+        "lease_expires_at",
+        "last_error",
+        "vehicles",
+    ]
+    fields = readonly_fields
+    list_select_related = ["created_by"]
+    actions = ["retry"]
+
+    def has_add_permission(self, request: HttpRequest):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download),
+                name="main_labelsheetjob_download",
+            ),
+            *super().get_urls(),
+        ]
+
+    @admin.display(description=_("fichier"))
+    def download_link(self, obj: LabelSheetJob):
+        if not obj.file:
+            return "-"
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse("admin:main_labelsheetjob_download", args=[obj.pk]),
+            _("Imprimer"),
+        )
+
+    def download(self, request: HttpRequest, pk: int):
+        job = get_object_or_404(LabelSheetJob, pk=pk)
+        if not self.has_view_permission(request, job) or not job.file:
+            raise Http404()
+
+        # Opened in the browser, to be printed
+        return FileResponse(job.file.open("rb"), content_type="text/html")
+
+    @admin.action(description=_("Relancer la génération"))
+    def retry(self, request: HttpRequest, queryset: QuerySet[LabelSheetJob]):
+        # A job still being generated would be generated twice
+        retried = queryset.filter(LabelSheetJob.retryable_filter()).update(
+            status=LabelSheetJob.JobStatus.PENDING, last_error=""
+        )
+
+        if retried < len(queryset):
+            self.message_user(
+                request,
+                _(
+                    "Seules les planches en échec, ou interrompues, peuvent être "
+                    "relancées."
+                ),
+                messages.WARNING,
+            )
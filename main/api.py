@@ -0,0 +1,583 @@
+"""
+Versioned JSON API for the vehicles and their trips, defects and fuel expenses.
+
+Collections are paginated with opaque cursors (keyset pagination) and every
+representation can be reduced with ``?fields=``. Reads require a session or an
+API token, except for a single vehicle which is public like its QR code page.
+Writes require an API token (``Authorization: Token <key>``) whose user has
+the matching model permission.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import typing
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db import models as db_models
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.forms import modelform_factory
+from django.forms.models import model_to_dict
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils.translation import gettext as _
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import forms, models, sync
+from .db import retry_on_database_lock
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, errors: typing.Any):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+@dataclass(frozen=True)
+class ApiField:
+    """
+    A field of a representation, with the relations it needs to be rendered
+    without additional queries.
+    """
+
+    getter: typing.Callable[[typing.Any], typing.Any]
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str | Prefetch, ...] = ()
+
+
+def attribute(name: str, **kwargs) -> ApiField:
+    return ApiField(lambda obj: getattr(obj, name), **kwargs)
+
+
+def serialize_location(location: models.Location | None):
+    if location is None:
+        return None
+
+    return {
+        "id": location.pk,
+        "name": location.name,
+        "complete_address": location.complete_address,
+    }
+
+
+def serialize_open_defect(defect: models.Defect):
+    return {
+        "id": defect.pk,
+        "status": defect.status,
+        "severity": defect.severity,
+        "creation_date": defect.creation_date,
+        "comment": defect.comment,
+    }
+
+
+def serialize_current_trip(vehicle: models.Vehicle):
+    if not vehicle.current_trips:
+        return None
+
+    trip = vehicle.current_trips[0]
+    return {
+        "id": trip.pk,
+        "starting_mileage": trip.starting_mileage,
+        "starting_time": trip.starting_time,
+        "driver_name": trip.driver_name,
+        "purpose": trip.purpose,
+    }
+
+
+@dataclass
+class Resource:
+    model: type[db_models.Model]
+    # Unique ordering, used as the pagination key
+    ordering: tuple[str, ...]
+    fields: dict[str, ApiField]
+    writable_fields: tuple[str, ...] = ()
+    filter_fields: tuple[str, ...] = ()
+    # Single objects readable without authentication
+    public_detail: bool = False
+
+    def get_queryset(self, field_names: list[str]):
+        queryset = self.model._default_manager.all()
+
+        select_related = {
+            path for name in field_names for path in self.fields[name].select_related
+        }
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        prefetch_related = [
+            lookup
+            for name in field_names
+            for lookup in self.fields[name].prefetch_related
+        ]
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        return queryset
+
+    def filter(self, request: HttpRequest, queryset):
+        for name in self.filter_fields:
+            if name in request.GET:
+                try:
+                    queryset = queryset.filter(**{name: request.GET[name]})
+                except (ValidationError, ValueError):
+                    raise ApiError(400, {name: [_("Valeur invalide")]})
+
+        return queryset
+
+    def serialize(self, obj, field_names: list[str]) -> dict[str, typing.Any]:
+        return {name: self.fields[name].getter(obj) for name in field_names}
+
+    def save(self, form, data: dict[str, typing.Any]):
+        return form.save()
+
+
+class VehicleResource(Resource):
+    def filter(self, request, queryset):
+        filter_form = forms.VehicleFilterForm(request.GET)
+        if not filter_form.is_valid():
+            raise ApiError(400, filter_form.errors)
+
+        return filter_form.filter(queryset)
+
+
+class TripResource(Resource):
+    def save(self, form, data):
+        trip: models.Trip = form.instance
+        if "finished" in data:
+            # Not converted, "false" would finish the trip
+            if not isinstance(data["finished"], bool):
+                raise ApiError(400, {"finished": [_("Valeur booléenne attendue")]})
+            trip.finished = data["finished"]
+
+        try:
+            # Only one unfinished trip per vehicle is allowed by the database
+            with transaction.atomic():
+                return form.save()
+        except IntegrityError:
+            raise ApiError(409, {"vehicle": [_("Un trajet est déjà en cours !")]})
+
+
+RESOURCES: dict[str, Resource] = {
+    "vehicles": VehicleResource(
+        model=models.Vehicle,
+        ordering=("name", "pk"),
+        fields={
+            "id": attribute("pk"),
+            "name": attribute("name"),
+            "type": attribute("type"),
+            "model_name": attribute("model_name"),
+            "fuel": attribute("fuel"),
+            "registration_number": attribute("registration_number"),
+            "status": attribute("status"),
+            "inventory": attribute("inventory"),
+            "mileage": attribute("current_mileage"),
+            "last_trip_distance": attribute("last_trip_distance"),
+            "parking_location": ApiField(
+                lambda vehicle: serialize_location(vehicle.parking_location),
+                select_related=("parking_location",),
+            ),
+            "open_defects": ApiField(
+                lambda vehicle: [
+                    serialize_open_defect(defect) for defect in vehicle.api_open_defects
+                ],
+                prefetch_related=(
+                    Prefetch(
+                        "defect_set",
+                        queryset=models.Defect.objects.filter(
+                            status__in=models.Defect.OPEN_STATUSES
+                        ).order_by("creation_date", "pk"),
+                        to_attr="api_open_defects",
+                    ),
+                ),
+            ),
+            "current_trip": ApiField(
+                serialize_current_trip,
+                prefetch_related=(
+                    Prefetch(
+                        "trip_set",
+                        queryset=models.Trip.objects.filter(finished=False),
+                        to_attr="current_trips",
+                    ),
+                ),
+            ),
+        },
+        writable_fields=(
+            "name",
+            "type",
+            "model_name",
+            "fuel",
+            "registration_number",
+            "parking_location",
+            "status",
+            "inventory",
+        ),
+        public_detail=True,
+    ),
+    "locations": Resource(
+        model=models.Location,
+        ordering=("name", "pk"),
+        fields={
+            "id": attribute("pk"),
+            "name": attribute("name"),
+            "address": attribute("address"),
+            "zip_code": attribute("zip_code"),
+            "city": attribute("city"),
+            "comment": attribute("comment"),
+            "complete_address": attribute("complete_address"),
+        },
+        writable_fields=("name", "address", "zip_code", "city", "comment"),
+    ),
+    "trips": TripResource(
+        model=models.Trip,
+        ordering=("-starting_time", "-pk"),
+        fields={
+            "id": attribute("pk"),
+            "vehicle": attribute("vehicle_id"),
+            "vehicle_name": ApiField(
+                lambda trip: trip.vehicle.name, select_related=("vehicle",)
+            ),
+            "starting_mileage": attribute("starting_mileage"),
+            "ending_mileage": attribute("ending_mileage"),
+            "starting_time": attribute("starting_time"),
+            "ending_time": attribute("ending_time"),
+            "driver_name": attribute("driver_name"),
+            "purpose": attribute("purpose"),
+            "finished": attribute("finished"),
+            "distance": ApiField(lambda trip: trip.distance()),
+        },
+        writable_fields=(
+            "vehicle",
+            "starting_mileage",
+            "ending_mileage",
+            "starting_time",
+            "ending_time",
+            "driver_name",
+            "purpose",
+        ),
+        filter_fields=("vehicle", "finished"),
+    ),
+    "defects": Resource(
+        model=models.Defect,
+        ordering=("-creation_date", "-pk"),
+        fields={
+            "id": attribute("pk"),
+            "vehicle": attribute("vehicle_id"),
+            "vehicle_name": ApiField(
+                lambda defect: defect.vehicle.name, select_related=("vehicle",)
+            ),
+            "status": attribute("status"),
+            "severity": attribute("severity"),
+            "creation_date": attribute("creation_date"),
+            "solution_date": attribute("solution_date"),
+            "comment": attribute("comment"),
+            "reporter_name": attribute("reporter_name"),
+        },
+        writable_fields=("vehicle", "status", "severity", "comment", "reporter_name"),
+        filter_fields=("vehicle", "status", "severity"),
+    ),
+    "fuel-expenses": Resource(
+        model=models.FuelExpense,
+        ordering=("-date", "-pk"),
+        fields={
+            "id": attribute("pk"),
+            "vehicle": attribute("vehicle_id"),
+            "vehicle_name": ApiField(
+                lambda expense: expense.vehicle.name, select_related=("vehicle",)
+            ),
+            "date": attribute("date"),
+            "mileage": attribute("mileage"),
+            "amount": attribute("amount"),
+            "quantity": attribute("quantity"),
+            "form_of_payment": attribute("form_of_payment"),
+        },
+        writable_fields=(
+            "vehicle",
+            "date",
+            "mileage",
+            "amount",
+            "quantity",
+            "form_of_payment",
+        ),
+        filter_fields=("vehicle", "form_of_payment"),
+    ),
+}
+
+
+def get_token_user(request: HttpRequest):
+    """
+    Returns the user of the API token of the request, if any.
+    """
+    authorization = request.headers.get("Authorization", "")
+    if not authorization:
+        return None
+
+    scheme, _separator, key = authorization.partition(" ")
+    if scheme.lower() != "token" or not key.strip():
+        raise ApiError(401, {"detail": _("En-tête d'authentification invalide")})
+
+    token = (
+        models.ApiToken.objects.select_related("user")
+        .filter(key=key.strip(), user__is_active=True)
+        .first()
+    )
+    if token is None:
+        raise ApiError(401, {"detail": _("Jeton invalide")})
+
+    return token.user
+
+
+def encode_cursor(values: list[str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list[str]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError(400, {"cursor": [_("Curseur invalide")]})
+
+    if not isinstance(values, list):
+        raise ApiError(400, {"cursor": [_("Curseur invalide")]})
+
+    return values
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class ApiView(View):
+    # Set by as_view() for each resource
+    resource = typing.cast(Resource, None)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            self.user = get_token_user(request)
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return self.json({"errors": error.errors}, status=error.status)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super().http_method_not_allowed(request, *args, **kwargs)
+        return self.json(
+            {"errors": {"detail": _("Méthode non autorisée")}},
+            status=405,
+            headers={"Allow": response.headers["Allow"]},
+        )
+
+    def json(self, data, status: int = 200, **kwargs) -> JsonResponse:
+        return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, **kwargs)
+
+    def require_read_access(self):
+        if self.user is None and not self.request.user.is_authenticated:
+            raise ApiError(401, {"detail": _("Authentification requise")})
+
+    def require_write_access(self, action: str):
+        # Writes are not allowed with the session, which is not CSRF protected here
+        if self.user is None:
+            raise ApiError(401, {"detail": _("Jeton requis")})
+
+        opts = self.resource.model._meta
+        if not self.user.has_perm(f"{opts.app_label}.{action}_{opts.model_name}"):
+            raise ApiError(403, {"detail": _("Permission refusée")})
+
+    def get_field_names(self) -> list[str]:
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(self.resource.fields)
+
+        field_names = [name.strip() for name in requested.split(",") if name.strip()]
+        unknown = [name for name in field_names if name not in self.resource.fields]
+        if unknown:
+            raise ApiError(
+                400,
+                {
+                    "fields": [
+                        _("Champ inconnu : {name}").format(name=name)
+                        for name in unknown
+                    ]
+                },
+            )
+
+        return field_names
+
+    def get_payload(self) -> dict[str, typing.Any]:
+        try:
+            payload = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise ApiError(400, {"detail": _("JSON invalide")})
+
+        if not isinstance(payload, dict):
+            raise ApiError(400, {"detail": _("Un objet JSON est attendu")})
+
+        return payload
+
+    def write(self, instance, payload: dict[str, typing.Any], status: int):
+        writable_fields = self.resource.writable_fields
+        # Start from the current values, or the defaults of a new object
+        data = model_to_dict(instance, fields=writable_fields)
+        data.update({k: v for k, v in payload.items() if k in writable_fields})
+
+        form_class = modelform_factory(self.resource.model, fields=writable_fields)
+        form = form_class(data, instance=instance)
+        if not form.is_valid():
+            raise ApiError(400, form.errors.get_json_data())
+
+        obj = retry_on_database_lock(self.resource.save)(form, payload)
+
+        field_names = list(self.resource.fields)
+        obj = self.resource.get_queryset(field_names).get(pk=obj.pk)
+        return self.json(self.resource.serialize(obj, field_names), status=status)
+
+
+class ResourceListView(ApiView):
+    http_method_names = ["get", "post", "options"]
+
+    def get(self, request, *args, **kwargs):
+        self.require_read_access()
+
+        field_names = self.get_field_names()
+        queryset = self.resource.get_queryset(field_names)
+        queryset = self.resource.filter(request, queryset)
+        queryset = queryset.order_by(*self.resource.ordering)
+
+        try:
+            limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, {"limit": [_("Nombre entier attendu")]})
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        if "cursor" in request.GET:
+            queryset = queryset.filter(self.after(decode_cursor(request.GET["cursor"])))
+
+        # One more row tells whether there is a next page
+        objects = list(queryset[: limit + 1])
+        next_url = None
+        if len(objects) > limit:
+            objects = objects[:limit]
+            query = request.GET.copy()
+            query["cursor"] = encode_cursor(self.cursor_values(objects[-1]))
+            next_url = request.build_absolute_uri(f"?{query.urlencode()}")
+
+        return self.json(
+            {
+                "results": [
+                    self.resource.serialize(obj, field_names) for obj in objects
+                ],
+                "next": next_url,
+            }
+        )
+
+    def post(self, request, *args, **kwargs):
+        self.require_write_access("add")
+        return self.write(self.resource.model(), self.get_payload(), status=201)
+
+    def ordering_fields(self):
+        opts = self.resource.model._meta
+        for name in self.resource.ordering:
+            name = name.removeprefix("-")
+            yield name, opts.pk if name == "pk" else opts.get_field(name)
+
+    def cursor_values(self, obj) -> list[str]:
+        return [
+            model_field.value_to_string(obj)
+            for _name, model_field in self.ordering_fields()
+        ]
+
+    def after(self, values: list[str]) -> Q:
+        """
+        Matches the rows following the given ordering values, so that the
+        page starts from an index lookup instead of an offset.
+        """
+        ordering_fields = list(self.ordering_fields())
+        if len(values) != len(ordering_fields):
+            raise ApiError(400, {"cursor": [_("Curseur invalide")]})
+
+        try:
+            values = [
+                model_field.to_python(value)
+                for (_name, model_field), value in zip(ordering_fields, values)
+            ]
+        except ValidationError:
+            raise ApiError(400, {"cursor": [_("Curseur invalide")]})
+
+        condition = Q()
+        for i, ordering in enumerate(self.resource.ordering):
+            lookup = "lt" if ordering.startswith("-") else "gt"
+            column = Q(**{f"{ordering_fields[i][0]}__{lookup}": values[i]})
+            for (name, _model_field), value in zip(ordering_fields[:i], values):
+                column &= Q(**{name: value})
+            condition |= column
+
+        return condition
+
+
+class ResourceDetailView(ApiView):
+    http_method_names = ["get", "patch", "options"]
+
+    def get_object(self, field_names: list[str]):
+        queryset = self.resource.get_queryset(field_names)
+        try:
+            return queryset.get(pk=self.kwargs["pk"])
+        except (self.resource.model.DoesNotExist, ValidationError, ValueError):
+            raise ApiError(404, {"detail": _("Introuvable")})
+
+    def get(self, request, *args, **kwargs):
+        if not self.resource.public_detail:
+            self.require_read_access()
+
+        field_names = self.get_field_names()
+        return self.json(
+            self.resource.serialize(self.get_object(field_names), field_names)
+        )
+
+    def patch(self, request, *args, **kwargs):
+        self.require_write_access("change")
+        return self.write(self.get_object([]), self.get_payload(), status=200)
+
+
+class VehicleSyncView(ApiView):
+    """
+    Records a batch of events of a vehicle, captured by a client while offline.
+    Public like the forms of the vehicle page.
+    """
+
+    http_method_names = ["post", "options"]
+
+    def post(self, request, *args, **kwargs):
+        # Unlike form posts, JSON requests cannot be forged by another site
+        if request.content_type != "application/json":
+            raise ApiError(415, {"detail": _("JSON attendu")})
+
+        events = self.get_payload().get("events")
+        if not isinstance(events, list):
+            raise ApiError(400, {"events": [_("Une liste est attendue")]})
+        if len(events) > sync.MAX_BATCH_SIZE:
+            raise ApiError(
+                400,
+                {
+                    "events": [
+                        _("{count} événements au maximum").format(
+                            count=sync.MAX_BATCH_SIZE
+                        )
+                    ]
+                },
+            )
+
+        try:
+            results = sync.ingest_events(kwargs["pk"], events)
+        except models.Vehicle.DoesNotExist:
+            raise ApiError(404, {"detail": _("Introuvable")})
+        except IntegrityError:
+            # The same events are being recorded by a concurrent request
+            raise ApiError(409, {"detail": _("Conflit, veuillez réessayer")})
+
+        return self.json({"results": results})
@@ -0,0 +1,70 @@
+"""
+Archival of the old finished trips, moved in batches from the Trip table, read
+by every page, to the ArchivedTrip one. Both are read together through the
+TripHistory view.
+
+The latest trips of each vehicle stay in place, as well as the one with its
+highest mileage: the odometer of the vehicles is computed from the Trip table
+(see Vehicle.refresh_mileage).
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import OuterRef, QuerySet
+
+from .models import ArchivedTrip, Trip
+
+
+def get_archivable_trips(before: datetime.datetime, keep: int) -> QuerySet[Trip]:
+    """
+    Returns the finished trips started before the given date, except the
+    ``keep`` latest ones of each vehicle and its highest mileage.
+    """
+    latest = (
+        Trip.objects.filter(
+            vehicle=OuterRef("vehicle"), finished=True, ending_time__isnull=False
+        )
+        .order_by("-ending_time")
+        .values("pk")[:keep]
+    )
+    highest = (
+        Trip.objects.filter(vehicle=OuterRef("vehicle"), ending_mileage__isnull=False)
+        .order_by("-ending_mileage")
+        .values("pk")[:1]
+    )
+
+    return (
+        Trip.objects.filter(finished=True, starting_time__lt=before)
+        .exclude(pk__in=latest)
+        .exclude(pk__in=highest)
+    )
+
+
+def archive_trips(before: datetime.datetime, keep: int, batch_size: int = 500) -> int:
+    """
+    Moves the archivable trips to the archive, one transaction per batch.
+    Returns the number of trips archived.
+    """
+    field_names = [field.attname for field in Trip._meta.concrete_fields]
+    archived = 0
+
+    while True:
+        with transaction.atomic():
+            trips = list(
+                get_archivable_trips(before, keep)
+                .select_for_update()
+                .order_by("pk")[:batch_size]
+            )
+            if not trips:
+                return archived
+
+            ArchivedTrip.objects.bulk_create(
+                ArchivedTrip(**{name: getattr(trip, name) for name in field_names})
+                for trip in trips
+            )
+            # Through the queryset, which sends the signals of the vehicle pages
+            # but leaves their odometer alone
+            Trip.objects.filter(pk__in=[trip.pk for trip in trips]).delete()
+
+        archived += len(trips)
@@ -0,0 +1,115 @@
+"""
+Async versions of the public vehicle views, used when the application is
+served by ASGI workers (see ``CARBON_ASYNC_VIEWS``).
+
+A request waiting on the database does not hold a worker: its queries are run
+by the async ORM and awaited together. Saving a form needs transactions, which
+the async ORM does not provide, so the forms are still validated and saved by
+the synchronous views, in a thread.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404
+
+from . import caching, models, views
+
+
+async def alist(queryset) -> list:
+    return [obj async for obj in queryset]
+
+
+class AsyncVehicleDetailView(views.VehicleDetailView):
+    async def get(self, request, *args, **kwargs):
+        self.vehicle_version = await caching.aget_vehicle_version(kwargs["pk"])
+
+        # Pages showing a message are specific to the session, which may be
+        # loaded from the database
+        conditional = await sync_to_async(
+            lambda: len(messages.get_messages(request)) == 0
+        )()
+
+        if conditional:
+            not_modified = self.get_not_modified_response(request)
+            if not_modified is not None:
+                return not_modified
+
+        self.object = await self.aget_object()
+        context = self.get_context_data(object=self.object)
+
+        # The template is rendered by the handler, in a thread
+        return self.patch_response(self.render_to_response(context), conditional)
+
+    async def aget_object(self) -> models.Vehicle:
+        pk = self.kwargs["pk"]
+
+        queries = [
+            self.get_queryset().aget(pk=pk),
+            alist(models.Trip.objects.filter(vehicle_id=pk, finished=False)),
+        ]
+        if not await caching.ahas_fragment(
+            "vehicle_open_defects", pk, self.vehicle_version
+        ):
+            queries.append(
+                alist(
+                    models.Defect.objects.filter(
+                        vehicle_id=pk, status__in=models.Defect.OPEN_STATUSES
+                    )
+                )
+            )
+
+        try:
+            vehicle, current_trips, *open_defects = await asyncio.gather(*queries)
+        except models.Vehicle.DoesNotExist:
+            raise Http404()
+
+        vehicle.current_trips = current_trips
+        self.open_defects = open_defects[0] if open_defects else None
+        return vehicle
+
+    def get_queryset(self):
+        # The trips and defects are queried alongside the vehicle
+        return models.Vehicle.objects.select_related("parking_location")
+
+    def get_open_defects(self):
+        if self.open_defects is not None:
+            return self.open_defects
+
+        return super().get_open_defects()
+
+
+class AsyncVehicleFormMixin:
+    """
+    Loads the vehicle with the async ORM, then runs the synchronous view in a
+    thread to validate and save the form.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            self.vehicle = await models.Vehicle.objects.aget(pk=kwargs["pk"])
+        except models.Vehicle.DoesNotExist:
+            raise Http404()
+
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class AsyncDefectCreateView(AsyncVehicleFormMixin, views.DefectCreateView):
+    pass
+
+
+class AsyncFuelExpenseCreateView(AsyncVehicleFormMixin, views.FuelExpenseCreateView):
+    pass
+
+
+class AsyncTripStartFormView(AsyncVehicleFormMixin, views.TripStartFormView):
+    pass
+
+
+class AsyncTripEndFormView(AsyncVehicleFormMixin, views.TripEndFormView):
+    pass
+
+
+class AsyncTripAbortFormView(AsyncVehicleFormMixin, views.TripAbortFormView):
+    pass
@@ -0,0 +1,85 @@
+"""
+Versioning of the cached public vehicle pages.
+
+Each vehicle has a version, stored in the cache framework, that changes whenever
+a row shown on its public page changes. The version keys the cached fragments
+of the page and its ETag, so that nothing has to be deleted on invalidation.
+"""
+
+import datetime
+import hashlib
+import time
+import uuid
+from typing import Iterable
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils import timezone
+
+# Cached fragments are keyed on the version, they never have to be refreshed
+PAGE_CACHE_TIMEOUT = 7 * 24 * 3600
+
+
+def _version_key(pk) -> str:
+    return f"main:vehicle-version:{pk}"
+
+
+def _new_version() -> str:
+    # The timestamp part is used as the Last-Modified date of the page
+    return f"{time.time():.6f}-{uuid.uuid4().hex[:8]}"
+
+
+def get_vehicle_version(pk) -> str:
+    return cache.get_or_set(_version_key(pk), _new_version, timeout=None)
+
+
+async def aget_vehicle_version(pk) -> str:
+    return await cache.aget_or_set(_version_key(pk), _new_version, timeout=None)
+
+
+async def ahas_fragment(fragment_name: str, pk, version: str) -> bool:
+    """
+    Tells whether a fragment of the page of a vehicle is cached, so that its
+    data does not have to be queried.
+    """
+    return await cache.ahas_key(
+        make_template_fragment_key(fragment_name, [pk, version])
+    )
+
+
+def get_version_datetime(version: str) -> datetime.datetime:
+    timestamp = float(version.split("-")[0])
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+def get_page_time() -> datetime.datetime:
+    """
+    Returns the current time as shown by the forms of the page, to the minute.
+    """
+    return timezone.now().replace(second=0, microsecond=0)
+
+
+def get_page_etag(version: str, csrf_cookie: str, page_time: datetime.datetime) -> str:
+    # The page embeds a CSRF token derived from the cookie, and its forms are
+    # filled with the current time
+    digest = hashlib.sha256(
+        f"{version}:{csrf_cookie}:{page_time.isoformat()}".encode()
+    ).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def bump_vehicle_versions(pks: Iterable):
+    """
+    Invalidates the cached pages of the given vehicles, right away and again
+    once the transaction is committed, so that a page rendered in between from
+    the data being committed cannot be cached under the new version.
+    """
+    pks = list(pks)
+
+    def bump():
+        version = _new_version()
+        cache.set_many({_version_key(pk): version for pk in pks}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
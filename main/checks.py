@@ -0,0 +1,120 @@
+"""
+Checks of the database connection settings, run by migrate when the container
+starts, which also reports the effective configuration.
+"""
+
+import importlib.util
+
+from django.conf import settings
+from django.core import checks
+
+POSTGRESQL_ENGINE = "django.db.backends.postgresql"
+
+
+def get_pool_sizes(pool: dict | bool) -> tuple[int, int]:
+    """
+    Returns the minimum and maximum sizes of a pool, with the defaults of
+    psycopg_pool.
+    """
+    options = pool if isinstance(pool, dict) else {}
+    min_size = options.get("min_size", 4)
+    return min_size, options.get("max_size") or min_size
+
+
+def describe_connections(config: dict) -> str:
+    pool = config.get("OPTIONS", {}).get("pool")
+    if pool:
+        min_size, max_size = get_pool_sizes(pool)
+        timeout = pool.get("timeout", 30) if isinstance(pool, dict) else 30
+        description = (
+            f"pool psycopg de {min_size} à {max_size} connexions par processus, "
+            f"attente maximale {timeout:g} s"
+        )
+    elif config.get("CONN_MAX_AGE") is None:
+        description = "persistantes sans limite de durée"
+    elif config.get("CONN_MAX_AGE"):
+        description = f"persistantes pendant {config['CONN_MAX_AGE']} s"
+    else:
+        description = "ouvertes à chaque requête"
+
+    if config.get("CONN_HEALTH_CHECKS"):
+        description += ", vérifiées avant d'être réutilisées"
+
+    return description
+
+
+def check_connection_settings(alias: str, config: dict) -> list[checks.CheckMessage]:
+    pool = config.get("OPTIONS", {}).get("pool")
+    messages = []
+
+    if pool:
+        if config["ENGINE"] != POSTGRESQL_ENGINE:
+            messages.append(
+                checks.Error(
+                    f"Le pool de connexions de la base {alias!r} n'est "
+                    "disponible qu'avec PostgreSQL.",
+                    hint="Retirer DJANGO_DATABASE_POOL.",
+                    id="main.E001",
+                )
+            )
+        elif importlib.util.find_spec("psycopg_pool") is None:
+            messages.append(
+                checks.Error(
+                    "Le pool de connexions nécessite le paquet psycopg_pool.",
+                    hint="Installer psycopg[pool].",
+                    id="main.E002",
+                )
+            )
+
+        if config.get("CONN_MAX_AGE") != 0:
+            messages.append(
+                checks.Error(
+                    f"Les connexions de la base {alias!r} ne peuvent pas "
+                    "être persistantes avec un pool.",
+                    hint="Retirer DJANGO_DATABASE_CONN_MAX_AGE.",
+                    id="main.E003",
+                )
+            )
+
+        min_size, max_size = get_pool_sizes(pool)
+        if min_size > max_size:
+            messages.append(
+                checks.Error(
+                    f"Le pool de la base {alias!r} a une taille minimale "
+                    "supérieure à sa taille maximale.",
+                    hint="Corriger DJANGO_DATABASE_POOL_MIN_SIZE.",
+                    id="main.E004",
+                )
+            )
+
+    elif config.get("CONN_MAX_AGE") != 0 and settings.CARBON_ASYNC_VIEWS:
+        messages.append(
+            checks.Warning(
+                f"Les connexions persistantes de la base {alias!r} ne sont "
+                "pas fermées par les vues asynchrones.",
+                hint="Utiliser DJANGO_DATABASE_POOL avec PostgreSQL, ou "
+                "DJANGO_DATABASE_CONN_MAX_AGE=0.",
+                id="main.W001",
+            )
+        )
+
+    return messages
+
+
+@checks.register(checks.Tags.database)
+def check_database_connections(app_configs, databases=None, **kwargs):
+    messages = []
+
+    for alias, config in settings.DATABASES.items():
+        messages.extend(check_connection_settings(alias, config))
+
+        # Only reported for the databases about to be used (migrate, test...)
+        if alias in (databases or ()):
+            messages.append(
+                checks.Info(
+                    f"Connexions à la base {alias!r} : {describe_connections(config)}.",
+                    id="main.I001",
+                )
+            )
+
+    return messages
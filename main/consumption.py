@@ -0,0 +1,157 @@
+"""
+Fuel consumption of the vehicles, from their consecutive fill-ups.
+
+The fuel of a fill-up was burnt since the previous one: its quantity over the
+distance between both mileages gives the consumption. The fill-ups are paired
+by the database with a window function, over all the fill-ups of a vehicle at
+once, and stored in the FuelConsumption table. It is refreshed from a fill-up
+onwards when it is saved or deleted, and aggregated over any dates by the
+report.
+"""
+
+from __future__ import annotations
+
+import datetime
+import decimal
+from dataclasses import dataclass
+from typing import Iterable
+
+from django.db import models
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import Lag
+
+from .models import FuelConsumption, FuelExpense
+
+CONSUMPTION_FIELDS = ["vehicle", "date", "distance", "amount", "quantity"]
+
+CENT = decimal.Decimal("0.01")
+
+
+def get_fill_ups(expenses: models.QuerySet) -> models.QuerySet:
+    """
+    Returns the fuel expenses with the mileage of the previous fill-up of
+    their vehicle.
+    """
+    return expenses.annotate(
+        previous_mileage=Window(
+            Lag("mileage"),
+            partition_by=[F("vehicle_id")],
+            order_by=[F("mileage").asc(), F("date").asc(), F("pk").asc()],
+        )
+    ).values_list(
+        "pk", "vehicle_id", "date", "mileage", "previous_mileage", "amount", "quantity"
+    )
+
+
+def save_consumptions(fill_ups: Iterable[tuple], consumption_model=FuelConsumption):
+    consumption_model.objects.bulk_create(
+        [
+            consumption_model(
+                expense_id=pk,
+                vehicle_id=vehicle_id,
+                date=date,
+                distance=(
+                    mileage - previous_mileage
+                    if previous_mileage is not None and mileage > previous_mileage
+                    else None
+                ),
+                amount=amount,
+                quantity=quantity,
+            )
+            for pk, vehicle_id, date, mileage, previous_mileage, amount, quantity in fill_ups
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["expense"],
+        update_fields=CONSUMPTION_FIELDS,
+    )
+
+
+def refresh_vehicle(vehicle_id, since_mileage: int | None = None):
+    """
+    Recomputes the consumptions of a vehicle, only from the given mileage if
+    the fill-ups before it did not change.
+    """
+    fill_ups = get_fill_ups(FuelExpense.objects.filter(vehicle_id=vehicle_id))
+    if since_mileage is not None:
+        # Filtered once paired, so that the first one keeps its predecessor
+        fill_ups = [fill_up for fill_up in fill_ups if fill_up[3] >= since_mileage]
+
+    save_consumptions(fill_ups)
+
+
+def rebuild(expense_model=FuelExpense, consumption_model=FuelConsumption):
+    """
+    Recomputes the consumptions of every vehicle. The models are given by the
+    migration which fills the table.
+    """
+    save_consumptions(
+        get_fill_ups(expense_model.objects.all()).iterator(), consumption_model
+    )
+
+
+def divide(dividend, divisor, factor: int = 1) -> decimal.Decimal | None:
+    if not dividend or not divisor:
+        return None
+
+    return (decimal.Decimal(dividend) * factor / decimal.Decimal(divisor)).quantize(
+        CENT
+    )
+
+
+@dataclass
+class VehicleConsumption:
+    vehicle: str
+    fill_ups: int
+    quantity: decimal.Decimal
+    amount: decimal.Decimal
+    # Covered by the fill-ups following another one
+    distance: int | None
+    litres_per_100_km: decimal.Decimal | None
+    cost_per_km: decimal.Decimal | None
+    price_per_litre: decimal.Decimal | None
+
+
+def get_report(
+    start: datetime.date | None = None, end: datetime.date | None = None
+) -> list[VehicleConsumption]:
+    """
+    Returns the consumption of each vehicle with fill-ups between the given
+    dates, included.
+    """
+    consumptions = FuelConsumption.objects.all()
+    if start is not None:
+        consumptions = consumptions.filter(date__gte=start)
+    if end is not None:
+        consumptions = consumptions.filter(date__lte=end)
+
+    paired = Q(distance__isnull=False)
+    rows = (
+        consumptions.values("vehicle", "vehicle__name")
+        .annotate(
+            fill_ups=Count("pk"),
+            total_quantity=Sum("quantity"),
+            total_amount=Sum("amount"),
+            total_distance=Sum("distance"),
+            paired_quantity=Sum("quantity", filter=paired),
+            paired_amount=Sum("amount", filter=paired),
+        )
+        .order_by("vehicle__name", "vehicle")
+    )
+
+    return [
+        VehicleConsumption(
+            vehicle=row["vehicle__name"],
+            fill_ups=row["fill_ups"],
+            # Summed without their decimal places by SQLite
+            quantity=row["total_quantity"].quantize(CENT),
+            amount=row["total_amount"].quantize(CENT),
+            distance=row["total_distance"],
+            litres_per_100_km=divide(
+                row["paired_quantity"], row["total_distance"], 100
+            ),
+            cost_per_km=divide(row["paired_amount"], row["total_distance"]),
+            price_per_litre=divide(row["total_amount"], row["total_quantity"]),
+        )
+        for row in rows
+    ]
@@ -0,0 +1,498 @@
+"""
+Critical CSS of the public vehicle page, opened by scanning the QR code of a
+vehicle: the rules of pico.css whose selectors can match an element displayed
+before its collapsed sections are expanded, inlined by vehicle_detail.html.
+
+The analysis is conservative. Pseudo-classes and combinators are ignored, so
+a rule is only dropped when an element, class, id or attribute it requires
+never appears in the templates. The full stylesheet is still loaded once the
+page is displayed, so a rule wrongly dropped only delays its styling.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import pathlib
+import re
+import typing
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loaders.app_directories import get_app_template_dirs
+
+STYLESHEET = "css/pico.css"
+# Loaded by the pages after the critical CSS, and using its custom properties
+OTHER_STYLESHEETS = ["css/main.css"]
+# Templates of the page opened by scanning the QR code of a vehicle, the
+# others load the full stylesheet
+PAGE_TEMPLATES = ["base.html", "main/vehicle_detail.html"]
+OUTPUT_TEMPLATE = "main/critical_css.html"
+
+# Attributes only set from Python, by the form fields and their widgets
+DYNAMIC_ATTRIBUTES = {
+    "aria-describedby",
+    "aria-invalid",
+    "checked",
+    "disabled",
+    "max",
+    "maxlength",
+    "min",
+    "placeholder",
+    "readonly",
+    "required",
+    "selected",
+    "step",
+}
+
+# At-rules containing other rules, which are filtered in turn
+GROUP_AT_RULES = ("@media", "@supports", "@container", "@layer", "@-moz-document")
+
+STRING = r""""(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'"""
+COMMENT_OR_STRING = re.compile(rf"/\*.*?\*/|{STRING}", re.S)
+BLOCK_TOKEN = re.compile(rf"{STRING}|[{{}};]")
+WHITESPACE = re.compile(rf"({STRING})|\s+")
+DECLARATION_SEPARATOR = re.compile(rf"({STRING})|\s*([;:,])\s*")
+SELECTOR_SEPARATOR = re.compile(r"\s*([,>])\s*")
+SPLIT_TOKEN = re.compile(rf"{STRING}|[(),;]")
+CUSTOM_PROPERTY_REFERENCE = re.compile(r"var\(\s*(--[\w-]+)")
+ANIMATION_NAME = re.compile(r"[\w-]+")
+KEYFRAMES = ("@keyframes", "@-webkit-keyframes")
+
+PSEUDO = re.compile(r"::?[\w-]+")
+# Pseudo-classes matching the elements which match one of their arguments
+MATCHING_PSEUDO_CLASSES = (":is", ":where")
+ATTRIBUTE_SELECTOR = re.compile(
+    rf"""\[\s*([\w-]+)\s*(?:(.?=)\s*({STRING}|[^\]\s]+)\s*(?:[is]\s*)?)?\]"""
+)
+CLASS_SELECTOR = re.compile(r"\.([\w-]+)")
+ID_SELECTOR = re.compile(r"#([\w-]+)")
+TYPE_SELECTOR = re.compile(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)")
+
+TEMPLATE_TAG = re.compile(r"{%.*?%}|{#.*?#}|<!--.*?-->", re.S)
+TEMPLATE_VARIABLE = re.compile(r"{{.*?}}", re.S)
+# Replaces the variables, so that they are not split on their whitespace
+PLACEHOLDER = "{{}}"
+FOLD_TAG = re.compile(r"<(/?)(details|summary|footer)\b([^>]*)>", re.I)
+CONDITIONAL_BLOCK = re.compile(r"{%\s*if\b.*?{%\s*endif\s*%}", re.S)
+OPEN_ATTRIBUTE = re.compile(r"(?:^|\s)open(?:[\s=]|$)", re.I)
+HTML_TAG = re.compile(r"""<([a-zA-Z][\w-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>""")
+HTML_ATTRIBUTE = re.compile(r"""([^\s=/"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?""")
+
+
+@dataclasses.dataclass
+class Rule:
+    prelude: str
+    # Declarations of a style rule, nested rules of a conditional group rule,
+    # or None for a statement such as @charset
+    body: str | list[Rule] | None
+
+
+def strip_comments(css: str) -> str:
+    return COMMENT_OR_STRING.sub(
+        lambda match: "" if match[0].startswith("/*") else match[0], css
+    )
+
+
+def parse(css: str) -> list[Rule]:
+    css = strip_comments(css)
+    rules = []
+    depth = 0
+    start = body_start = 0
+    prelude = ""
+
+    for match in BLOCK_TOKEN.finditer(css):
+        token = match[0]
+        if token == "{":
+            if depth == 0:
+                prelude = css[start : match.start()].strip()
+                body_start = match.end()
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                body = css[body_start : match.start()]
+                if prelude.startswith(GROUP_AT_RULES):
+                    rules.append(Rule(prelude, parse(body)))
+                else:
+                    rules.append(Rule(prelude, body))
+                start = match.end()
+        elif token == ";" and depth == 0:
+            rules.append(Rule(css[start : match.start()].strip(), None))
+            start = match.end()
+
+    return rules
+
+
+def collapse_whitespace(text: str) -> str:
+    return WHITESPACE.sub(lambda match: match[1] or " ", text).strip()
+
+
+def minify_declarations(declarations: str) -> str:
+    declarations = collapse_whitespace(declarations)
+    declarations = DECLARATION_SEPARATOR.sub(
+        lambda match: match[1] or match[2], declarations
+    )
+    return declarations.rstrip(";")
+
+
+def serialize(rules: list[Rule]) -> str:
+    parts = []
+    for rule in rules:
+        if isinstance(rule.body, list):
+            body = serialize(rule.body)
+        else:
+            body = minify_declarations(rule.body or "")
+        parts.append(f"{collapse_whitespace(rule.prelude)}{{{body}}}")
+
+    return "".join(parts)
+
+
+def split_top_level(text: str, separator: str) -> list[str]:
+    """
+    Splits on the separators outside of strings and parentheses.
+    """
+    parts = []
+    depth = 0
+    start = 0
+    for match in SPLIT_TOKEN.finditer(text):
+        token = match[0]
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif token == separator and depth == 0:
+            parts.append(text[start : match.start()])
+            start = match.end()
+    parts.append(text[start:])
+
+    return [part.strip() for part in parts if part.strip()]
+
+
+def strip_pseudo_classes(selector: str) -> tuple[str, list[str]]:
+    """
+    Removes the pseudo-classes and pseudo-elements, with their arguments.
+    Also returns the selector lists of :is() and :where(), one selector of
+    each having to match too.
+    """
+    parts = []
+    alternatives = []
+    position = 0
+    while match := PSEUDO.search(selector, position):
+        parts.append(selector[position : match.start()])
+        position = match.end()
+        if selector.startswith("(", position):
+            start = position + 1
+            depth = 0
+            for i in range(position, len(selector)):
+                depth += {"(": 1, ")": -1}.get(selector[i], 0)
+                if depth == 0:
+                    position = i + 1
+                    break
+            else:
+                position = len(selector) + 1
+            if match[0] in MATCHING_PSEUDO_CLASSES:
+                alternatives.append(selector[start : position - 1])
+    parts.append(selector[position:])
+
+    return "".join(parts), alternatives
+
+
+def unquote(value: str) -> str:
+    if value[:1] in "\"'":
+        return value[1:-1]
+    return value
+
+
+@dataclasses.dataclass
+class Usage:
+    """
+    Elements, classes, ids and attributes found in the templates.
+    """
+
+    tags: set[str] = dataclasses.field(default_factory=set)
+    classes: set[str] = dataclasses.field(default_factory=set)
+    # Classes built in the template, such as "status-{{ vehicle.status }}"
+    class_prefixes: set[str] = dataclasses.field(default_factory=set)
+    ids: set[str] = dataclasses.field(default_factory=set)
+    # Literal values of each attribute, or None when a value is computed
+    attributes: dict[str, set[str] | None] = dataclasses.field(default_factory=dict)
+
+    def add_template(self, source: str):
+        source = TEMPLATE_TAG.sub(" ", source)
+        source = TEMPLATE_VARIABLE.sub(PLACEHOLDER, source)
+
+        for tag, attributes in HTML_TAG.findall(source):
+            self.tags.add(tag.lower())
+            for name, value in HTML_ATTRIBUTE.findall(attributes):
+                # Attributes named by a variable are listed in DYNAMIC_ATTRIBUTES
+                if PLACEHOLDER not in name:
+                    self.add_attribute(name.lower(), unquote(value))
+
+    def add_attribute(self, name: str, value: str):
+        if name == "class":
+            for class_name in value.split():
+                prefix, placeholder, _ = class_name.partition(PLACEHOLDER)
+                # Classes entirely computed, such as the tags of the messages,
+                # cannot be known
+                if not placeholder:
+                    self.classes.add(class_name)
+                elif prefix:
+                    self.class_prefixes.add(prefix)
+        elif name == "id" and PLACEHOLDER not in value:
+            self.ids.add(value)
+
+        if PLACEHOLDER in value:
+            self.attributes[name] = None
+        elif (values := self.attributes.setdefault(name, set())) is not None:
+            values.add(value)
+
+    def has_class(self, class_name: str) -> bool:
+        return class_name in self.classes or any(
+            class_name.startswith(prefix) for prefix in self.class_prefixes
+        )
+
+    def has_attribute(self, name: str, operator: str, value: str) -> bool:
+        if name in DYNAMIC_ATTRIBUTES:
+            return True
+        if name not in self.attributes:
+            return False
+
+        values = self.attributes[name]
+        # Only exact values are compared, other operators are assumed to match
+        return values is None or operator != "=" or unquote(value) in values
+
+    def matches(self, selector: str) -> bool:
+        selector, alternatives = strip_pseudo_classes(selector)
+
+        if not all(
+            any(self.matches(other) for other in split_top_level(selectors, ","))
+            for selectors in alternatives
+        ):
+            return False
+
+        if not all(
+            self.has_attribute(name.lower(), operator, value)
+            for name, operator, value in ATTRIBUTE_SELECTOR.findall(selector)
+        ):
+            return False
+        selector = ATTRIBUTE_SELECTOR.sub("", selector)
+
+        return (
+            all(self.has_class(name) for name in CLASS_SELECTOR.findall(selector))
+            and all(name in self.ids for name in ID_SELECTOR.findall(selector))
+            and all(tag.lower() in self.tags for tag in TYPE_SELECTOR.findall(selector))
+        )
+
+
+def shake(rules: list[Rule], usage: Usage) -> list[Rule]:
+    """
+    Returns the rules that may apply to the templates.
+    """
+    kept = []
+    for rule in rules:
+        if rule.body is None:
+            # @charset and @import are not allowed in an inline stylesheet
+            continue
+
+        if isinstance(rule.body, list):
+            children = shake(rule.body, usage)
+            if children:
+                kept.append(Rule(rule.prelude, children))
+        elif rule.prelude.startswith("@"):
+            # @font-face, @keyframes...
+            kept.append(rule)
+        else:
+            selectors = [
+                SELECTOR_SEPARATOR.sub(r"\1", collapse_whitespace(selector))
+                for selector in split_top_level(rule.prelude, ",")
+                if usage.matches(selector)
+            ]
+            if selectors:
+                kept.append(Rule(",".join(selectors), rule.body))
+
+    return kept
+
+
+def get_declarations(rules: list[Rule]) -> typing.Iterator[str]:
+    for rule in rules:
+        if isinstance(rule.body, list):
+            yield from get_declarations(rule.body)
+        elif rule.body is not None and not rule.prelude.startswith("@"):
+            yield from split_top_level(rule.body, ";")
+
+
+def filter_custom_properties(rules: list[Rule], names: set[str]) -> list[Rule]:
+    kept = []
+    for rule in rules:
+        if isinstance(rule.body, list):
+            children = filter_custom_properties(rule.body, names)
+            if children:
+                kept.append(Rule(rule.prelude, children))
+        elif rule.body is None or rule.prelude.startswith("@"):
+            kept.append(rule)
+        else:
+            declarations = [
+                declaration
+                for declaration in split_top_level(rule.body, ";")
+                if not declaration.startswith("--")
+                or declaration.partition(":")[0].strip() in names
+            ]
+            if declarations:
+                kept.append(Rule(rule.prelude, ";".join(declarations)))
+
+    return kept
+
+
+def prune_custom_properties(rules: list[Rule], other_css: str) -> list[Rule]:
+    """
+    Removes the custom properties that neither the rules nor the other
+    stylesheets refer to, such as the colors of the elements missing from
+    the templates.
+    """
+    referenced = set(CUSTOM_PROPERTY_REFERENCE.findall(other_css))
+    definitions: dict[str, list[str]] = {}
+    for declaration in get_declarations(rules):
+        name, _, value = declaration.partition(":")
+        if name.strip().startswith("--"):
+            definitions.setdefault(name.strip(), []).append(value)
+        else:
+            referenced.update(CUSTOM_PROPERTY_REFERENCE.findall(value))
+
+    # Custom properties may be defined from other ones
+    pending = list(referenced)
+    while pending:
+        for value in definitions.get(pending.pop(), []):
+            for name in CUSTOM_PROPERTY_REFERENCE.findall(value):
+                if name not in referenced:
+                    referenced.add(name)
+                    pending.append(name)
+
+    return filter_custom_properties(rules, referenced)
+
+
+def filter_keyframes(rules: list[Rule], names: set[str]) -> list[Rule]:
+    kept = []
+    for rule in rules:
+        if isinstance(rule.body, list):
+            children = filter_keyframes(rule.body, names)
+            if children:
+                kept.append(Rule(rule.prelude, children))
+        elif not rule.prelude.startswith(KEYFRAMES) or rule.prelude.split()[1] in names:
+            kept.append(rule)
+
+    return kept
+
+
+def prune_keyframes(rules: list[Rule]) -> list[Rule]:
+    """
+    Removes the animations that none of the rules runs.
+    """
+    referenced = set()
+    for declaration in get_declarations(rules):
+        name, _, value = declaration.partition(":")
+        if name.strip() in ("animation", "animation-name"):
+            referenced.update(ANIMATION_NAME.findall(value))
+
+    return filter_keyframes(rules, referenced)
+
+
+def get_template_sources() -> dict[str, str]:
+    """
+    Returns the source of every template of the project, by name, in the
+    order of precedence of the template loaders.
+    """
+    directories = [
+        *(pathlib.Path(directory) for directory in settings.TEMPLATES[0]["DIRS"]),
+        *(pathlib.Path(directory) for directory in get_app_template_dirs("templates")),
+    ]
+
+    sources: dict[str, str] = {}
+    for directory in directories:
+        for path in sorted(directory.rglob("*.html")):
+            name = path.relative_to(directory).as_posix()
+            if name != OUTPUT_TEMPLATE:
+                sources.setdefault(name, path.read_text())
+
+    return sources
+
+
+def strip_below_the_fold(source: str) -> str:
+    """
+    Removes what is only displayed once the page is expanded or scrolled: the
+    contents of the collapsed <details> but their <summary>, and the footer.
+    """
+    parts = []
+    position = 0
+    visible = True
+    # Open elements, with whether their parent is displayed
+    stack: list[tuple[str, bool]] = []
+    for match in FOLD_TAG.finditer(source):
+        closing, tag = match[1], match[2].lower()
+        # A <details> opened by a condition, such as on a form error, is
+        # collapsed when the page is first displayed
+        attributes = CONDITIONAL_BLOCK.sub(" ", match[3])
+        if visible:
+            parts.append(source[position : match.start()])
+        position = match.end()
+
+        was_visible = visible
+        if closing:
+            if stack:
+                visible = stack.pop()[1]
+        elif tag == "summary" and stack and stack[-1][0] == "details":
+            # Displayed with its <details>, even collapsed
+            stack.append((tag, visible))
+            visible = stack[-2][1]
+        else:
+            stack.append((tag, visible))
+            if tag == "footer" or not OPEN_ATTRIBUTE.search(attributes):
+                visible = False
+
+        if was_visible or visible:
+            parts.append(match[0])
+
+    if visible:
+        parts.append(source[position:])
+
+    return "".join(parts)
+
+
+def get_page_sources() -> list[str]:
+    """
+    Returns the sources of the templates of the public vehicle page, as
+    displayed when it opens.
+    """
+    sources = get_template_sources()
+    return [strip_below_the_fold(sources[name]) for name in PAGE_TEMPLATES]
+
+
+def get_output_path() -> pathlib.Path:
+    return (
+        pathlib.Path(apps.get_app_config("main").path) / "templates" / (OUTPUT_TEMPLATE)
+    )
+
+
+def read_static_file(name: str) -> str:
+    with open(finders.find(name)) as file:
+        return file.read()
+
+
+def build() -> str:
+    """
+    Returns the template inlining the critical part of the stylesheet.
+    """
+    usage = Usage()
+    for source in get_page_sources():
+        usage.add_template(source)
+
+    rules = prune_keyframes(shake(parse(read_static_file(STYLESHEET)), usage))
+    rules = prune_custom_properties(
+        rules, "".join(read_static_file(name) for name in OTHER_STYLESHEETS)
+    )
+
+    return (
+        f"{{# Generated by manage.py build_critical_css from {STYLESHEET}, "
+        "do not edit #}\n"
+        f"{{% verbatim %}}<style>{serialize(rules)}</style>{{% endverbatim %}}\n"
+    )
@@ -0,0 +1,56 @@
+"""
+Writes run again when SQLite reports a locked database.
+
+Writers wait for each other up to the busy_timeout of the connection (see the
+SQLite settings). A burst of writes, such as a team ending its trips at once,
+may still exhaust it: the transaction is then rolled back and run again after
+an exponential, randomized delay, rather than failing the request.
+"""
+
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+LOCKED_MESSAGES = ("database is locked", "database table is locked")
+
+
+def is_database_locked(error: OperationalError) -> bool:
+    return any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+def retry_on_database_lock(func):
+    """
+    Runs the decorated function in a transaction, run again on a locked
+    database. Its side effects outside the database should happen last.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Only the outermost transaction can be run again, the lock error is
+        # left to the caller which opened it
+        if connection.in_atomic_block:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+
+        attempt = 0
+        while True:
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if (
+                    attempt >= settings.CARBON_DATABASE_LOCK_RETRIES
+                    or not is_database_locked(error)
+                ):
+                    raise
+
+            # Randomized so that the writers which collided do not retry
+            # together
+            delay = settings.CARBON_DATABASE_LOCK_BACKOFF * 2**attempt
+            time.sleep(random.uniform(delay / 2, delay))
+            attempt += 1
+
+    return wrapper
@@ -0,0 +1,189 @@
+"""
+CSV exports of the trips, defects and fuel expenses, for the accounting.
+
+The rows are streamed as they are read from the database: the queryset is
+iterated by chunks of plain tuples, with the vehicle joined in the same query,
+so that the memory used does not depend on the size of the export.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+from dataclasses import dataclass
+
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from django.utils.translation import gettext_lazy
+
+from .models import Defect, FuelExpense, TripHistory, Vehicle
+from .routers import REPLICA_DB_ALIAS, has_replica
+
+# Rows fetched from the database at once
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    File-like object handing back what the CSV writer writes to it.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def get_field(model: type[models.Model], path: str) -> models.Field:
+    *relations, name = path.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def format_value(value, choices: dict | None):
+    if choices is not None:
+        return choices.get(value, value)
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, bool):
+        return _("oui") if value else _("non")
+    return value
+
+
+@dataclass(frozen=True)
+class Export:
+    model: type[models.Model]
+    filename: str
+    # Filtered by the period of the export, and ordering the rows
+    date_field: str
+    # Lookups of the values, with their header
+    columns: list[tuple[str, str]]
+
+    def filter(
+        self,
+        queryset: models.QuerySet,
+        start: datetime.date | None = None,
+        end: datetime.date | None = None,
+        vehicle: Vehicle | None = None,
+    ) -> models.QuerySet:
+        """
+        Returns the rows of the given vehicle between the given dates, included.
+        """
+        bounds = {}
+        if isinstance(get_field(self.model, self.date_field), models.DateTimeField):
+            # Compared to local midnights rather than by date, to use the indexes
+            if start is not None:
+                bounds["gte"] = timezone.make_aware(
+                    datetime.datetime.combine(start, datetime.time.min)
+                )
+            if end is not None:
+                bounds["lt"] = timezone.make_aware(
+                    datetime.datetime.combine(
+                        end + datetime.timedelta(days=1), datetime.time.min
+                    )
+                )
+        else:
+            if start is not None:
+                bounds["gte"] = start
+            if end is not None:
+                bounds["lte"] = end
+
+        queryset = queryset.filter(
+            **{
+                f"{self.date_field}__{lookup}": value
+                for lookup, value in bounds.items()
+            }
+        )
+        if vehicle is not None:
+            queryset = queryset.filter(vehicle=vehicle)
+
+        return queryset
+
+    def stream(self, queryset: models.QuerySet) -> StreamingHttpResponse:
+        """
+        Returns a response streaming the given rows as CSV.
+        """
+        if has_replica():
+            # Read when the response is sent, after the view returned
+            queryset = queryset.using(REPLICA_DB_ALIAS)
+
+        lookups = [lookup for lookup, header in self.columns]
+        choices = []
+        for lookup in lookups:
+            field = get_field(queryset.model, lookup)
+            choices.append(dict(field.flatchoices) if field.choices else None)
+
+        rows = (
+            queryset.order_by(self.date_field, "pk")
+            .values_list(*lookups)
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        writer = csv.writer(Echo())
+
+        def generate_lines():
+            yield writer.writerow([str(header) for lookup, header in self.columns])
+            for row in rows:
+                yield writer.writerow(
+                    [format_value(*value) for value in zip(row, choices)]
+                )
+
+        return StreamingHttpResponse(
+            generate_lines(),
+            content_type="text/csv",
+            headers={
+                "Content-Disposition": f'attachment; filename="{self.filename}.csv"'
+            },
+        )
+
+
+VEHICLE_COLUMNS = [
+    ("vehicle__name", gettext_lazy("Véhicule")),
+    ("vehicle__registration_number", gettext_lazy("Immatriculation")),
+]
+
+# Including the archived trips
+TRIPS = Export(
+    TripHistory,
+    "trajets",
+    "starting_time",
+    [
+        *VEHICLE_COLUMNS,
+        ("starting_time", gettext_lazy("Départ")),
+        ("ending_time", gettext_lazy("Arrivée")),
+        ("starting_mileage", gettext_lazy("Kilométrage de départ")),
+        ("ending_mileage", gettext_lazy("Kilométrage d'arrivée")),
+        ("driver_name", gettext_lazy("Conducteur")),
+        ("purpose", gettext_lazy("Motif")),
+        ("finished", gettext_lazy("Terminé")),
+    ],
+)
+
+DEFECTS = Export(
+    Defect,
+    "anomalies",
+    "creation_date",
+    [
+        *VEHICLE_COLUMNS,
+        ("creation_date", gettext_lazy("Date de création")),
+        ("solution_date", gettext_lazy("Date de résolution")),
+        ("status", gettext_lazy("Statut")),
+        ("severity", gettext_lazy("Gravité")),
+        ("reporter_name", gettext_lazy("Signalée par")),
+        ("comment", gettext_lazy("Notes")),
+    ],
+)
+
+FUEL_EXPENSES = Export(
+    FuelExpense,
+    "carburant",
+    "date",
+    [
+        *VEHICLE_COLUMNS,
+        ("date", gettext_lazy("Date")),
+        ("mileage", gettext_lazy("Kilométrage")),
+        ("amount", gettext_lazy("Montant / €")),
+        ("quantity", gettext_lazy("Quantité / L")),
+        ("form_of_payment", gettext_lazy("Moyen de paiement")),
+    ],
+)
@@ -1,8 +1,9 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.utils.translation import gettext as _
 
-from main.models import Defect, FuelExpense, Trip
+from main.models import Defect, FuelExpense, Location, Trip, Vehicle
 
 
 class DateTimeLocalInput(forms.DateTimeInput):
@@ -94,3 +95,74 @@ class FuelExpenseForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if vehicle and not self.is_bound and not self.instance.pk:
             self.fields["mileage"].initial = vehicle.mileage
+
+
+class VehicleFilterForm(forms.Form):
+    q = forms.CharField(label=_("Rechercher"), required=False)
+    status = forms.ChoiceField(
+        label=_("Statut"),
+        choices=[("", "---------")] + Vehicle.VehicleStatus.choices,
+        required=False,
+    )
+    type = forms.ChoiceField(
+        label=_("Type"),
+        choices=[("", "---------")] + Vehicle.VehicleType.choices,
+        required=False,
+    )
+    fuel = forms.ChoiceField(
+        label=_("Carburant"),
+        choices=[("", "---------")] + Vehicle.FuelChoice.choices,
+        required=False,
+    )
+    location = forms.ModelChoiceField(
+        label=_("Localisation"), queryset=Location.objects.all(), required=False
+    )
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+
+        if self.cleaned_data["q"]:
+            queryset = queryset.filter(
+                Q(name__icontains=self.cleaned_data["q"])
+                | Q(registration_number__icontains=self.cleaned_data["q"])
+            )
+
+        for field in ["status", "type", "fuel"]:
+            if self.cleaned_data[field]:
+                queryset = queryset.filter(**{field: self.cleaned_data[field]})
+
+        if self.cleaned_data["location"]:
+            queryset = queryset.filter(parking_location=self.cleaned_data["location"])
+
+        return queryset
+
+
+class PeriodForm(forms.Form):
+    start = forms.DateField(
+        label=_("Du"),
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}, format="%Y-%m-%d"),
+    )
+    end = forms.DateField(
+        label=_("Au"),
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}, format="%Y-%m-%d"),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and start > end:
+            raise ValidationError(_("La date de début doit précéder la date de fin"))
+        return cleaned_data
+
+
+class UsageDashboardForm(forms.Form):
+    year = forms.IntegerField(label=_("Année"), min_value=2000, max_value=9999)
+
+
+class ExportForm(PeriodForm):
+    vehicle = forms.ModelChoiceField(
+        Vehicle.objects.all(), label=_("Véhicule"), required=False
+    )
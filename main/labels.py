@@ -0,0 +1,184 @@
+"""
+Printable A4 sheets of vehicle labels, generated in the background by the
+process_label_jobs command.
+
+Encoding the QR codes is CPU bound, so the sheets are rendered as SVG by a
+pool of processes. They are then assembled in a single HTML document, printed
+from the browser with one sheet per page.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import datetime
+import os
+import re
+
+import django
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from . import qr_codes
+from .models import LabelSheetJob
+
+# Dimensions in millimetres
+PAGE_WIDTH = 210
+PAGE_HEIGHT = 297
+COLUMNS = 3
+ROWS = 4
+CELL_WIDTH = PAGE_WIDTH / COLUMNS
+CELL_HEIGHT = PAGE_HEIGHT / ROWS
+QR_CODE_SIZE = 50
+QR_CODE_MARGIN = 6
+
+LABELS_PER_SHEET = COLUMNS * ROWS
+
+# Time during which a job claimed by a worker is not handed to another one,
+# renewed after each sheet
+GENERATION_LEASE = datetime.timedelta(minutes=5)
+
+SVG_SIZE = re.compile(r'\s(?:width|height)="[^"]*"')
+
+# A label is the name, the registration number and the URL of a vehicle
+Label = tuple[str, str, str]
+
+
+def place_svg(svg: str, x: float, y: float, size: float) -> str:
+    """
+    Positions an inline SVG, which keeps its viewBox, in the sheet.
+    """
+    tag_end = svg.index(">")
+    tag = SVG_SIZE.sub("", svg[:tag_end])
+    return f'{tag} x="{x}" y="{y}" width="{size}" height="{size}"{svg[tag_end:]}'
+
+
+def render_sheet(labels: list[Label]) -> str:
+    """
+    Returns the SVG of a sheet. Run in the processes of the pool.
+    """
+    svgs = qr_codes.get_qr_codes(url for _name, _number, url in labels)
+
+    cells = []
+    for i, (name, registration_number, url) in enumerate(labels):
+        x = i % COLUMNS * CELL_WIDTH
+        y = i // COLUMNS * CELL_HEIGHT
+        cells.append(
+            {
+                "x": x,
+                "y": y,
+                "center": x + CELL_WIDTH / 2,
+                "qr_code": mark_safe(
+                    place_svg(
+                        svgs[url],
+                        x + (CELL_WIDTH - QR_CODE_SIZE) / 2,
+                        y + QR_CODE_MARGIN,
+                        QR_CODE_SIZE,
+                    )
+                ),
+                "name": name,
+                "name_y": y + QR_CODE_MARGIN + QR_CODE_SIZE + 6,
+                "registration_number": registration_number,
+                "registration_number_y": y + QR_CODE_MARGIN + QR_CODE_SIZE + 12,
+            }
+        )
+
+    return render_to_string(
+        "main/labels/sheet.svg",
+        {
+            "width": PAGE_WIDTH,
+            "height": PAGE_HEIGHT,
+            "cell_width": CELL_WIDTH,
+            "cell_height": CELL_HEIGHT,
+            "labels": cells,
+        },
+    )
+
+
+def claim_job() -> LabelSheetJob | None:
+    """
+    Returns the oldest pending job, or running one whose lease expired, marked
+    as running so that concurrent workers do not generate it twice.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        job = (
+            LabelSheetJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=LabelSheetJob.JobStatus.PENDING)
+                | Q(status=LabelSheetJob.JobStatus.RUNNING, lease_expires_at__lt=now)
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = LabelSheetJob.JobStatus.RUNNING
+        job.lease_expires_at = now + GENERATION_LEASE
+        job.save(update_fields=["status", "lease_expires_at"])
+
+    return job
+
+
+def generate_job(job: LabelSheetJob, workers: int | None = None):
+    """
+    Renders the sheets of a job in a pool of processes, recording the
+    progress as they are done, and stores the document in its file.
+    """
+    labels = [
+        (
+            vehicle.name,
+            vehicle.registration_number,
+            qr_codes.get_vehicle_url(job.site_url, vehicle.pk),
+        )
+        for vehicle in job.vehicles.order_by("name")
+    ]
+    pages = [
+        labels[start : start + LABELS_PER_SHEET]
+        for start in range(0, len(labels), LABELS_PER_SHEET)
+    ]
+
+    job.sheet_count = len(pages)
+    job.sheets_done = 0
+    job.save(update_fields=["sheet_count", "sheets_done"])
+
+    sheets = []
+    # The processes only render, the database is only used from here
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(), initializer=django.setup
+    ) as executor:
+        for sheet in executor.map(render_sheet, pages):
+            sheets.append(mark_safe(sheet))
+            job.sheets_done = len(sheets)
+            job.lease_expires_at = timezone.now() + GENERATION_LEASE
+            job.save(update_fields=["sheets_done", "lease_expires_at"])
+
+    document = render_to_string("main/labels/sheets.html", {"sheets": sheets})
+    job.file.save(f"labels-{job.pk}.html", ContentFile(document), save=False)
+    job.status = LabelSheetJob.JobStatus.DONE
+    job.finished_at = timezone.now()
+    job.last_error = ""
+    job.save(update_fields=["file", "status", "finished_at", "last_error"])
+
+
+def process_label_jobs(workers: int | None = None) -> int:
+    """
+    Generates the pending jobs. Returns the number of jobs processed.
+    """
+    processed = 0
+    while (job := claim_job()) is not None:
+        try:
+            generate_job(job, workers)
+        except Exception as error:
+            job.status = LabelSheetJob.JobStatus.FAILED
+            job.finished_at = timezone.now()
+            job.last_error = repr(error)
+            job.save(update_fields=["status", "finished_at", "last_error"])
+        processed += 1
+
+    return processed
@@ -0,0 +1,76 @@
+import datetime
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from main import archive
+
+
+class Command(BaseCommand):
+    help = "Moves the old finished trips to the archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CARBON_TRIP_ARCHIVE_DAYS,
+            help="Age in days of the trips to archive",
+        )
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=settings.CARBON_TRIP_ARCHIVE_KEEP,
+            help="Latest finished trips of each vehicle never archived",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Trips moved in each transaction",
+        )
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running and archive the trips periodically until interrupted",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=24 * 60 * 60,
+            help="Seconds between two archivals in daemon mode",
+        )
+
+    def handle(self, *args, **options):
+        if options["keep"] < 1:
+            # The last trip of a vehicle gives its last trip distance
+            raise CommandError("--keep doit être au moins 1")
+
+        while True:
+            before = timezone.now() - datetime.timedelta(days=options["days"])
+            try:
+                archived = archive.archive_trips(
+                    before, options["keep"], options["batch_size"]
+                )
+            except Exception:
+                if not options["daemon"]:
+                    raise
+                # Such as a locked database: the batches already moved are
+                # kept, the others are archived at the next run
+                self.stderr.write(traceback.format_exc())
+                close_old_connections()
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(f"{archived} trajet(s) archivé(s)")
+                )
+
+            if not options["daemon"]:
+                return
+
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
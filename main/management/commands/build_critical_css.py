@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import critical_css
+
+
+class Command(BaseCommand):
+    help = (
+        "Inlines in the public vehicle page the rules of pico.css it displays "
+        "when it opens, before the full stylesheet is loaded"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with an error if the critical CSS is outdated, without writing it",
+        )
+
+    def handle(self, *args, **options):
+        template = critical_css.build()
+        output_path = critical_css.get_output_path()
+        current = output_path.read_text() if output_path.exists() else None
+
+        if options["check"]:
+            if template != current:
+                raise CommandError(
+                    "Le CSS critique n'est plus à jour, "
+                    "lancer manage.py build_critical_css"
+                )
+            return
+
+        output_path.write_text(template)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"CSS critique écrit dans {output_path} ({len(template)} octets)"
+            )
+        )
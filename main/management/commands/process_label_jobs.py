@@ -0,0 +1,53 @@
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main import labels
+
+
+class Command(BaseCommand):
+    help = "Generates the label sheets requested from the administration"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running and poll the pending jobs until interrupted",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10,
+            help="Seconds between two polls in daemon mode",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes rendering the sheets, by default one per CPU",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                processed = labels.process_label_jobs(options["workers"])
+            except Exception:
+                if not options["daemon"]:
+                    raise
+                # Such as a locked database: the jobs are polled again later,
+                # a claimed one once its lease expired
+                self.stderr.write(traceback.format_exc())
+                close_old_connections()
+                processed = 0
+            if processed:
+                self.stdout.write(f"{processed} planche(s) d'étiquettes générée(s)")
+
+            if not options["daemon"]:
+                return
+
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,55 @@
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main import utils
+
+
+class Command(BaseCommand):
+    help = "Sends the notifications waiting in the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--daemon",
+            action="store_true",
+            help="Keep running and poll the outbox until interrupted",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10,
+            help="Seconds between two polls in daemon mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Maximum number of notifications sent over one connection",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent = utils.deliver_notifications(options["batch_size"])
+            except Exception:
+                if not options["daemon"]:
+                    raise
+                # Such as a locked database: the outbox is polled again later
+                # rather than left undelivered until the container restarts
+                self.stderr.write(traceback.format_exc())
+                close_old_connections()
+                sent = 0
+            if sent:
+                self.stdout.write(f"{sent} notification(s) envoyée(s)")
+
+            if not options["daemon"]:
+                return
+
+            # Drain the outbox before waiting for new notifications
+            if sent < options["batch_size"]:
+                try:
+                    time.sleep(options["interval"])
+                except KeyboardInterrupt:
+                    return
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the stored odometer of every vehicle from its trip history"
+
+    def handle(self, *args, **options):
+        vehicles = Vehicle.objects.all()
+
+        for vehicle in vehicles.iterator():
+            vehicle.refresh_mileage()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{vehicles.count()} véhicule(s) mis à jour")
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main import usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the monthly usage of every vehicle from its trips and fuel expenses"
+    )
+
+    def handle(self, *args, **options):
+        count = usage.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"{count} mois de véhicule recalculé(s)"))
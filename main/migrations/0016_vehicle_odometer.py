@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+def populate_odometer(apps, schema_editor):
+    Vehicle = apps.get_model("main", "Vehicle")
+    Trip = apps.get_model("main", "Trip")
+
+    for vehicle in Vehicle.objects.all():
+        trips = Trip.objects.filter(vehicle=vehicle)
+        vehicle.current_mileage = (
+            trips.aggregate(models.Max("ending_mileage"))["ending_mileage__max"] or 0
+        )
+
+        last_trip = (
+            trips.filter(finished=True, ending_time__isnull=False)
+            .order_by("-ending_time")
+            .first()
+        )
+        if last_trip:
+            vehicle.last_trip_ending_time = last_trip.ending_time
+            if last_trip.starting_mileage and last_trip.ending_mileage:
+                vehicle.last_trip_distance = (
+                    last_trip.ending_mileage - last_trip.starting_mileage
+                )
+
+        vehicle.save(
+            update_fields=[
+                "current_mileage",
+                "last_trip_distance",
+                "last_trip_ending_time",
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0015_defect_severity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vehicle",
+            name="current_mileage",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="kilométrage"
+            ),
+        ),
+        migrations.AddField(
+            model_name="vehicle",
+            name="last_trip_distance",
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="distance du dernier trajet",
+            ),
+        ),
+        migrations.AddField(
+            model_name="vehicle",
+            name="last_trip_ending_time",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="fin du dernier trajet",
+            ),
+        ),
+        migrations.RunPython(populate_odometer, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0016_vehicle_odometer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Notification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("subject", models.TextField(verbose_name="objet")),
+                (
+                    "from_email",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="expéditeur"
+                    ),
+                ),
+                ("recipients", models.TextField(verbose_name="destinataires")),
+                ("text_body", models.TextField(verbose_name="contenu")),
+                (
+                    "html_body",
+                    models.TextField(blank=True, verbose_name="contenu HTML"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "En attente"),
+                            ("SENT", "Envoyée"),
+                            ("FAILED", "En échec"),
+                        ],
+                        default="PENDING",
+                        max_length=255,
+                        verbose_name="statut",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="tentatives"),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="dernière erreur"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="création"
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="prochaine tentative",
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="envoi"),
+                ),
+            ],
+            options={
+                "verbose_name": "notification",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="main_notifi_status_6c068d_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0017_notification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="digest",
+            field=models.BooleanField(
+                default=False,
+                help_text="En attente de regroupement avec les notifications suivantes",
+                verbose_name="à regrouper",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="kind",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("DEFECT", "Anomalie"),
+                    ("TRIP_DISCREPANCY", "Trajet manquant"),
+                    ("TRIP_ABORT", "Trajet abandonné"),
+                    ("DIGEST", "Récapitulatif"),
+                ],
+                max_length=255,
+                verbose_name="type",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="merged_into",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="merged_notifications",
+                to="main.notification",
+                verbose_name="récapitulatif",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "En attente"),
+                    ("SENT", "Envoyée"),
+                    ("FAILED", "En échec"),
+                    ("MERGED", "Regroupée"),
+                ],
+                default="PENDING",
+                max_length=255,
+                verbose_name="statut",
+            ),
+        ),
+    ]
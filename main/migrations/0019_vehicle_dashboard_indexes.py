@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0018_notification_digest"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(fields=["name"], name="main_vehicl_name_44caaf_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(
+                fields=["registration_number"], name="main_vehicl_registr_b6e955_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(
+                fields=["status", "name"], name="main_vehicl_status_023045_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(
+                fields=["type", "name"], name="main_vehicl_type_9e2946_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(
+                fields=["fuel", "name"], name="main_vehicl_fuel_e4abc0_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+import main.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0019_vehicle_dashboard_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ApiToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        default=main.models.generate_api_token_key,
+                        editable=False,
+                        max_length=64,
+                        unique=True,
+                        verbose_name="clé",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="nom")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="création"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="utilisateur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "jeton d'API",
+                "verbose_name_plural": "jetons d'API",
+            },
+        ),
+    ]
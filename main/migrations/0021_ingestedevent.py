@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0020_apitoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestedEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="clé d'idempotence"
+                    ),
+                ),
+                ("kind", models.CharField(max_length=255, verbose_name="type")),
+                (
+                    "received_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="réception"
+                    ),
+                ),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="main.vehicle",
+                        verbose_name="véhicule",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "événement synchronisé",
+                "verbose_name_plural": "événements synchronisés",
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+def close_duplicate_open_trips(apps, schema_editor):
+    """
+    Keeps the latest unfinished trip of each vehicle open and marks the
+    others, left by concurrent starts, as finished (aborted).
+    """
+    Trip = apps.get_model("main", "Trip")
+
+    open_trips = Trip.objects.filter(finished=False).order_by(
+        "vehicle", "-starting_time", "-pk"
+    )
+    kept_vehicles = set()
+    duplicates = []
+    for pk, vehicle_id in open_trips.values_list("pk", "vehicle_id"):
+        if vehicle_id in kept_vehicles:
+            duplicates.append(pk)
+        else:
+            kept_vehicles.add(vehicle_id)
+
+    Trip.objects.filter(pk__in=duplicates).update(finished=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0021_ingestedevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_trips, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="trip",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("finished", False)),
+                fields=("vehicle",),
+                name="main_trip_single_open_per_vehicle",
+                violation_error_message="Un trajet est déjà en cours !",
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0022_trip_single_open_per_vehicle"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LabelSheetJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "site_url",
+                    models.CharField(
+                        help_text="Préfixe des adresses encodées dans les QR codes",
+                        max_length=255,
+                        verbose_name="adresse du site",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "En attente"),
+                            ("RUNNING", "En cours"),
+                            ("DONE", "Terminée"),
+                            ("FAILED", "En échec"),
+                        ],
+                        default="PENDING",
+                        max_length=255,
+                        verbose_name="statut",
+                    ),
+                ),
+                (
+                    "sheet_count",
+                    models.PositiveIntegerField(default=0, verbose_name="planches"),
+                ),
+                (
+                    "sheets_done",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="planches générées"
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True, upload_to="labels/", verbose_name="fichier"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="dernière erreur"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="création"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="fin"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="demandée par",
+                    ),
+                ),
+                (
+                    "vehicles",
+                    models.ManyToManyField(to="main.vehicle", verbose_name="véhicules"),
+                ),
+            ],
+            options={
+                "verbose_name": "planche d'étiquettes",
+                "verbose_name_plural": "planches d'étiquettes",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="main_labels_status_0a3fd4_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0023_labelsheetjob"),
+    ]
+
+    operations = [
+        # The composite indexes replace the ones of the foreign keys alone
+        migrations.AddIndex(
+            model_name="defect",
+            index=models.Index(
+                fields=["vehicle", "status"], name="main_defect_vehicle_6bc742_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fuelexpense",
+            index=models.Index(
+                fields=["vehicle", "date"], name="main_fuelex_vehicle_a26643_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["vehicle", "ending_mileage"],
+                name="main_trip_vehicle_3c9f77_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                condition=models.Q(("ending_time__isnull", False), ("finished", True)),
+                fields=["vehicle", "ending_time"],
+                name="main_trip_last_finished_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="defect",
+            name="vehicle",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="main.vehicle",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="fuelexpense",
+            name="vehicle",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="main.vehicle",
+                verbose_name="véhicule",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trip",
+            name="vehicle",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="main.vehicle",
+                verbose_name="véhicule",
+            ),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+TRIP_COLUMNS = (
+    "id, vehicle_id, starting_mileage, ending_mileage, starting_time, "
+    "ending_time, driver_name, purpose, finished"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0024_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedTrip",
+            fields=[
+                (
+                    "starting_mileage",
+                    models.PositiveIntegerField(verbose_name="kilométrage de départ"),
+                ),
+                (
+                    "ending_mileage",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="kilométrage d'arrivée"
+                    ),
+                ),
+                (
+                    "starting_time",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="heure de départ",
+                    ),
+                ),
+                (
+                    "ending_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="heure d'arrivée"
+                    ),
+                ),
+                (
+                    "driver_name",
+                    models.CharField(max_length=255, verbose_name="nom du conducteur"),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        max_length=255, verbose_name="motif du déplacement"
+                    ),
+                ),
+                (
+                    "finished",
+                    models.BooleanField(
+                        default=False, editable=False, verbose_name="terminé"
+                    ),
+                ),
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "archived_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="archivé le"
+                    ),
+                ),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="main.vehicle",
+                        verbose_name="véhicule",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "trajet archivé",
+                "verbose_name_plural": "trajets archivés",
+                "indexes": [
+                    models.Index(
+                        fields=["vehicle", "starting_time"],
+                        name="main_archiv_vehicle_615268_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TripHistory",
+            fields=[
+                (
+                    "starting_mileage",
+                    models.PositiveIntegerField(verbose_name="kilométrage de départ"),
+                ),
+                (
+                    "ending_mileage",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="kilométrage d'arrivée"
+                    ),
+                ),
+                (
+                    "starting_time",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="heure de départ",
+                    ),
+                ),
+                (
+                    "ending_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="heure d'arrivée"
+                    ),
+                ),
+                (
+                    "driver_name",
+                    models.CharField(max_length=255, verbose_name="nom du conducteur"),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        max_length=255, verbose_name="motif du déplacement"
+                    ),
+                ),
+                (
+                    "finished",
+                    models.BooleanField(
+                        default=False, editable=False, verbose_name="terminé"
+                    ),
+                ),
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("archived", models.BooleanField(verbose_name="archivé")),
+            ],
+            options={
+                "verbose_name": "historique des trajets",
+                "verbose_name_plural": "historique des trajets",
+                "db_table": "main_trip_history",
+                "managed": False,
+            },
+        ),
+        # The hot and the archived trips, read together
+        migrations.RunSQL(
+            f"CREATE VIEW main_trip_history AS "
+            f"SELECT {TRIP_COLUMNS}, FALSE AS archived FROM main_trip "
+            f"UNION ALL "
+            f"SELECT {TRIP_COLUMNS}, TRUE AS archived FROM main_archivedtrip",
+            "DROP VIEW main_trip_history",
+        ),
+    ]
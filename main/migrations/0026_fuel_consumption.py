@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_consumptions(apps, schema_editor):
+    from main import consumption
+
+    consumption.rebuild(
+        apps.get_model("main", "FuelExpense"), apps.get_model("main", "FuelConsumption")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0025_trip_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FuelConsumption",
+            fields=[
+                (
+                    "expense",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="consumption",
+                        serialize=False,
+                        to="main.fuelexpense",
+                        verbose_name="dépense de carburant",
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="date")),
+                (
+                    "distance",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        null=True,
+                        verbose_name="distance depuis le plein précédent",
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=5, verbose_name="montant / €"
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=5, verbose_name="quantité / L"
+                    ),
+                ),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="main.vehicle",
+                        verbose_name="véhicule",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "consommation de carburant",
+                "verbose_name_plural": "consommations de carburant",
+                "indexes": [
+                    models.Index(
+                        fields=["vehicle", "date"],
+                        name="main_fuelco_vehicle_35cabc_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_consumptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:09
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_usages(apps, schema_editor):
+    from main import usage
+
+    usage.rebuild(
+        [apps.get_model("main", "Trip"), apps.get_model("main", "ArchivedTrip")],
+        apps.get_model("main", "FuelExpense"),
+        apps.get_model("main", "MonthlyUsage"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0026_fuel_consumption"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(verbose_name="mois")),
+                (
+                    "trip_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="nombre de trajets"
+                    ),
+                ),
+                (
+                    "distance",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="distance / km"
+                    ),
+                ),
+                (
+                    "duration",
+                    models.DurationField(
+                        default=datetime.timedelta, verbose_name="durée d'utilisation"
+                    ),
+                ),
+                (
+                    "fuel_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=9,
+                        verbose_name="carburant / €",
+                    ),
+                ),
+                (
+                    "fuel_quantity",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=9,
+                        verbose_name="carburant / L",
+                    ),
+                ),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="main.vehicle",
+                        verbose_name="véhicule",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "utilisation mensuelle",
+                "verbose_name_plural": "utilisations mensuelles",
+                "indexes": [
+                    models.Index(fields=["month"], name="main_monthl_month_b58dcd_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("vehicle", "month"),
+                        name="main_monthlyusage_vehicle_month",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_usages, migrations.RunPython.noop),
+    ]
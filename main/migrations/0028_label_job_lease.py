@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0027_monthly_usage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="labelsheetjob",
+            name="lease_expires_at",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="fin du bail"
+            ),
+        ),
+    ]
@@ -1,21 +1,68 @@
 from __future__ import annotations
 
 import datetime
+import secrets
+import threading
+import time
 import uuid
-from typing import Any
+from typing import Any, Iterable, Optional
 
+from django.conf import settings
 from django.contrib import admin
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Greatest
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
 
+class VehicleQuerySet(models.QuerySet["Vehicle"]):
+    def with_mileage(self):
+        """
+        Annotates each vehicle with the mileage computed from its trip history.
+        """
+        return self.annotate(
+            trip_mileage=models.Subquery(
+                Trip.objects.filter(
+                    vehicle=models.OuterRef("pk"), ending_mileage__isnull=False
+                )
+                .order_by("-ending_mileage")
+                .values("ending_mileage")[:1]
+            )
+        )
+
+    def with_open_defect_count(self):
+        return self.annotate(
+            open_defect_total=models.Count(
+                "defect",
+                filter=models.Q(defect__status__in=Defect.OPEN_STATUSES),
+            )
+        )
+
+    def with_current_trip(self):
+        current_trips = Trip.objects.filter(
+            vehicle=models.OuterRef("pk"), finished=False
+        )
+        return self.annotate(
+            trip_started=models.Exists(current_trips),
+            current_trip_id=models.Subquery(current_trips.values("pk")[:1]),
+        )
+
+
 class Vehicle(models.Model):
     class Meta:
         verbose_name = _("véhicule")
+        indexes = [
+            # Dashboard filters and ordering
+            models.Index(fields=["name"]),
+            models.Index(fields=["registration_number"]),
+            models.Index(fields=["status", "name"]),
+            models.Index(fields=["type", "name"]),
+            models.Index(fields=["fuel", "name"]),
+        ]
 
     class VehicleType(models.TextChoices):
         VTP = "VTP", _("VTP - Véhicule de Transport de Personnel")
@@ -59,22 +106,88 @@ class Vehicle(models.Model):
         max_length=255,
     )
     inventory = models.URLField(_("inventaire"), null=True, blank=True)
+    current_mileage = models.PositiveIntegerField(
+        _("kilométrage"), default=0, editable=False
+    )
+    last_trip_distance = models.PositiveIntegerField(
+        _("distance du dernier trajet"), null=True, blank=True, editable=False
+    )
+    last_trip_ending_time = models.DateTimeField(
+        _("fin du dernier trajet"), null=True, blank=True, editable=False
+    )
+
+    # Maintained from the trips, never written by a regular save
+    ODOMETER_FIELDS = ["current_mileage", "last_trip_distance", "last_trip_ending_time"]
+
+    objects = VehicleQuerySet.as_manager()
 
     trip_set: models.QuerySet["Trip"]
     defect_set: models.QuerySet["Defect"]
 
     @property
-    @admin.display(description=_("Kilométrage"))
+    @admin.display(description=_("Kilométrage"), ordering="current_mileage")
     def mileage(self) -> int:
-        latest_trip = (
-            self.trip_set.filter(ending_mileage__isnull=False)
-            .order_by("-ending_mileage")
+        # Set by VehicleQuerySet.with_mileage()
+        trip_mileage = getattr(self, "trip_mileage", None)
+        if trip_mileage is not None:
+            return trip_mileage
+
+        return self.current_mileage
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # Do not overwrite an odometer updated by a trip in the meantime
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.ODOMETER_FIELDS
+            ]
+
+        super().save(*args, **kwargs)
+
+    def record_trip(self, trip: Trip):
+        """
+        Incrementally updates the stored odometer with a newly finished trip.
+        """
+        if trip.ending_mileage is None and trip.ending_time is None:
+            return
+
+        if trip.ending_mileage is not None:
+            Vehicle.objects.filter(pk=self.pk).update(
+                current_mileage=Greatest(
+                    models.F("current_mileage"), models.Value(trip.ending_mileage)
+                )
+            )
+
+        if trip.finished and trip.ending_time is not None:
+            Vehicle.objects.filter(pk=self.pk).filter(
+                models.Q(last_trip_ending_time__isnull=True)
+                | models.Q(last_trip_ending_time__lte=trip.ending_time)
+            ).update(
+                last_trip_distance=trip.distance(),
+                last_trip_ending_time=trip.ending_time,
+            )
+
+        self.refresh_from_db(fields=self.ODOMETER_FIELDS)
+
+    def refresh_mileage(self):
+        """
+        Rebuilds the stored odometer from the whole trip history.
+        """
+        self.current_mileage = (
+            self.trip_set.aggregate(models.Max("ending_mileage"))["ending_mileage__max"]
+            or 0
+        )
+
+        last_trip = (
+            self.trip_set.filter(finished=True, ending_time__isnull=False)
+            .order_by("-ending_time")
             .first()
         )
-        if latest_trip and latest_trip.ending_mileage:
-            return latest_trip.ending_mileage
-        else:
-            return 0
+        self.last_trip_distance = last_trip.distance() if last_trip else None
+        self.last_trip_ending_time = last_trip.ending_time if last_trip else None
+
+        self.save(update_fields=self.ODOMETER_FIELDS)
 
     @admin.display(description=_("Voir le véhicule"))
     def public_url(self) -> str:
@@ -89,15 +202,26 @@ class Vehicle(models.Model):
 
     @property
     def open_defects(self) -> models.QuerySet[Defect]:
-        return self.defect_set.filter(
-            models.Q(status=Defect.DefectStatus.OPEN)
-            | models.Q(status=Defect.DefectStatus.CONFIRMED)
-        )
+        return self.defect_set.filter(status__in=Defect.OPEN_STATUSES)
+
+    @property
+    def open_defect_count(self) -> int:
+        # Set by VehicleQuerySet.with_open_defect_count()
+        open_defect_total = getattr(self, "open_defect_total", None)
+        if open_defect_total is not None:
+            return open_defect_total
+
+        return self.open_defects.count()
 
 
 class Defect(models.Model):
     class Meta:
         verbose_name = _("anomalie")
+        indexes = [
+            # Open defects of a vehicle, also used instead of an index on the
+            # foreign key alone
+            models.Index(fields=["vehicle", "status"]),
+        ]
 
     class DefectStatus(models.TextChoices):
         OPEN = "OPEN", _("Ouvert")
@@ -105,11 +229,13 @@ class Defect(models.Model):
         SOLVED = "SOLVED", _("Résolu")
         CANCELLED = "CANCELLED", _("Annulé")
 
+    OPEN_STATUSES = [DefectStatus.OPEN, DefectStatus.CONFIRMED]
+
     class DefectSeverity(models.TextChoices):
         MAJOR = "MAJOR", _("Majeure")
         MINOR = "MINOR", _("Mineure")
 
-    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE)
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, db_index=False)
     status = models.CharField(
         _("statut"), max_length=255, choices=DefectStatus, default=DefectStatus.OPEN
     )
@@ -128,38 +254,36 @@ class Defect(models.Model):
     )
 
     def save(self, *args, **kwargs):
-        # Send an email notification when a defect is created
-        if not self.pk:  # Only send email on creation
-            recipient_list: list[str] = [
-                email.strip()
-                for email in Setting.manager.read("defect_notification_email").split(
-                    ","
-                )
-            ]
-            from_email = Setting.manager.read("from_email")
+        # The notification is queued in the same transaction as the defect
+        with transaction.atomic():
+            # Send an email notification when a defect is created
+            if not self.pk:  # Only send email on creation
+                recipient_list = Setting.manager.read_list("defect_notification_email")
+                from_email = Setting.manager.read("from_email")
 
-            context = {
-                "vehicle": self.vehicle.name,
-                "comment": self.comment,
-                "reporter": self.reporter_name,
-            }
+                context = {
+                    "vehicle": self.vehicle.name,
+                    "comment": self.comment,
+                    "reporter": self.reporter_name,
+                }
 
-            subject = _("Anomalie signalée pour le véhicule {name}").format(
-                name=self.vehicle.name
-            )
+                subject = _("Anomalie signalée pour le véhicule {name}").format(
+                    name=self.vehicle.name
+                )
 
-            from main import utils  # Avoiding circular import issues
+                from main import utils  # Avoiding circular import issues
 
-            utils.send_notification(
-                subject=subject,
-                recipient_list=recipient_list,
-                from_email=from_email,
-                text_template="main/email/defect.txt",
-                html_template="main/email/defect.html",
-                context=context,
-            )
+                utils.send_notification(
+                    subject=subject,
+                    recipient_list=recipient_list,
+                    from_email=from_email,
+                    text_template="main/email/defect.txt",
+                    html_template="main/email/defect.html",
+                    context=context,
+                    kind=Notification.NotificationKind.DEFECT,
+                )
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
 
 class Location(models.Model):
@@ -182,12 +306,16 @@ class Location(models.Model):
         return self.name
 
 
-class Trip(models.Model):
+class BaseTrip(models.Model):
+    """
+    Fields of the trips, in progress or recent (Trip) or archived (ArchivedTrip).
+    """
+
     class Meta:
-        verbose_name = _("trajet")
+        abstract = True
 
     vehicle = models.ForeignKey(
-        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE
+        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE, db_index=False
     )
     starting_mileage = models.PositiveIntegerField(_("kilométrage de départ"))
     ending_mileage = models.PositiveIntegerField(
@@ -213,6 +341,46 @@ class Trip(models.Model):
 
         return None
 
+
+class Trip(BaseTrip):
+    class Meta:
+        verbose_name = _("trajet")
+        constraints = [
+            # Enforced by the database, so that concurrent starts cannot race
+            models.UniqueConstraint(
+                fields=["vehicle"],
+                condition=models.Q(finished=False),
+                name="main_trip_single_open_per_vehicle",
+                violation_error_message=_("Un trajet est déjà en cours !"),
+            )
+        ]
+        # The current trip of a vehicle is found with the unique constraint
+        indexes = [
+            # Odometer of a vehicle, also used instead of an index on the
+            # foreign key alone
+            models.Index(fields=["vehicle", "ending_mileage"]),
+            # Last finished trip of a vehicle
+            models.Index(
+                fields=["vehicle", "ending_time"],
+                condition=models.Q(finished=True, ending_time__isnull=False),
+                name="main_trip_last_finished_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the odometer already knows about this trip
+        instance._recorded = (
+            instance.vehicle_id,
+            instance.finished,
+            instance.ending_mileage,
+            instance.ending_time,
+        )
+        # And where the usage rollups count it
+        instance._counted = instance.get_usage_cell()
+        return instance
+
     def clean(self):
         validation_errors: dict[str, Any] = {}
 
@@ -233,70 +401,172 @@ class Trip(models.Model):
             raise ValidationError(validation_errors)
 
     def save(self, *args, **kwargs):
-        if self.finished:
-            if self.starting_mileage > self.vehicle.mileage + 2:
-                recipient_list = [
-                    email.strip()
-                    for email in Setting.manager.read(
-                        "defect_notification_email"
-                    ).split(",")
-                ]
-                from_email = Setting.manager.read("from_email")
+        with transaction.atomic():
+            self.queue_notifications(self.vehicle.mileage)
+
+            super().save(*args, **kwargs)
+            self._update_vehicle_mileage()
+            self._update_usage()
+
+    def queue_notifications(self, previous_mileage: int):
+        """
+        Notifies the fleet managers of a finished trip which did not start
+        from the previous mileage of the vehicle, or which was aborted.
+        """
+        if not self.finished:
+            return
+
+        if self.starting_mileage > previous_mileage + 2:
+            recipient_list = Setting.manager.read_list("defect_notification_email")
+            from_email = Setting.manager.read("from_email")
 
-                context: dict[str, Any] = {"vehicle": self.vehicle, "trip": self}
+            context: dict[str, Any] = {"vehicle": self.vehicle, "trip": self}
 
-                subject = _("Trajet manquant pour le véhicule {name}").format(
-                    name=self.vehicle.name
-                )
+            subject = _("Trajet manquant pour le véhicule {name}").format(
+                name=self.vehicle.name
+            )
 
-                from main import utils  # Avoiding circular import issues
+            from main import utils  # Avoiding circular import issues
 
-                utils.send_notification(
-                    subject=subject,
-                    recipient_list=recipient_list,
-                    from_email=from_email,
-                    text_template="main/email/trip_discrepancy.txt",
-                    html_template="main/email/trip_discrepancy.html",
-                    context=context,
-                )
+            utils.send_notification(
+                subject=subject,
+                recipient_list=recipient_list,
+                from_email=from_email,
+                text_template="main/email/trip_discrepancy.txt",
+                html_template="main/email/trip_discrepancy.html",
+                context=context,
+                kind=Notification.NotificationKind.TRIP_DISCREPANCY,
+            )
 
-            if not self.ending_mileage and not self.ending_time:
-                # The trip was aborted
-                recipient_list = [
-                    email.strip()
-                    for email in Setting.manager.read(
-                        "defect_notification_email"
-                    ).split(",")
-                ]
-                from_email = Setting.manager.read("from_email")
+        if not self.ending_mileage and not self.ending_time:
+            # The trip was aborted
+            recipient_list = Setting.manager.read_list("defect_notification_email")
+            from_email = Setting.manager.read("from_email")
 
-                context = {"vehicle": self.vehicle, "trip": self}
+            context = {"vehicle": self.vehicle, "trip": self}
 
-                subject = _("Trajet abandonné pour le véhicule {name}").format(
-                    name=self.vehicle.name
-                )
+            subject = _("Trajet abandonné pour le véhicule {name}").format(
+                name=self.vehicle.name
+            )
 
-                from main import utils  # Avoiding circular import issues
+            from main import utils  # Avoiding circular import issues
 
-                utils.send_notification(
-                    subject=subject,
-                    recipient_list=recipient_list,
-                    from_email=from_email,
-                    text_template="main/email/trip_abort.txt",
-                    html_template="main/email/trip_abort.html",
-                    context=context,
-                )
+            utils.send_notification(
+                subject=subject,
+                recipient_list=recipient_list,
+                from_email=from_email,
+                text_template="main/email/trip_abort.txt",
+                html_template="main/email/trip_abort.html",
+                context=context,
+                kind=Notification.NotificationKind.TRIP_ABORT,
+            )
 
-        super().save(*args, **kwargs)
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.vehicle.refresh_mileage()
+            self._update_usage()
+
+        return result
+
+    def get_usage_cell(self):
+        """
+        Returns the vehicle and the time the trip counts at in the usage
+        rollups, if it does.
+        """
+        if not self.finished:
+            return None
+
+        return (self.vehicle_id, self.starting_time)
+
+    def _update_vehicle_mileage(self):
+        recorded = getattr(self, "_recorded", None)
+        current = (
+            self.vehicle_id,
+            self.finished,
+            self.ending_mileage,
+            self.ending_time,
+        )
+
+        if recorded == current:
+            return
+
+        if recorded is not None and recorded[0] != self.vehicle_id:
+            # Moved to another vehicle, whose odometer it may not fit in either
+            Vehicle.objects.get(pk=recorded[0]).refresh_mileage()
+            self.vehicle.refresh_mileage()
+        elif recorded is None or recorded[2:] == (None, None):
+            # New readings only ever move the odometer forward
+            self.vehicle.record_trip(self)
+        else:
+            # An existing reading was corrected, it may not be the latest anymore
+            self.vehicle.refresh_mileage()
+
+        self._recorded = current
+
+    def _update_usage(self):
+        from main import usage  # Avoiding circular import issues
+
+        counted = getattr(self, "_counted", None)
+        current = self.get_usage_cell() if self.pk is not None else None
+
+        # A trip in progress does not count yet
+        usage.refresh(cell for cell in {counted, current} if cell is not None)
+        self._counted = current
+
+
+class ArchivedTrip(BaseTrip):
+    """
+    Finished trip moved out of the Trip table by the archive_trips command,
+    keeping its id.
+    """
+
+    class Meta:
+        verbose_name = _("trajet archivé")
+        verbose_name_plural = _("trajets archivés")
+        indexes = [models.Index(fields=["vehicle", "starting_time"])]
+
+    id = models.BigIntegerField(primary_key=True)
+    archived_at = models.DateTimeField(_("archivé le"), default=timezone.now)
+
+
+class TripHistory(BaseTrip):
+    """
+    Read-only view over both the trips and the archived trips, for the reports
+    and the administration. Created by migration 0025: it must be recreated
+    when the fields of the trips change.
+    """
+
+    class Meta:
+        managed = False
+        db_table = "main_trip_history"
+        verbose_name = _("historique des trajets")
+        verbose_name_plural = _("historique des trajets")
+
+    id = models.BigIntegerField(primary_key=True)
+    # The rows of the view are deleted with the trips
+    vehicle = models.ForeignKey(
+        Vehicle,
+        verbose_name=_("véhicule"),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+    )
+    archived = models.BooleanField(_("archivé"))
 
 
 class FuelExpense(models.Model):
     class Meta:
         verbose_name = _("Dépense de carburant")
         verbose_name_plural = _("Dépenses de carburant")
+        indexes = [
+            # Expenses of a vehicle by date, also used instead of an index on
+            # the foreign key alone
+            models.Index(fields=["vehicle", "date"]),
+        ]
 
     vehicle = models.ForeignKey(
-        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE
+        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE, db_index=False
     )
     date = models.DateField(_("date"), default=datetime.date.today)
     mileage = models.IntegerField(_("kilométrage"), default=0)
@@ -315,23 +585,177 @@ class FuelExpense(models.Model):
         default=FormOfPaymentChoice.FUEL_CARD,
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Where the usage rollups count it
+        instance._counted = (instance.vehicle_id, instance.date)
+        # And whose fill-ups it is paired with
+        instance._paired_vehicle_id = instance.vehicle_id
+        return instance
+
+
+class FuelConsumption(models.Model):
+    """
+    Fuel burnt since the previous fill-up of the vehicle, maintained from the
+    fuel expenses by main.consumption.
+    """
+
+    class Meta:
+        verbose_name = _("consommation de carburant")
+        verbose_name_plural = _("consommations de carburant")
+        indexes = [models.Index(fields=["vehicle", "date"])]
+
+    expense = models.OneToOneField(
+        FuelExpense,
+        verbose_name=_("dépense de carburant"),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="consumption",
+    )
+    vehicle = models.ForeignKey(
+        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE, db_index=False
+    )
+    date = models.DateField(_("date"))
+    # Unknown for the first fill-up of a vehicle, or after an inconsistent
+    # mileage
+    distance = models.PositiveIntegerField(
+        _("distance depuis le plein précédent"), null=True, blank=True
+    )
+    amount = models.DecimalField(_("montant / €"), decimal_places=2, max_digits=5)
+    quantity = models.DecimalField(_("quantité / L"), decimal_places=2, max_digits=5)
+
+
+class MonthlyUsage(models.Model):
+    """
+    Use of a vehicle over a month of local time, maintained from its trips and
+    fuel expenses by main.usage.
+    """
+
+    class Meta:
+        verbose_name = _("utilisation mensuelle")
+        verbose_name_plural = _("utilisations mensuelles")
+        constraints = [
+            # Also used instead of an index on the foreign key alone
+            models.UniqueConstraint(
+                fields=["vehicle", "month"], name="main_monthlyusage_vehicle_month"
+            )
+        ]
+        # Dashboard of every vehicle over a year
+        indexes = [models.Index(fields=["month"])]
+
+    vehicle = models.ForeignKey(
+        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE, db_index=False
+    )
+    # First day of the month
+    month = models.DateField(_("mois"))
+    trip_count = models.PositiveIntegerField(_("nombre de trajets"), default=0)
+    distance = models.PositiveIntegerField(_("distance / km"), default=0)
+    duration = models.DurationField(
+        _("durée d'utilisation"), default=datetime.timedelta
+    )
+    fuel_amount = models.DecimalField(
+        _("carburant / €"), decimal_places=2, max_digits=9, default=0
+    )
+    fuel_quantity = models.DecimalField(
+        _("carburant / L"), decimal_places=2, max_digits=9, default=0
+    )
+
+    def __str__(self):
+        return f"{self.vehicle} - {self.month:%m/%Y}"
+
+    @property
+    def hours(self):
+        from main import usage  # Avoiding circular import issues
+
+        return usage.to_hours(self.duration)
+
+
+SETTINGS_VERSION_CACHE_KEY = "main:settings-version"
+
 
 class SettingManager(models.Manager["Setting"]):
-    def read(self, key: str, default: str = ""):
-        try:
-            value = super().get(key=key).value
-        except Setting.DoesNotExist:
-            value = default
+    # Shared by the whole process, reloaded when the version stamp changes
+    _values: Optional[dict[str, str]] = None
+    _version: Optional[str] = None
+    # When the version stamp was last read from the shared cache
+    _checked_at: float = 0
+    # Whether a setting was written by the ongoing transaction of the thread
+    _transaction_state = threading.local()
+
+    def all_values(self) -> dict[str, str]:
+        """
+        Returns every setting, loaded in a single query and served from memory
+        until a setting is saved or deleted by any worker. The version stamp
+        of the shared cache is checked at most every
+        CARBON_SETTINGS_CHECK_INTERVAL seconds.
+        """
+        now = time.monotonic()
+        if (
+            SettingManager._values is not None
+            and now - SettingManager._checked_at
+            < settings.CARBON_SETTINGS_CHECK_INTERVAL
+        ):
+            return SettingManager._values
+
+        version = cache.get_or_set(
+            SETTINGS_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None
+        )
+        SettingManager._checked_at = now
+
+        if SettingManager._values is not None and SettingManager._version == version:
+            return SettingManager._values
+
+        values = dict(self.values_list("key", "value"))
+
+        if not connections[self.db].in_atomic_block:
+            self._transaction_state.written = False
 
-        return value
+        # Uncommitted values may still be rolled back
+        if not getattr(self._transaction_state, "written", False):
+            SettingManager._values = values
+            SettingManager._version = version
+
+        return values
+
+    def invalidate(self):
+        SettingManager._values = None
+        if connections[self.db].in_atomic_block:
+            self._transaction_state.written = True
+
+        transaction.on_commit(
+            lambda: cache.set(
+                SETTINGS_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None
+            ),
+            using=self.db,
+        )
 
-    def read_boolean(self, key: str, default: bool = False):
+    def read(self, key: str, default: str = "") -> str:
+        return self.all_values().get(key, default)
+
+    def read_many(self, keys: Iterable[str], default: str = "") -> dict[str, str]:
+        values = self.all_values()
+        return {key: values.get(key, default) for key in keys}
+
+    def read_boolean(self, key: str, default: bool = False) -> bool:
         value = self.read(key)
         if value == "":
             return default
 
         return value.lower() in ("true", "1", "yes")
 
+    def read_int(self, key: str, default: int = 0) -> int:
+        try:
+            return int(self.read(key))
+        except ValueError:
+            return default
+
+    def read_list(self, key: str) -> list[str]:
+        """
+        Reads a comma separated setting, such as a list of email addresses.
+        """
+        return [item.strip() for item in self.read(key).split(",") if item.strip()]
+
 
 class Setting(models.Model):
     class Meta:
@@ -344,3 +768,211 @@ class Setting(models.Model):
 
     def __str__(self):
         return f"{self.key}: {self.value}"
+
+
+class Notification(models.Model):
+    """
+    An email waiting in the outbox, delivered by the process_outbox command.
+    """
+
+    class Meta:
+        verbose_name = _("notification")
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    class NotificationStatus(models.TextChoices):
+        PENDING = "PENDING", _("En attente")
+        SENT = "SENT", _("Envoyée")
+        FAILED = "FAILED", _("En échec")
+        MERGED = "MERGED", _("Regroupée")
+
+    class NotificationKind(models.TextChoices):
+        DEFECT = "DEFECT", _("Anomalie")
+        TRIP_DISCREPANCY = "TRIP_DISCREPANCY", _("Trajet manquant")
+        TRIP_ABORT = "TRIP_ABORT", _("Trajet abandonné")
+        DIGEST = "DIGEST", _("Récapitulatif")
+
+    MAX_ATTEMPTS = 8
+    RETRY_DELAY = datetime.timedelta(minutes=1)
+    MAX_RETRY_DELAY = datetime.timedelta(hours=2)
+
+    kind = models.CharField(
+        _("type"), max_length=255, choices=NotificationKind, blank=True
+    )
+    subject = models.TextField(_("objet"))
+    from_email = models.CharField(_("expéditeur"), max_length=255, blank=True)
+    recipients = models.TextField(_("destinataires"))
+    text_body = models.TextField(_("contenu"))
+    html_body = models.TextField(_("contenu HTML"), blank=True)
+    status = models.CharField(
+        _("statut"),
+        max_length=255,
+        choices=NotificationStatus,
+        default=NotificationStatus.PENDING,
+    )
+    attempts = models.PositiveIntegerField(_("tentatives"), default=0)
+    last_error = models.TextField(_("dernière erreur"), blank=True)
+    created_at = models.DateTimeField(_("création"), default=timezone.now)
+    next_attempt_at = models.DateTimeField(
+        _("prochaine tentative"), default=timezone.now
+    )
+    sent_at = models.DateTimeField(_("envoi"), null=True, blank=True)
+    digest = models.BooleanField(
+        _("à regrouper"),
+        default=False,
+        help_text=_("En attente de regroupement avec les notifications suivantes"),
+    )
+    merged_into = models.ForeignKey(
+        "self",
+        verbose_name=_("récapitulatif"),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="merged_notifications",
+    )
+
+    def __str__(self):
+        return self.subject
+
+    @property
+    def recipient_list(self) -> list[str]:
+        return [email for email in self.recipients.split(",") if email]
+
+    def mark_sent(self):
+        self.status = self.NotificationStatus.SENT
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ""
+        self.save(update_fields=["status", "attempts", "sent_at", "last_error"])
+
+    def mark_failed(self, error: Exception):
+        """
+        Schedules a new attempt with an exponential backoff, or gives up after
+        MAX_ATTEMPTS attempts.
+        """
+        self.attempts += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+        if self.attempts >= self.MAX_ATTEMPTS:
+            self.status = self.NotificationStatus.FAILED
+        else:
+            delay = min(
+                self.RETRY_DELAY * 2 ** (self.attempts - 1), self.MAX_RETRY_DELAY
+            )
+            self.next_attempt_at = timezone.now() + delay
+
+        self.save(update_fields=["status", "attempts", "last_error", "next_attempt_at"])
+
+
+def generate_api_token_key() -> str:
+    return secrets.token_hex(20)
+
+
+class ApiToken(models.Model):
+    """
+    Grants access to the JSON API, with the permissions of its user.
+    """
+
+    class Meta:
+        verbose_name = _("jeton d'API")
+        verbose_name_plural = _("jetons d'API")
+
+    key = models.CharField(
+        _("clé"),
+        max_length=64,
+        unique=True,
+        default=generate_api_token_key,
+        editable=False,
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("utilisateur"),
+        on_delete=models.CASCADE,
+    )
+    name = models.CharField(_("nom"), max_length=255)
+    created_at = models.DateTimeField(_("création"), default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+
+class IngestedEvent(models.Model):
+    """
+    Idempotency key of an event synchronised by an offline client, so that a
+    batch sent again after a lost response is not recorded twice.
+    """
+
+    class Meta:
+        verbose_name = _("événement synchronisé")
+        verbose_name_plural = _("événements synchronisés")
+
+    key = models.CharField(_("clé d'idempotence"), max_length=255, unique=True)
+    vehicle = models.ForeignKey(
+        Vehicle, verbose_name=_("véhicule"), on_delete=models.CASCADE
+    )
+    kind = models.CharField(_("type"), max_length=255)
+    received_at = models.DateTimeField(_("réception"), default=timezone.now)
+
+    def __str__(self):
+        return self.key
+
+
+class LabelSheetJob(models.Model):
+    """
+    Printable sheets of vehicle labels requested from the administration, and
+    generated in the background by the process_label_jobs command.
+    """
+
+    class Meta:
+        verbose_name = _("planche d'étiquettes")
+        verbose_name_plural = _("planches d'étiquettes")
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    class JobStatus(models.TextChoices):
+        PENDING = "PENDING", _("En attente")
+        RUNNING = "RUNNING", _("En cours")
+        DONE = "DONE", _("Terminée")
+        FAILED = "FAILED", _("En échec")
+
+    vehicles = models.ManyToManyField(Vehicle, verbose_name=_("véhicules"))
+    site_url = models.CharField(
+        _("adresse du site"),
+        max_length=255,
+        help_text=_("Préfixe des adresses encodées dans les QR codes"),
+    )
+    status = models.CharField(
+        _("statut"), max_length=255, choices=JobStatus, default=JobStatus.PENDING
+    )
+    sheet_count = models.PositiveIntegerField(_("planches"), default=0)
+    sheets_done = models.PositiveIntegerField(_("planches générées"), default=0)
+    file = models.FileField(_("fichier"), upload_to="labels/", blank=True)
+    last_error = models.TextField(_("dernière erreur"), blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("demandée par"),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(_("création"), default=timezone.now)
+    finished_at = models.DateTimeField(_("fin"), null=True, blank=True)
+    # Until when a running job belongs to its worker, renewed after each sheet:
+    # past it, the worker is considered dead and the job is generated again
+    lease_expires_at = models.DateTimeField(
+        _("fin du bail"), null=True, blank=True, editable=False
+    )
+
+    def __str__(self):
+        return _("Étiquettes n°%(pk)s") % {"pk": self.pk}
+
+    @classmethod
+    def retryable_filter(cls) -> models.Q:
+        """
+        Jobs which failed, or whose worker died while generating them.
+        """
+        return models.Q(status=cls.JobStatus.FAILED) | models.Q(
+            status=cls.JobStatus.RUNNING, lease_expires_at__lt=timezone.now()
+        )
+
+    @admin.display(description=_("progression"))
+    def progress(self) -> str:
+        return f"{self.sheets_done} / {self.sheet_count}"
@@ -0,0 +1,67 @@
+"""
+QR codes of the public vehicle pages, printed on the labels of the vehicles.
+
+Encoding a QR code is CPU bound, so the SVG of each URL and style is stored on
+disk, in the qr_codes cache of its own, and only encoded once. A given URL and
+style always give the same SVG, so the entries never have to be invalidated.
+"""
+
+import hashlib
+import json
+from typing import Iterable
+
+from django.core.cache import caches
+from django.http import HttpRequest
+from django.urls import reverse
+from django.utils.safestring import SafeString, mark_safe
+from qr_code.qrcode.maker import make_qr_code_with_args
+
+QR_CODE_CACHE = "qr_codes"
+
+# Colors of the association
+LABEL_STYLE = {
+    "dark_color": "#004080",
+    "finder_dark_color": "#F08700",
+    "finder_light_color": None,
+    "alignment_dark_color": "#F08700",
+}
+
+
+def _qr_code_key(url: str, style: dict) -> str:
+    digest = hashlib.sha256(json.dumps([url, style], sort_keys=True).encode())
+    return f"main:qr-code:{digest.hexdigest()}"
+
+
+def get_site_url(request: HttpRequest) -> str:
+    return request.build_absolute_uri("/").removesuffix("/")
+
+
+def get_vehicle_url(site_url: str, pk) -> str:
+    return f"{site_url}{reverse('vehicle_details', args=[pk])}"
+
+
+def make_qr_code(url: str, style: dict) -> str:
+    return str(make_qr_code_with_args(data=url, qr_code_args=dict(style)))
+
+
+def get_qr_codes(
+    urls: Iterable[str], style: dict = LABEL_STYLE
+) -> dict[str, SafeString]:
+    """
+    Returns the SVG of the QR code of each URL, only encoding the ones missing
+    from the cache.
+    """
+    cache = caches[QR_CODE_CACHE]
+    keys = {url: _qr_code_key(url, style) for url in urls}
+    qr_codes = cache.get_many(keys.values())
+
+    missing = {
+        key: make_qr_code(url, style)
+        for url, key in keys.items()
+        if key not in qr_codes
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        qr_codes.update(missing)
+
+    return {url: mark_safe(qr_codes[key]) for url, key in keys.items()}
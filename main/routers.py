@@ -0,0 +1,55 @@
+"""
+Routing of the read-only reporting queries to the replica database, when one
+is configured (see DJANGO_DATABASE_REPLICA_*).
+
+Reads only go to the replica inside ``use_replica()``. The other ones, such as
+the vehicle page displayed after a trip is saved, must see the writes which
+the replica may not have received yet.
+"""
+
+import contextlib
+import contextvars
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+
+def has_replica() -> bool:
+    return REPLICA_DB_ALIAS in connections
+
+
+@contextlib.contextmanager
+def use_replica():
+    """
+    Sends the reads of the block to the replica, if any. Querysets are lazy:
+    they must also be evaluated in the block.
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and has_replica():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Including the objects read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same objects as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the tables of the primary
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
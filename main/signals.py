@@ -0,0 +1,57 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main import caching, consumption, usage
+from main.models import Defect, FuelExpense, Location, Setting, Trip, Vehicle
+
+
+@receiver([post_save, post_delete], sender=Setting)
+def invalidate_settings(sender, **kwargs):
+    Setting.manager.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Vehicle)
+def invalidate_vehicle_page(sender, instance: Vehicle, **kwargs):
+    caching.bump_vehicle_versions([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Trip)
+@receiver([post_save, post_delete], sender=Defect)
+@receiver([post_save, post_delete], sender=FuelExpense)
+def invalidate_related_vehicle_page(sender, instance, **kwargs):
+    caching.bump_vehicle_versions([instance.vehicle_id])
+
+
+@receiver([post_save, post_delete], sender=Location)
+def invalidate_location_vehicle_pages(sender, instance: Location, **kwargs):
+    caching.bump_vehicle_versions(
+        Vehicle.objects.filter(parking_location=instance).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=FuelExpense)
+def refresh_fuel_consumption(sender, instance: FuelExpense, created: bool, **kwargs):
+    # A new fill-up only changes its own consumption and the next one's, a
+    # corrected one may have moved anywhere in the history
+    consumption.refresh_vehicle(
+        instance.vehicle_id, since_mileage=instance.mileage if created else None
+    )
+
+    # Or to another vehicle, leaving a gap in the history of the previous one
+    paired = getattr(instance, "_paired_vehicle_id", instance.vehicle_id)
+    if paired != instance.vehicle_id:
+        consumption.refresh_vehicle(paired, since_mileage=instance.mileage)
+    instance._paired_vehicle_id = instance.vehicle_id
+
+
+@receiver(post_delete, sender=FuelExpense)
+def refresh_deleted_fuel_consumption(sender, instance: FuelExpense, **kwargs):
+    consumption.refresh_vehicle(instance.vehicle_id, since_mileage=instance.mileage)
+
+
+@receiver([post_save, post_delete], sender=FuelExpense)
+def refresh_fuel_usage(sender, instance: FuelExpense, **kwargs):
+    # Also the month it was counted in, if its date or vehicle was corrected
+    current = (instance.vehicle_id, instance.date)
+    usage.refresh({getattr(instance, "_counted", current), current})
+    instance._counted = current
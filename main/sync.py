@@ -0,0 +1,234 @@
+"""
+Ingestion of the trips and fuel expenses recorded by offline clients.
+
+A batch is a list of events, in the order they happened::
+
+    {"key": "<idempotency key>", "type": "trip_start", "starting_mileage": 1200,
+     "starting_time": "2024-01-01T08:00:00+01:00", "driver_name": "...",
+     "purpose": "..."}
+    {"key": "...", "type": "trip_end", "ending_mileage": 1250,
+     "ending_time": "2024-01-01T10:00:00+01:00"}
+    {"key": "...", "type": "trip_abort"}
+    {"key": "...", "type": "fuel_expense", "date": "2024-01-01", "mileage": 1250,
+     "amount": "80.00", "quantity": "45.00", "form_of_payment": "FUEL CARD"}
+
+The events are replayed over the odometer of the vehicle in a single pass,
+then the accepted ones are inserted in bulk, in one transaction.
+"""
+
+from __future__ import annotations
+
+import copy
+import typing
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.utils.translation import gettext as _
+
+from . import caching, consumption, usage
+from .db import retry_on_database_lock
+from .models import FuelExpense, IngestedEvent, Trip, Vehicle
+
+MAX_BATCH_SIZE = 500
+
+TRIP_START = "trip_start"
+TRIP_END = "trip_end"
+TRIP_ABORT = "trip_abort"
+FUEL_EXPENSE = "fuel_expense"
+
+EVENT_FIELDS = {
+    TRIP_START: ["starting_mileage", "starting_time", "driver_name", "purpose"],
+    TRIP_END: ["ending_mileage", "ending_time"],
+    TRIP_ABORT: [],
+    FUEL_EXPENSE: ["date", "mileage", "amount", "quantity", "form_of_payment"],
+}
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+REJECTED = "rejected"
+
+
+class Timeline:
+    """
+    Replays the events of a batch over the current state of a vehicle.
+    """
+
+    def __init__(self, vehicle: Vehicle):
+        self.vehicle = vehicle
+        self.mileage = vehicle.mileage
+        self.current_trip = vehicle.trip_set.filter(finished=False).first()
+
+        self.trips: list[Trip] = []
+        self.fuel_expenses: list[FuelExpense] = []
+        # Finished trips, with the mileage of the vehicle before them
+        self.finished_trips: list[tuple[Trip, int]] = []
+        self.events: list[IngestedEvent] = []
+
+    def trip_start(self, data: dict[str, typing.Any]) -> Trip:
+        if self.current_trip is not None:
+            raise ValidationError(
+                {NON_FIELD_ERRORS: [_("Un trajet est déjà en cours !")]}
+            )
+
+        trip = Trip(vehicle=self.vehicle, **data)
+        trip.full_clean(exclude=["vehicle"])
+
+        if trip.starting_mileage < self.mileage:
+            raise ValidationError(
+                {
+                    "starting_mileage": [
+                        _(
+                            "Le kilométrage de départ ne peut pas être inférieur au kilométrage du véhicule !"
+                        )
+                    ]
+                }
+            )
+
+        self.trips.append(trip)
+        self.current_trip = trip
+        return trip
+
+    def trip_end(self, data: dict[str, typing.Any]) -> Trip:
+        return self.finish_trip(data, required=EVENT_FIELDS[TRIP_END])
+
+    def trip_abort(self, data: dict[str, typing.Any]) -> Trip:
+        return self.finish_trip(data, required=[])
+
+    def finish_trip(self, data: dict[str, typing.Any], required: list[str]) -> Trip:
+        trip = self.current_trip
+        if trip is None:
+            raise ValidationError({NON_FIELD_ERRORS: [_("Aucun trajet en cours")]})
+
+        # Validated on a copy, so that a rejected event leaves the trip as is
+        candidate = copy.copy(trip)
+        candidate.finished = True
+        for name, value in data.items():
+            setattr(candidate, name, value)
+        candidate.full_clean(exclude=["vehicle"])
+
+        missing = {
+            name: [Trip._meta.get_field(name).error_messages["required"]]
+            for name in required
+            if getattr(candidate, name) is None
+        }
+        if missing:
+            raise ValidationError(missing)
+
+        for name in ["finished", *EVENT_FIELDS[TRIP_END]]:
+            setattr(trip, name, getattr(candidate, name))
+
+        if trip not in self.trips:
+            self.trips.append(trip)
+        self.finished_trips.append((trip, self.mileage))
+        self.current_trip = None
+        if trip.ending_mileage is not None:
+            self.mileage = max(self.mileage, trip.ending_mileage)
+
+        return trip
+
+    def fuel_expense(self, data: dict[str, typing.Any]) -> FuelExpense:
+        fuel_expense = FuelExpense(vehicle=self.vehicle, **data)
+        fuel_expense.full_clean(exclude=["vehicle"])
+
+        self.fuel_expenses.append(fuel_expense)
+        return fuel_expense
+
+    def save(self):
+        new_trips = [trip for trip in self.trips if trip._state.adding]
+        ended_trips = [trip for trip in self.trips if not trip._state.adding]
+
+        Trip.objects.bulk_create(new_trips)
+        Trip.objects.bulk_update(ended_trips, ["finished", *EVENT_FIELDS[TRIP_END]])
+        FuelExpense.objects.bulk_create(self.fuel_expenses)
+        IngestedEvent.objects.bulk_create(self.events)
+
+        # bulk_create() bypasses Trip.save() and the signals
+        for trip, previous_mileage in self.finished_trips:
+            trip.queue_notifications(previous_mileage)
+        if self.trips:
+            self.vehicle.refresh_mileage()
+        if self.fuel_expenses:
+            consumption.refresh_vehicle(
+                self.vehicle.pk,
+                since_mileage=min(expense.mileage for expense in self.fuel_expenses),
+            )
+        usage.refresh(
+            [trip.get_usage_cell() for trip in self.trips if trip.finished]
+            + [(self.vehicle.pk, expense.date) for expense in self.fuel_expenses]
+        )
+        caching.bump_vehicle_versions([self.vehicle.pk])
+
+
+@retry_on_database_lock
+def ingest_events(vehicle_pk, events: list[typing.Any]) -> list[dict[str, typing.Any]]:
+    """
+    Records a batch of offline events for a vehicle and returns the result of
+    each of them. Rejected events do not prevent the following ones from
+    being recorded.
+    """
+    vehicle = Vehicle.objects.select_for_update().get(pk=vehicle_pk)
+    timeline = Timeline(vehicle)
+
+    keys = [
+        event.get("key")
+        for event in events
+        if isinstance(event, dict) and isinstance(event.get("key"), str)
+    ]
+    # Vehicle of each key already recorded
+    known_keys = dict(
+        IngestedEvent.objects.filter(key__in=keys).values_list("key", "vehicle_id")
+    )
+
+    results: list[dict[str, typing.Any]] = []
+    recorded = []
+
+    for event in events:
+        if not isinstance(event, dict):
+            results.append(
+                {
+                    "key": None,
+                    "status": REJECTED,
+                    "errors": {NON_FIELD_ERRORS: [_("Un objet JSON est attendu")]},
+                }
+            )
+            continue
+
+        key = event.get("key")
+        kind = event.get("type")
+
+        if not isinstance(key, str) or not 0 < len(key) <= 255:
+            errors = {"key": [_("Clé d'idempotence invalide")]}
+        elif key in known_keys and known_keys[key] != vehicle.pk:
+            # The keys are unique across the vehicles, such an event would be
+            # lost if answered as a duplicate
+            errors = {
+                "key": [_("Clé d'idempotence déjà utilisée par un autre véhicule")]
+            }
+        elif key in known_keys:
+            results.append({"key": key, "status": DUPLICATE})
+            continue
+        elif kind not in EVENT_FIELDS:
+            errors = {"type": [_("Type d'événement inconnu")]}
+        else:
+            data = {name: event[name] for name in EVENT_FIELDS[kind] if name in event}
+            try:
+                obj = getattr(timeline, kind)(data)
+            except ValidationError as error:
+                errors = error.message_dict
+            else:
+                known_keys[key] = vehicle.pk
+                timeline.events.append(
+                    IngestedEvent(key=key, vehicle=vehicle, kind=kind)
+                )
+                result = {"key": key, "status": ACCEPTED}
+                recorded.append((result, obj))
+                results.append(result)
+                continue
+
+        results.append({"key": key, "status": REJECTED, "errors": errors})
+
+    timeline.save()
+
+    for result, obj in recorded:
+        result["id"] = obj.pk
+
+    return results
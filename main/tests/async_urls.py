@@ -0,0 +1,5 @@
+from main.urls import public_view_patterns
+from settings.urls import urlpatterns as project_urlpatterns
+
+# The project URLs, with the public pages served by the async views
+urlpatterns = [*public_view_patterns(asynchronous=True), *project_urlpatterns]
@@ -0,0 +1,74 @@
+"""
+Checks of the query plans of the ORM queries, so that a query which cannot
+use an index is caught by the tests rather than by a slow page in production.
+"""
+
+import contextlib
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Tables read as a whole on purpose: the vehicles of the dashboard, the
+# settings loaded at once into the cache...
+DEFAULT_ALLOWED_TABLES = {"main_vehicle", "main_location", "main_setting"}
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?(\w+)')
+POSTGRESQL_FULL_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def get_full_scans(sql: str) -> set[str]:
+    """
+    Returns the tables read in full by a query.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            # Subqueries alias their tables, as in "main_trip" U0
+            aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+            # SCAN main_trip USING INDEX... walks an index, not the table
+            return {
+                aliases.get(match[1], match[1])
+                for *_, detail in cursor.fetchall()
+                if (match := SQLITE_FULL_SCAN.match(detail))
+            }
+
+        if connection.vendor == "postgresql":
+            # Sequential scans are only chosen when no index can be used
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {sql}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            cursor.execute("RESET enable_seqscan")
+            return set(POSTGRESQL_FULL_SCAN.findall(plan))
+
+    return set()
+
+
+@contextlib.contextmanager
+def assert_indexed_queries(testcase, allowed_tables: Iterable[str] = ()):
+    """
+    Fails the test if a SELECT run in the block reads a table in full, other
+    than the allowed ones.
+    """
+    allowed = DEFAULT_ALLOWED_TABLES | set(allowed_tables)
+
+    with CaptureQueriesContext(connection) as context:
+        yield context
+
+    # Ignores the scans of derived tables, such as the subquery of a count
+    tables = set(connection.introspection.table_names())
+
+    failures = []
+    for query in context.captured_queries:
+        sql = query["sql"]
+        if not sql.lstrip().upper().startswith("SELECT"):
+            continue
+
+        scanned = (get_full_scans(sql) & tables) - allowed
+        if scanned:
+            failures.append(f"{', '.join(sorted(scanned))}: {sql}")
+
+    if failures:
+        testcase.fail("Full table scans:\n" + "\n".join(failures))
@@ -0,0 +1,51 @@
+"""
+Test runner keeping the file caches of the tests apart from the real ones.
+
+The caches of settings.CACHES live in the data directory of the deployment,
+which the tests clear: they are moved to a temporary directory for the run,
+also seen by the processes started by the tests through the environment.
+"""
+
+import copy
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+FILE_BASED_CACHE = "django.core.cache.backends.filebased.FileBasedCache"
+
+# Environment variables giving the location of each cache to the processes
+CACHE_LOCATION_VARIABLES = {
+    "default": "DJANGO_CACHE_LOCATION",
+    "qr_codes": "DJANGO_QR_CODE_CACHE_LOCATION",
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+
+        self.cache_directory = tempfile.TemporaryDirectory()
+        self.environ = os.environ.copy()
+
+        caches = copy.deepcopy(settings.CACHES)
+        for alias, variable in CACHE_LOCATION_VARIABLES.items():
+            if caches[alias]["BACKEND"] != FILE_BASED_CACHE:
+                continue
+            location = str(Path(self.cache_directory.name) / alias)
+            caches[alias]["LOCATION"] = location
+            os.environ[variable] = location
+
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.cache_directory.cleanup()
+
+        super().teardown_test_environment(**kwargs)
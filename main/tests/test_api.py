@@ -0,0 +1,276 @@
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase
+from django.utils import timezone
+
+from main.models import ApiToken, Defect, Location, Trip, Vehicle
+
+
+class ApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(
+            name="Garage", address="1 rue du Test", zip_code="38000", city="Grenoble"
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+            parking_location=cls.location,
+        )
+        cls.start = timezone.make_aware(datetime.datetime(2024, 1, 1, 8))
+        for i in range(5):
+            Trip.objects.create(
+                vehicle=cls.vehicle,
+                starting_mileage=10 + 10 * i,
+                ending_mileage=20 + 10 * i,
+                starting_time=cls.start + datetime.timedelta(hours=i),
+                ending_time=cls.start + datetime.timedelta(hours=i, minutes=30),
+                driver_name="John Doe",
+                purpose="DPS",
+                finished=True,
+            )
+        Defect.objects.create(
+            vehicle=cls.vehicle, comment="Flat tyre", reporter_name="Jane Doe"
+        )
+
+        cls.user = User.objects.create_user("api")
+        cls.token = ApiToken.objects.create(user=cls.user, name="Intégration")
+
+    def auth(self):
+        return {"HTTP_AUTHORIZATION": f"Token {self.token.key}"}
+
+
+class ApiReadTestCase(ApiTestCase):
+    def test_public_vehicle(self):
+        """
+        Test that a vehicle can be read without authentication, like its QR page
+        """
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/v1/vehicles/{self.vehicle.pk}")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["name"], "VPS Test")
+        self.assertEqual(data["mileage"], 60)
+        self.assertEqual(data["parking_location"]["name"], "Garage")
+        self.assertEqual(data["open_defects"][0]["comment"], "Flat tyre")
+        self.assertIsNone(data["current_trip"])
+
+    def test_collections_require_authentication(self):
+        """
+        Test that the collections are not public
+        """
+        for name in ["vehicles", "trips", "defects", "fuel-expenses", "locations"]:
+            with self.subTest(name=name):
+                response = self.client.get(f"/api/v1/{name}")
+                self.assertEqual(response.status_code, 401)
+
+        response = self.client.get("/api/v1/trips", HTTP_AUTHORIZATION="Token invalid")
+        self.assertEqual(response.status_code, 401)
+
+    def test_sparse_fields(self):
+        """
+        Test that only the requested fields are rendered and joined
+        """
+        # WHEN only scalar fields are requested, THEN a single query is needed
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                "/api/v1/vehicles", {"fields": "id,name"}, **self.auth()
+            )
+
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": str(self.vehicle.pk), "name": "VPS Test"}],
+        )
+
+        # WHEN an unknown field is requested, THEN an error is returned
+        response = self.client.get(
+            "/api/v1/vehicles", {"fields": "name,password"}, **self.auth()
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """
+        Test that a collection is walked through page by page with cursors
+        """
+        # GIVEN 5 trips, WHEN they are read 2 by 2
+        url = "/api/v1/trips?limit=2&fields=id,starting_time"
+        pages = []
+        while url:
+            response = self.client.get(url, **self.auth())
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json()["results"])
+            url = response.json()["next"]
+
+        # THEN every trip should be read once, latest first
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [trip["id"] for page in pages for trip in page]
+        self.assertEqual(
+            ids,
+            list(Trip.objects.order_by("-starting_time").values_list("pk", flat=True)),
+        )
+
+        # AND an invalid cursor should be rejected
+        response = self.client.get("/api/v1/trips?cursor=oops", **self.auth())
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_depend_on_size(self):
+        """
+        Test that the related objects are loaded without additional queries
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v1/trips", **self.auth())
+
+        self.assertEqual(len(response.json()["results"]), 5)
+        self.assertEqual(response.json()["results"][0]["vehicle_name"], "VPS Test")
+
+    def test_filters(self):
+        """
+        Test the filters of the collections
+        """
+        response = self.client.get(
+            "/api/v1/defects", {"vehicle": self.vehicle.pk}, **self.auth()
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+
+        response = self.client.get(
+            "/api/v1/vehicles",
+            {"status": Vehicle.VehicleStatus.IN_REPAIR},
+            **self.auth(),
+        )
+        self.assertEqual(response.json()["results"], [])
+
+        response = self.client.get(
+            "/api/v1/trips", {"vehicle": "not-an-uuid"}, **self.auth()
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiWriteTestCase(ApiTestCase):
+    def grant(self, *codenames):
+        self.user.user_permissions.add(
+            *Permission.objects.filter(codename__in=codenames)
+        )
+
+    def test_write_requires_token_and_permission(self):
+        """
+        Test that writes need a token whose user has the model permission
+        """
+        payload = {"vehicle": str(self.vehicle.pk), "reporter_name": "Jane Doe"}
+
+        response = self.client.post(
+            "/api/v1/defects", payload, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post(
+            "/api/v1/defects", payload, content_type="application/json", **self.auth()
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_create_defect(self):
+        """
+        Test the creation of a defect
+        """
+        # GIVEN a token allowed to add defects
+        self.grant("add_defect")
+
+        # WHEN a defect is posted
+        response = self.client.post(
+            "/api/v1/defects",
+            {
+                "vehicle": str(self.vehicle.pk),
+                "comment": "Broken mirror",
+                "reporter_name": "Jane Doe",
+            },
+            content_type="application/json",
+            **self.auth(),
+        )
+
+        # THEN it should be created
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["vehicle_name"], "VPS Test")
+        self.assertTrue(
+            self.vehicle.defect_set.filter(comment="Broken mirror").exists()
+        )
+
+        # AND invalid data should be rejected
+        response = self.client.post(
+            "/api/v1/defects",
+            {"vehicle": str(self.vehicle.pk)},
+            content_type="application/json",
+            **self.auth(),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("reporter_name", response.json()["errors"])
+
+    def test_start_and_end_trip(self):
+        """
+        Test that a trip is started and ended through the API
+        """
+        # GIVEN a token allowed to add and change trips
+        self.grant("add_trip", "change_trip")
+
+        # WHEN a trip is started
+        response = self.client.post(
+            "/api/v1/trips",
+            {
+                "vehicle": str(self.vehicle.pk),
+                "starting_mileage": 60,
+                "driver_name": "John Doe",
+                "purpose": "DPS",
+            },
+            content_type="application/json",
+            **self.auth(),
+        )
+        self.assertEqual(response.status_code, 201)
+        trip_id = response.json()["id"]
+
+        # THEN a second trip cannot be started
+        response = self.client.post(
+            "/api/v1/trips",
+            {
+                "vehicle": str(self.vehicle.pk),
+                "starting_mileage": 60,
+                "driver_name": "Jane Doe",
+                "purpose": "DPS",
+            },
+            content_type="application/json",
+            **self.auth(),
+        )
+        self.assertEqual(response.status_code, 409)
+
+        # AND it cannot be finished by anything else than a boolean
+        for finished in ["false", 0]:
+            response = self.client.patch(
+                f"/api/v1/trips/{trip_id}",
+                {"finished": finished},
+                content_type="application/json",
+                **self.auth(),
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("finished", response.json()["errors"])
+        self.assertFalse(Trip.objects.get(pk=trip_id).finished)
+
+        # WHEN the trip is ended
+        response = self.client.patch(
+            f"/api/v1/trips/{trip_id}",
+            {
+                "ending_mileage": 75,
+                "ending_time": timezone.now().isoformat(),
+                "finished": True,
+            },
+            content_type="application/json",
+            **self.auth(),
+        )
+
+        # THEN the odometer of the vehicle should be updated
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["distance"], 15)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.mileage, 75)
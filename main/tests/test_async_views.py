@@ -0,0 +1,143 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main.async_views import AsyncVehicleDetailView
+from main.models import Defect, Location, Trip, Vehicle
+
+# Vehicle with its location, current trip and open defects
+ASYNC_VEHICLE_DETAIL_QUERY_BUDGET = 3
+
+
+@override_settings(ROOT_URLCONF="main.tests.async_urls")
+class AsyncVehicleViewsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(
+            name="Garage", address="1 rue du Test", zip_code="38000", city="Grenoble"
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+            parking_location=cls.location,
+        )
+        Trip.objects.create(
+            vehicle=cls.vehicle,
+            starting_mileage=5,
+            ending_mileage=10,
+            starting_time=timezone.now(),
+            ending_time=timezone.now(),
+            driver_name="John Doe",
+            purpose="DPS",
+            finished=True,
+        )
+        Defect.objects.create(
+            vehicle=cls.vehicle,
+            comment="Flat tyre",
+            reporter_name="Jane Doe",
+            severity=Defect.DefectSeverity.MAJOR,
+        )
+
+    def setUp(self):
+        # The cached pages would outlive the rolled back data of other tests
+        cache.clear()
+
+    def test_detail_page(self):
+        """
+        Test that the async page shows the vehicle, its open defects and its trip
+        """
+        # Query counts are only captured outside of the event loop
+        get = async_to_sync(self.async_client.get)
+
+        # WHEN the page is displayed
+        with self.assertNumQueries(ASYNC_VEHICLE_DETAIL_QUERY_BUDGET):
+            response = get(f"/vehicles/{self.vehicle.id}")
+
+        # THEN it should be rendered by the async view
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(response.resolver_match.func.view_class, AsyncVehicleDetailView)
+        self.assertContains(response, "Grenoble")
+        self.assertContains(response, "Flat tyre")
+        self.assertFalse(response.context["trip_started"])
+
+        # AND an unchanged page should not be sent again, once the CSRF cookie
+        # the ETag depends on is set
+        response = get(f"/vehicles/{self.vehicle.id}")
+        response = get(
+            f"/vehicles/{self.vehicle.id}", headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_detail_page_not_found(self):
+        """
+        Test that an unknown vehicle is answered with a 404
+        """
+        response = await self.async_client.get(
+            "/vehicles/00000000-0000-0000-0000-000000000000"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_trip(self):
+        """
+        Test that a trip is started and ended with the async views
+        """
+        # WHEN a trip is started
+        response = await self.async_client.post(
+            f"/vehicles/{self.vehicle.id}/trip-start",
+            {
+                "starting_mileage": 10,
+                "starting_time": "2024-01-01T08:00",
+                "driver_name": "John Doe",
+                "purpose": "DPS",
+            },
+        )
+
+        # THEN the driver should be redirected to the page showing the trip
+        self.assertEqual(response.status_code, 302)
+        response = await self.async_client.get(response.url)
+        self.assertTrue(response.context["trip_started"])
+
+        # WHEN the trip is ended before it started
+        data = {
+            "starting_mileage": 10,
+            "starting_time": "2024-01-01T08:00",
+            "driver_name": "John Doe",
+            "purpose": "DPS",
+            "ending_mileage": 20,
+            "ending_time": "2024-01-01T07:00",
+        }
+        response = await self.async_client.post(
+            f"/vehicles/{self.vehicle.id}/trip-end", data
+        )
+
+        # THEN the page should be rendered with the error
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(response.context["trip_end_form"].has_error("ending_time"))
+
+        # WHEN it is ended correctly
+        data["ending_time"] = "2024-01-01T09:00"
+        response = await self.async_client.post(
+            f"/vehicles/{self.vehicle.id}/trip-end", data
+        )
+
+        # THEN the odometer should be updated
+        self.assertEqual(response.status_code, 302)
+        vehicle = await Vehicle.objects.aget(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 20)
+
+    async def test_defect(self):
+        """
+        Test that a defect is reported with the async views
+        """
+        response = await self.async_client.post(
+            f"/vehicles/{self.vehicle.id}/defect",
+            {"comment": "Broken mirror", "reporter_name": "Jane Doe"},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await Defect.objects.filter(comment="Broken mirror").aexists())
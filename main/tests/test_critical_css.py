@@ -0,0 +1,146 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from main import critical_css
+from main.models import Vehicle
+
+
+class CriticalCssTestCase(SimpleTestCase):
+    def test_up_to_date(self):
+        """
+        Test that the inlined critical CSS matches the templates and pico.css
+        """
+        # Rebuild it with "manage.py build_critical_css" when this test fails
+        call_command("build_critical_css", check=True)
+
+    def test_selectors(self):
+        """
+        Test that only the rules which may apply to the templates are kept
+        """
+        # GIVEN a template
+        usage = critical_css.Usage()
+        usage.add_template("""
+            <main class="container">
+                <span class="status-{{ vehicle.status|lower }}">{{ vehicle }}</span>
+                <p {% if message.tags %}class="{{ message.tags }}"{% endif %}></p>
+                <summary role="button">Détails</summary>
+            </main>
+            """)
+
+        # WHEN pico.css like rules are filtered
+        rules = critical_css.shake(
+            critical_css.parse("""
+                @charset "UTF-8";
+                /* Layout */
+                main.container, nav ul { margin: 0 auto; }
+                @media (min-width: 576px) { .container { max-width: 510px; } }
+                @media print { dialog { display: none; } }
+                [role=button]:is(:hover, :focus), [role=switch] { color: red; }
+                :where(input, select) { width: 100%; }
+                :where(main, form) > :is(span, a) { margin: 0; }
+                .status-operational { color: green; }
+                .secondary { color: grey; }
+                :root:not([data-theme=dark]) { --color: #000; }
+                """),
+            usage,
+        )
+
+        # THEN the rules of missing elements, classes and attributes should
+        # be dropped
+        self.assertEqual(
+            critical_css.serialize(rules),
+            "main.container{margin:0 auto}"
+            "@media (min-width: 576px){.container{max-width:510px}}"
+            "[role=button]:is(:hover,:focus){color:red}"
+            ":where(main,form)>:is(span,a){margin:0}"
+            ".status-operational{color:green}"
+            ":root:not([data-theme=dark]){--color:#000}",
+        )
+
+    def test_below_the_fold(self):
+        """
+        Test that only the summaries of the collapsed sections are kept
+        """
+        source = critical_css.strip_below_the_fold("""
+            <main>
+                <h1>Véhicule</h1>
+                <details {% if form.errors %}open{% endif %}>
+                    <summary role="button">Commencer un trajet</summary>
+                    <section><form><input></form></section>
+                    <details><summary>Anomalies</summary><table></table></details>
+                </details>
+                <details open><summary>Ouvert</summary><p>Affiché</p></details>
+            </main>
+            <footer><a href="/">Contact</a></footer>
+            """)
+
+        self.assertEqual(
+            " ".join(source.split()),
+            "<main> <h1>Véhicule</h1> <details {% if form.errors %}open{% endif %}>"
+            '<summary role="button">Commencer un trajet</summary></details> '
+            "<details open><summary>Ouvert</summary><p>Affiché</p></details> "
+            "</main> <footer></footer>",
+        )
+
+    def test_keyframes(self):
+        """
+        Test that the animations which no rule runs are removed
+        """
+        rules = critical_css.prune_keyframes(critical_css.parse("""
+                @keyframes spin { to { transform: rotate(1turn); } }
+                @keyframes slide { to { opacity: 0; } }
+                @media (min-width: 576px) { p { animation: spin 1s linear; } }
+                """))
+
+        self.assertEqual(
+            critical_css.serialize(rules),
+            "@keyframes spin{to { transform:rotate(1turn);}}"
+            "@media (min-width: 576px){p{animation:spin 1s linear}}",
+        )
+
+    def test_custom_properties(self):
+        """
+        Test that the unused custom properties are removed
+        """
+        rules = critical_css.parse("""
+            :root { --primary: blue; --primary-hover: var(--primary); --unused: url("a;b"); }
+            :root { --spacing: 1rem; --ins-color: green; }
+            a { color: var(--primary-hover); }
+            """)
+
+        rules = critical_css.prune_custom_properties(
+            rules, "main { padding: var(--spacing); }"
+        )
+
+        self.assertEqual(
+            critical_css.serialize(rules),
+            ":root{--primary:blue;--primary-hover:var(--primary)}"
+            ":root{--spacing:1rem}"
+            "a{color:var(--primary-hover)}",
+        )
+
+
+class CriticalCssPageTestCase(TestCase):
+    def test_inlined_in_vehicle_page_only(self):
+        """
+        Test that only the public vehicle page inlines the critical CSS
+        """
+        vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+
+        response = self.client.get(f"/vehicles/{vehicle.pk}")
+        self.assertContains(response, "<style>", count=1)
+        self.assertContains(response, 'rel="preload"')
+
+        # AND the other pages should load the full stylesheet
+        self.client.force_login(User.objects.create_superuser("admin"))
+        response = self.client.get("/vehicles")
+        self.assertNotContains(response, "<style>")
+        self.assertContains(response, 'rel="stylesheet" href="/static/css/pico.css"')
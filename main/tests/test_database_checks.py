@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.core import checks
+from django.test import SimpleTestCase, override_settings
+
+from main.checks import (
+    check_connection_settings,
+    check_database_connections,
+    describe_connections,
+)
+
+POSTGRESQL = {
+    "ENGINE": "django.db.backends.postgresql",
+    "NAME": "carbon",
+    "CONN_MAX_AGE": 0,
+    "CONN_HEALTH_CHECKS": True,
+    "OPTIONS": {"pool": {"min_size": 2, "max_size": 10, "timeout": 30}},
+}
+
+
+def get_ids(messages):
+    return [message.id for message in messages]
+
+
+class DatabaseChecksTestCase(SimpleTestCase):
+    def test_pool(self):
+        """
+        Test that a consistent pool configuration is accepted and reported
+        """
+        self.assertEqual(check_connection_settings("default", POSTGRESQL), [])
+        self.assertEqual(
+            describe_connections(POSTGRESQL),
+            "pool psycopg de 2 à 10 connexions par processus, attente maximale "
+            "30 s, vérifiées avant d'être réutilisées",
+        )
+
+    def test_pool_without_postgresql(self):
+        """
+        Test that a pool is refused with SQLite
+        """
+        config = {**POSTGRESQL, "ENGINE": "django.db.backends.sqlite3"}
+        self.assertEqual(
+            get_ids(check_connection_settings("default", config)), ["main.E001"]
+        )
+
+    def test_pool_without_psycopg_pool(self):
+        """
+        Test that a pool is refused when psycopg_pool is not installed
+        """
+        with mock.patch("main.checks.importlib.util.find_spec", return_value=None):
+            messages = check_connection_settings("default", POSTGRESQL)
+        self.assertEqual(get_ids(messages), ["main.E002"])
+
+    def test_pool_with_persistent_connections(self):
+        """
+        Test that a pool is refused with persistent connections
+        """
+        config = {**POSTGRESQL, "CONN_MAX_AGE": 60}
+        self.assertEqual(
+            get_ids(check_connection_settings("default", config)), ["main.E003"]
+        )
+
+    def test_pool_sizes(self):
+        """
+        Test that a pool smaller than its minimum size is refused
+        """
+        config = {**POSTGRESQL, "OPTIONS": {"pool": {"min_size": 20, "max_size": 10}}}
+        self.assertEqual(
+            get_ids(check_connection_settings("default", config)), ["main.E004"]
+        )
+
+    @override_settings(CARBON_ASYNC_VIEWS=True)
+    def test_persistent_connections_with_async_views(self):
+        """
+        Test that persistent connections are reported with the async views
+        """
+        config = {**POSTGRESQL, "CONN_MAX_AGE": 60, "OPTIONS": {}}
+        messages = check_connection_settings("default", config)
+        self.assertEqual(get_ids(messages), ["main.W001"])
+        self.assertEqual(messages[0].level, checks.WARNING)
+
+    def test_describe_persistent_connections(self):
+        """
+        Test the description of the connections without a pool
+        """
+        config = {**POSTGRESQL, "OPTIONS": {}, "CONN_HEALTH_CHECKS": False}
+        self.assertEqual(
+            describe_connections({**config, "CONN_MAX_AGE": 60}),
+            "persistantes pendant 60 s",
+        )
+        self.assertEqual(
+            describe_connections({**config, "CONN_MAX_AGE": None}),
+            "persistantes sans limite de durée",
+        )
+        self.assertEqual(describe_connections(config), "ouvertes à chaque requête")
+
+    def test_reported_at_startup(self):
+        """
+        Test that the configuration is only reported for the databases used
+        """
+        self.assertNotIn("main.I001", get_ids(check_database_connections(None)))
+        self.assertIn(
+            "main.I001",
+            get_ids(check_database_connections(None, databases=["default"])),
+        )
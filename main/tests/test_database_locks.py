@@ -0,0 +1,212 @@
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from main.db import retry_on_database_lock
+from main.models import FuelExpense, Vehicle
+
+from .test_trip_concurrency import run_concurrently
+
+
+class SQLiteTuningTestCase(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        """
+        Test that the connections are tuned for concurrent writers
+        """
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        # NORMAL
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        # MEMORY
+        self.assertEqual(self.pragma("temp_store"), 2)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+@override_settings(CARBON_DATABASE_LOCK_RETRIES=3, CARBON_DATABASE_LOCK_BACKOFF=0.1)
+@mock.patch("main.db.time.sleep")
+class RetryOnDatabaseLockTestCase(TransactionTestCase):
+    def failing(self, *errors):
+        """
+        Returns a function raising the given errors, then returning "done".
+        """
+        calls = mock.Mock(side_effect=[*errors, "done"])
+        return retry_on_database_lock(calls), calls
+
+    def locked_commit(self, sleep):
+        """
+        Makes the first commit fail on a locked database.
+        """
+        commit = connection.commit
+
+        def locked_once():
+            if sleep.call_count == 0:
+                raise OperationalError("database is locked")
+            return commit()
+
+        return mock.patch.object(connection, "commit", locked_once)
+
+    def test_retried(self, sleep):
+        """
+        Test that a write failing on a locked database is run again
+        """
+        func, calls = self.failing(
+            OperationalError("database is locked"),
+            OperationalError("database is locked"),
+        )
+
+        self.assertEqual(func(), "done")
+        self.assertEqual(calls.call_count, 3)
+
+        # AND the delay should grow between the attempts
+        (first,), _ = sleep.call_args_list[0]
+        (second,), _ = sleep.call_args_list[1]
+        self.assertTrue(0.05 <= first <= 0.1)
+        self.assertTrue(0.1 <= second <= 0.2)
+
+    def test_gives_up(self, sleep):
+        """
+        Test that the lock error is raised once the retries are exhausted
+        """
+        func, calls = self.failing(*[OperationalError("database is locked")] * 4)
+
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 4)
+
+    def test_other_errors(self, sleep):
+        """
+        Test that other database errors are not retried
+        """
+        func, calls = self.failing(OperationalError("no such table: main_trip"))
+
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_nested(self, sleep):
+        """
+        Test that a write in an outer transaction is not retried
+        """
+        func, calls = self.failing(OperationalError("database is locked"))
+
+        with self.assertRaises(OperationalError), transaction.atomic():
+            func()
+        self.assertEqual(calls.call_count, 1)
+
+    def test_rolled_back(self, sleep):
+        """
+        Test that the writes of a failed attempt are rolled back
+        """
+        vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        attempts = []
+
+        @retry_on_database_lock
+        def write():
+            FuelExpense.objects.create(
+                vehicle=vehicle, date=timezone.now().date(), amount=50, quantity=1
+            )
+            attempts.append(None)
+            if len(attempts) == 1:
+                raise OperationalError("database is locked")
+
+        write()
+        self.assertEqual(FuelExpense.objects.count(), 1)
+
+    def test_view_message_queued_once(self, sleep):
+        """
+        Test that a view committed on its second attempt queues its message
+        once
+        """
+        vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+
+        # WHEN a trip is started while the database is locked at commit
+        with self.locked_commit(sleep):
+            response = Client().post(
+                f"/vehicles/{vehicle.id}/trip-start",
+                {
+                    "starting_mileage": 15,
+                    "starting_time": timezone.now().isoformat(),
+                    "driver_name": "John Doe",
+                    "purpose": "DPS",
+                },
+                follow=True,
+            )
+
+        # THEN it should be recorded, and reported, once
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(vehicle.trip_set.count(), 1)
+        self.assertEqual(
+            [str(message) for message in response.context["messages"]],
+            ["Début du trajet enregistré"],
+        )
+
+        # AND so should an aborted trip
+        sleep.reset_mock()
+        with self.locked_commit(sleep):
+            response = Client().post(
+                f"/vehicles/{vehicle.id}/trip-abortion", follow=True
+            )
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertTrue(vehicle.trip_set.get().finished)
+        self.assertEqual(
+            [str(message) for message in response.context["messages"]],
+            ["Le trajet a été abandonné"],
+        )
+
+
+class ConcurrentWritesTestCase(TransactionTestCase):
+    def test_concurrent_expenses(self):
+        """
+        Test that expenses recorded at once by several drivers are all saved
+        """
+        vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+
+        def add_expense(i):
+            return Client().post(
+                f"/vehicles/{vehicle.id}/fuel-expense",
+                {
+                    "date": "2023-10-01",
+                    "mileage": 100 + i,
+                    "amount": "50",
+                    "quantity": "1.5",
+                    "form_of_payment": "FUEL CARD",
+                },
+            )
+
+        responses = run_concurrently(add_expense)
+
+        self.assertEqual({response.status_code for response in responses}, {302})
+        self.assertEqual(FuelExpense.objects.count(), len(responses))
@@ -2,6 +2,7 @@ from django.core import mail
 from django.test import TestCase
 
 from main.models import Setting, Vehicle
+from main.utils import deliver_notifications
 
 
 class DefectsTestCase(TestCase):
@@ -60,10 +61,13 @@ class DefectsTestCase(TestCase):
             },
         )
 
-        # THEN an email should be sent to the admin
+        # THEN an email should be queued for the admin
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, f"/vehicles/{self.vehicle.id}")
+        self.assertEqual(len(mail.outbox), 0)
 
+        # AND sent when the outbox is processed
+        deliver_notifications()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(sorted(mail.outbox[0].to), sorted(email_recipients))
         self.assertIn(
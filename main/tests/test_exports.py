@@ -0,0 +1,178 @@
+import datetime
+import zoneinfo
+from decimal import Decimal
+
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from main.archive import archive_trips
+from main.models import Defect, FuelExpense, Trip, Vehicle
+
+PARIS = zoneinfo.ZoneInfo("Europe/Paris")
+
+
+class CsvExportTestCase(TestCase):
+    def setUp(self):
+        self.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        self.other = Vehicle.objects.create(
+            name="VL Test",
+            type=Vehicle.VehicleType.VL,
+            model_name="Renault Clio",
+            fuel=Vehicle.FuelChoice.UNLEADED_95_10,
+            registration_number="5678EFGH",
+        )
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+    def create_trip(self, vehicle, starting_mileage, starting_time):
+        return Trip.objects.create(
+            vehicle=vehicle,
+            starting_mileage=starting_mileage,
+            ending_mileage=starting_mileage + 10,
+            starting_time=starting_time,
+            ending_time=starting_time + datetime.timedelta(hours=1),
+            driver_name="Driver",
+            purpose="DPS",
+            finished=True,
+        )
+
+    def create_expense(self, vehicle, date, mileage):
+        return FuelExpense.objects.create(
+            vehicle=vehicle,
+            date=date,
+            mileage=mileage,
+            amount=Decimal("60.50"),
+            quantity=Decimal("40"),
+        )
+
+    def get_lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_trips(self):
+        """
+        Test that the trips are exported with the archived ones, in local time
+        """
+        self.create_trip(
+            self.vehicle, 0, datetime.datetime(2023, 5, 1, 8, tzinfo=PARIS)
+        )
+        self.create_trip(
+            self.vehicle, 10, datetime.datetime(2023, 6, 1, 8, tzinfo=PARIS)
+        )
+        self.create_trip(
+            self.vehicle, 20, datetime.datetime(2024, 1, 1, 8, tzinfo=PARIS)
+        )
+        archive_trips(datetime.datetime(2023, 12, 1, tzinfo=PARIS), keep=1)
+
+        lines = self.get_lines(self.client.get("/admin/main/trip/export/"))
+
+        self.assertEqual(
+            lines[0].split(",")[:3], ["Véhicule", "Immatriculation", "Départ"]
+        )
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(
+            lines[1],
+            "VPS Test,1234ABCD,2023-05-01 08:00:00,2023-05-01 09:00:00,0,10,Driver,DPS,oui",
+        )
+
+    def test_filters(self):
+        """
+        Test that the export is filtered by period and vehicle
+        """
+        # Late on the last evening of the period, already the next day in UTC
+        self.create_trip(
+            self.vehicle, 0, datetime.datetime(2024, 3, 31, 23, 30, tzinfo=PARIS)
+        )
+        self.create_trip(
+            self.vehicle, 10, datetime.datetime(2024, 4, 1, 8, tzinfo=PARIS)
+        )
+        self.create_trip(self.other, 0, datetime.datetime(2024, 3, 15, 8, tzinfo=PARIS))
+
+        lines = self.get_lines(
+            self.client.get(
+                "/admin/main/trip/export/",
+                {
+                    "start": "2024-03-01",
+                    "end": "2024-03-31",
+                    "vehicle": self.vehicle.pk,
+                },
+            )
+        )
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("VPS Test,1234ABCD,2024-03-31 23:30:00"))
+
+        # AND invalid filters should be refused
+        response = self.client.get(
+            "/admin/main/trip/export/", {"start": "2024-04-01", "end": "2024-03-01"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_fuel_expenses(self):
+        """
+        Test the export of the fuel expenses of a period
+        """
+        self.create_expense(self.vehicle, datetime.date(2024, 2, 1), 100)
+        self.create_expense(self.other, datetime.date(2024, 3, 1), 200)
+
+        lines = self.get_lines(
+            self.client.get("/admin/main/fuelexpense/export/", {"start": "2024-03-01"})
+        )
+
+        self.assertEqual(
+            lines,
+            [
+                "Véhicule,Immatriculation,Date,Kilométrage,Montant / €,Quantité / L,"
+                "Moyen de paiement",
+                "VL Test,5678EFGH,2024-03-01,200,60.50,40.00,Carte carburant",
+            ],
+        )
+
+    def test_defects(self):
+        """
+        Test that the defects are exported with the labels of their status
+        """
+        Defect.objects.create(
+            vehicle=self.vehicle,
+            comment="Pneu crevé",
+            reporter_name="Jane Doe",
+            severity=Defect.DefectSeverity.MAJOR,
+        )
+
+        lines = self.get_lines(self.client.get("/admin/main/defect/export/"))
+
+        self.assertEqual(len(lines), 2)
+        self.assertIn(",Ouvert,Majeure,Jane Doe,Pneu crevé", lines[1])
+
+    def test_action(self):
+        """
+        Test that the selected rows are exported by the admin action
+        """
+        expenses = [
+            self.create_expense(self.vehicle, datetime.date(2024, 2, 1), 100),
+            self.create_expense(self.vehicle, datetime.date(2024, 3, 1), 200),
+        ]
+
+        response = self.client.get("/admin/main/fuelexpense/")
+        self.assertContains(response, "/admin/main/fuelexpense/export/")
+
+        response = self.client.post(
+            "/admin/main/fuelexpense/",
+            {
+                "action": "export_csv",
+                helpers.ACTION_CHECKBOX_NAME: [expenses[1].pk],
+            },
+        )
+
+        lines = self.get_lines(response)
+        self.assertEqual(len(lines), 2)
+        self.assertIn(",2024-03-01,200,", lines[1])
@@ -0,0 +1,221 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from main import consumption
+from main.models import FuelConsumption, FuelExpense, Vehicle
+from main.sync import ingest_events
+
+
+class FuelConsumptionTestCase(TestCase):
+    def setUp(self):
+        self.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        self.expenses = [
+            self.add_expense(datetime.date(2024, 1, 1), 1000, "40", "60"),
+            self.add_expense(datetime.date(2024, 2, 1), 1500, "35", "56"),
+            self.add_expense(datetime.date(2024, 3, 1), 2000, "40", "60"),
+        ]
+
+    def add_expense(self, date, mileage, quantity, amount, vehicle=None):
+        return FuelExpense.objects.create(
+            vehicle=vehicle or self.vehicle,
+            date=date,
+            mileage=mileage,
+            quantity=Decimal(quantity),
+            amount=Decimal(amount),
+        )
+
+    def get_distances(self):
+        return list(
+            FuelConsumption.objects.order_by("expense__mileage").values_list(
+                "expense__mileage", "distance"
+            )
+        )
+
+    def test_consecutive_fill_ups(self):
+        """
+        Test that each fill-up is paired with the previous one of its vehicle
+        """
+        self.assertEqual(self.get_distances(), [(1000, None), (1500, 500), (2000, 500)])
+
+    def test_new_fill_up(self):
+        """
+        Test that a fill-up added between two others updates the next one
+        """
+        self.add_expense(datetime.date(2024, 1, 15), 1200, "15", "24")
+
+        self.assertEqual(
+            self.get_distances(),
+            [(1000, None), (1200, 200), (1500, 300), (2000, 500)],
+        )
+
+    def test_corrected_fill_up(self):
+        """
+        Test that a corrected mileage updates the consumptions around it
+        """
+        expense = self.expenses[1]
+        expense.mileage = 1800
+        expense.save()
+
+        self.assertEqual(self.get_distances(), [(1000, None), (1800, 800), (2000, 200)])
+
+    def test_deleted_fill_up(self):
+        """
+        Test that deleting a fill-up updates the next one
+        """
+        self.expenses[1].delete()
+
+        self.assertEqual(self.get_distances(), [(1000, None), (2000, 1000)])
+
+    def test_vehicles_apart(self):
+        """
+        Test that the fill-ups of other vehicles are not paired together
+        """
+        other = Vehicle.objects.create(
+            name="VL Test",
+            type=Vehicle.VehicleType.VL,
+            model_name="Renault Clio",
+            fuel=Vehicle.FuelChoice.UNLEADED_95_10,
+            registration_number="5678EFGH",
+        )
+        self.add_expense(datetime.date(2024, 1, 10), 1200, "30", "50", vehicle=other)
+
+        self.assertEqual(FuelConsumption.objects.get(vehicle=other).distance, None)
+        self.assertEqual(
+            FuelConsumption.objects.get(expense=self.expenses[1]).distance, 500
+        )
+
+    def test_moved_fill_up(self):
+        """
+        Test that a fill-up moved to another vehicle is paired again in both
+        """
+        other = Vehicle.objects.create(
+            name="VL Test",
+            type=Vehicle.VehicleType.VL,
+            model_name="Renault Clio",
+            fuel=Vehicle.FuelChoice.UNLEADED_95_10,
+            registration_number="5678EFGH",
+        )
+        self.add_expense(datetime.date(2024, 1, 10), 1200, "30", "50", vehicle=other)
+
+        expense = FuelExpense.objects.get(pk=self.expenses[1].pk)
+        expense.vehicle = other
+        expense.save()
+
+        self.assertEqual(
+            FuelConsumption.objects.get(expense=self.expenses[2]).distance, 1000
+        )
+        self.assertEqual(FuelConsumption.objects.get(expense=expense).distance, 300)
+
+    def test_synced_fill_ups(self):
+        """
+        Test that the fill-ups recorded offline are paired too
+        """
+        ingest_events(
+            self.vehicle.pk,
+            [
+                {
+                    "key": "fuel-1",
+                    "type": "fuel_expense",
+                    "date": "2024-04-01",
+                    "mileage": 2600,
+                    "amount": "50",
+                    "quantity": "30",
+                    "form_of_payment": "FUEL CARD",
+                }
+            ],
+        )
+
+        self.assertEqual(self.get_distances()[-1], (2600, 600))
+
+    def test_rebuild(self):
+        """
+        Test that the consumptions can be rebuilt from the expenses
+        """
+        FuelConsumption.objects.all().delete()
+
+        consumption.rebuild()
+
+        self.assertEqual(self.get_distances(), [(1000, None), (1500, 500), (2000, 500)])
+
+    def test_report(self):
+        """
+        Test the consumption of a vehicle over all its fill-ups
+        """
+        (row,) = consumption.get_report()
+
+        self.assertEqual(row.vehicle, "VPS Test")
+        self.assertEqual(row.fill_ups, 3)
+        self.assertEqual(row.quantity, Decimal("115"))
+        self.assertEqual(row.amount, Decimal("176"))
+        self.assertEqual(row.distance, 1000)
+        # The fuel of the first fill-up was burnt before the history
+        self.assertEqual(row.litres_per_100_km, Decimal("7.50"))
+        self.assertEqual(row.cost_per_km, Decimal("0.12"))
+        self.assertEqual(row.price_per_litre, Decimal("1.53"))
+
+    def test_report_dates(self):
+        """
+        Test that the report only counts the fill-ups of the period
+        """
+        (row,) = consumption.get_report(
+            datetime.date(2024, 2, 1), datetime.date(2024, 2, 28)
+        )
+
+        # The fill-up of February is paired with the one of January
+        self.assertEqual(row.fill_ups, 1)
+        self.assertEqual(row.distance, 500)
+        self.assertEqual(row.litres_per_100_km, Decimal("7.00"))
+
+        # AND a period without a paired fill-up has no consumption
+        (row,) = consumption.get_report(end=datetime.date(2024, 1, 31))
+        self.assertIsNone(row.litres_per_100_km)
+        self.assertEqual(row.price_per_litre, Decimal("1.50"))
+
+    def test_admin_report(self):
+        """
+        Test that the report is shown in the administration and exported to CSV
+        """
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+        response = self.client.get("/admin/main/fuelexpense/")
+        self.assertContains(response, "/admin/main/fuelexpense/consumption/")
+
+        response = self.client.get(
+            "/admin/main/fuelexpense/consumption/", {"start": "2024-02-01"}
+        )
+        self.assertContains(response, "VPS Test")
+        self.assertContains(response, "7,50")
+        self.assertContains(response, "start=2024-02-01&amp;format=csv")
+
+        response = self.client.get(
+            "/admin/main/fuelexpense/consumption/",
+            {"start": "2024-02-01", "format": "csv"},
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            response.content.decode().splitlines()[1],
+            "VPS Test,2,75.00,116.00,1000,7.50,0.12,1.55",
+        )
+
+    def test_admin_report_invalid_dates(self):
+        """
+        Test that a period ending before it starts is refused
+        """
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+        response = self.client.get(
+            "/admin/main/fuelexpense/consumption/",
+            {"start": "2024-03-01", "end": "2024-02-01"},
+        )
+        self.assertContains(response, "La date de début doit précéder la date de fin")
+        self.assertNotContains(response, "VPS Test")
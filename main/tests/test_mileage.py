@@ -0,0 +1,187 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from main.models import Trip, Vehicle
+
+
+class VehicleMileageTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        cls.test_time = timezone.make_aware(
+            timezone.datetime.fromisoformat("2021-01-01T00:00")
+        )
+
+    def finish_trip(self, starting_mileage, ending_mileage, hours=0):
+        return Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=starting_mileage,
+            ending_mileage=ending_mileage,
+            starting_time=self.test_time + timezone.timedelta(hours=hours),
+            ending_time=self.test_time + timezone.timedelta(hours=hours + 1),
+            driver_name="John Doe",
+            purpose="DPS",
+            finished=True,
+        )
+
+    def test_mileage_read_without_query(self):
+        """
+        Test that reading the mileage of a vehicle does not hit the database
+        """
+        # GIVEN a vehicle with a finished trip
+        self.finish_trip(5, 10)
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+
+        # WHEN the mileage is read
+        # THEN no query should be made
+        with self.assertNumQueries(0):
+            self.assertEqual(vehicle.mileage, 10)
+            self.assertEqual(vehicle.last_trip_distance, 5)
+
+    def test_mileage_updated_when_trip_finishes(self):
+        """
+        Test that the odometer follows the trips as they are finished
+        """
+        # GIVEN a vehicle with a started trip
+        trip = Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=100,
+            starting_time=self.test_time,
+            driver_name="John Doe",
+            purpose="DPS",
+        )
+        self.assertEqual(Vehicle.objects.get(pk=self.vehicle.pk).mileage, 0)
+
+        # WHEN the trip is finished
+        trip = Trip.objects.get(pk=trip.pk)
+        trip.ending_mileage = 150
+        trip.ending_time = self.test_time + timezone.timedelta(hours=1)
+        trip.finished = True
+        trip.save()
+
+        # THEN the odometer and the last trip distance should be updated
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 150)
+        self.assertEqual(vehicle.last_trip_distance, 50)
+
+    def test_mileage_never_decreases_with_older_trip(self):
+        """
+        Test that recording an older trip does not move the odometer backwards
+        """
+        # GIVEN a vehicle with a mileage of 200
+        self.finish_trip(100, 200, hours=10)
+
+        # WHEN an older trip is recorded
+        self.finish_trip(5, 50)
+
+        # THEN the odometer and last trip should not change
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 200)
+        self.assertEqual(vehicle.last_trip_distance, 100)
+
+    def test_mileage_corrected_when_trip_edited(self):
+        """
+        Test that correcting the ending mileage of the latest trip updates the odometer
+        """
+        # GIVEN a vehicle with two finished trips
+        self.finish_trip(5, 50)
+        trip = self.finish_trip(50, 5000, hours=2)
+
+        # WHEN the ending mileage of the latest trip is corrected
+        trip = Trip.objects.get(pk=trip.pk)
+        trip.ending_mileage = 80
+        trip.save()
+
+        # THEN the odometer should be rebuilt from the history
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 80)
+        self.assertEqual(vehicle.last_trip_distance, 30)
+
+    def test_mileage_corrected_when_trip_moved(self):
+        """
+        Test that moving a trip to another vehicle updates both odometers
+        """
+        # GIVEN a vehicle with a finished trip
+        trip = self.finish_trip(10, 100)
+        other = Vehicle.objects.create(
+            name="VL Test",
+            type=Vehicle.VehicleType.VL,
+            model_name="Renault Clio",
+            fuel=Vehicle.FuelChoice.UNLEADED_95_10,
+            registration_number="5678EFGH",
+        )
+
+        # WHEN the trip is moved to another vehicle
+        trip = Trip.objects.get(pk=trip.pk)
+        trip.vehicle = other
+        trip.save()
+
+        # THEN it should only count in the odometer of the other vehicle
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 0)
+        self.assertIsNone(vehicle.last_trip_distance)
+        other.refresh_from_db()
+        self.assertEqual(other.mileage, 100)
+        self.assertEqual(other.last_trip_distance, 90)
+
+    def test_mileage_corrected_when_trip_deleted(self):
+        """
+        Test that deleting the latest trip updates the odometer
+        """
+        # GIVEN a vehicle with two finished trips
+        self.finish_trip(5, 50)
+        trip = self.finish_trip(50, 80, hours=2)
+
+        # WHEN the latest trip is deleted
+        trip.delete()
+
+        # THEN the odometer should go back to the previous trip
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 50)
+        self.assertEqual(vehicle.last_trip_distance, 45)
+
+    def test_vehicle_save_keeps_odometer(self):
+        """
+        Test that saving a stale vehicle instance does not overwrite the odometer
+        """
+        # GIVEN a vehicle instance loaded before a trip is finished
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.finish_trip(5, 10)
+
+        # WHEN the stale instance is saved
+        vehicle.status = Vehicle.VehicleStatus.IN_REPAIR
+        vehicle.save()
+
+        # THEN the odometer should be kept
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.status, Vehicle.VehicleStatus.IN_REPAIR)
+        self.assertEqual(vehicle.mileage, 10)
+
+    def test_rebuild_mileage_command(self):
+        """
+        Test that the rebuild_mileage command restores the odometer from the history
+        """
+        # GIVEN a vehicle with an out of sync odometer
+        self.finish_trip(5, 10)
+        self.finish_trip(10, 25, hours=2)
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(
+            current_mileage=0, last_trip_distance=None, last_trip_ending_time=None
+        )
+
+        # WHEN the command is run
+        call_command("rebuild_mileage", stdout=StringIO())
+
+        # THEN the odometer should be rebuilt
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        self.assertEqual(vehicle.mileage, 25)
+        self.assertEqual(vehicle.last_trip_distance, 15)
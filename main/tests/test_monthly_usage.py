@@ -0,0 +1,253 @@
+import datetime
+import io
+import zoneinfo
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from main import usage
+from main.archive import archive_trips
+from main.models import FuelExpense, MonthlyUsage, Trip, Vehicle
+from main.sync import ingest_events
+
+PARIS = zoneinfo.ZoneInfo("Europe/Paris")
+
+
+class MonthlyUsageTestCase(TestCase):
+    def setUp(self):
+        self.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        self.trip = self.create_trip(
+            100, datetime.datetime(2024, 3, 10, 8, tzinfo=PARIS), hours=2
+        )
+
+    def create_trip(self, starting_mileage, starting_time, hours=1, distance=50):
+        return Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=starting_mileage,
+            ending_mileage=starting_mileage + distance,
+            starting_time=starting_time,
+            ending_time=starting_time + datetime.timedelta(hours=hours),
+            driver_name="Driver",
+            purpose="DPS",
+            finished=True,
+        )
+
+    def get_usages(self):
+        return list(
+            MonthlyUsage.objects.order_by("month").values_list(
+                "month", "trip_count", "distance", "duration", "fuel_amount"
+            )
+        )
+
+    def test_finished_trip(self):
+        """
+        Test that a finished trip counts in the month it started in
+        """
+        self.assertEqual(
+            self.get_usages(),
+            [
+                (
+                    datetime.date(2024, 3, 1),
+                    1,
+                    50,
+                    datetime.timedelta(hours=2),
+                    Decimal("0"),
+                )
+            ],
+        )
+
+        # AND a trip in progress or aborted should not count
+        self.trip.delete()
+        trip = Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=150,
+            starting_time=datetime.datetime(2024, 3, 12, tzinfo=PARIS),
+            driver_name="Driver",
+            purpose="DPS",
+        )
+        trip.finished = True
+        trip.save()
+        self.assertEqual(self.get_usages(), [])
+
+    def test_local_month(self):
+        """
+        Test that the months are those of the local time
+        """
+        # The first of April in Paris, still March in UTC
+        self.create_trip(
+            150, datetime.datetime(2024, 3, 31, 22, 30, tzinfo=datetime.timezone.utc)
+        )
+
+        self.assertEqual(
+            [(month, trips) for month, trips, *_ in self.get_usages()],
+            [(datetime.date(2024, 3, 1), 1), (datetime.date(2024, 4, 1), 1)],
+        )
+
+    def test_corrected_trip(self):
+        """
+        Test that a trip moved to another month updates both months
+        """
+        self.create_trip(150, datetime.datetime(2024, 3, 20, tzinfo=PARIS))
+
+        trip = Trip.objects.get(pk=self.trip.pk)
+        trip.starting_time = datetime.datetime(2024, 2, 10, 8, tzinfo=PARIS)
+        trip.ending_time = trip.starting_time + datetime.timedelta(hours=3)
+        trip.ending_mileage = 180
+        trip.save()
+
+        self.assertEqual(
+            [
+                (month, trips, distance)
+                for month, trips, distance, *_ in self.get_usages()
+            ],
+            [(datetime.date(2024, 2, 1), 1, 80), (datetime.date(2024, 3, 1), 1, 50)],
+        )
+
+    def test_deleted_trip(self):
+        """
+        Test that a month left without any use is removed
+        """
+        Trip.objects.get(pk=self.trip.pk).delete()
+
+        self.assertEqual(self.get_usages(), [])
+
+    def test_fuel_expenses(self):
+        """
+        Test that the fuel expenses count in the month of their date
+        """
+        expense = FuelExpense.objects.create(
+            vehicle=self.vehicle,
+            date=datetime.date(2024, 3, 15),
+            mileage=150,
+            amount=Decimal("60.50"),
+            quantity=Decimal("40"),
+        )
+        FuelExpense.objects.create(
+            vehicle=self.vehicle,
+            date=datetime.date(2024, 3, 25),
+            mileage=300,
+            amount=Decimal("30"),
+            quantity=Decimal("20"),
+        )
+        self.assertEqual(self.get_usages()[0][4], Decimal("90.50"))
+
+        # WHEN an expense is moved to another month
+        expense = FuelExpense.objects.get(pk=expense.pk)
+        expense.date = datetime.date(2024, 4, 1)
+        expense.save()
+
+        # THEN both months should be updated
+        self.assertEqual(
+            [(month, amount) for month, *_, amount in self.get_usages()],
+            [
+                (datetime.date(2024, 3, 1), Decimal("30")),
+                (datetime.date(2024, 4, 1), Decimal("60.50")),
+            ],
+        )
+
+        # AND a deleted expense should not count anymore
+        expense.delete()
+        self.assertEqual(len(self.get_usages()), 1)
+
+    def test_synced_events(self):
+        """
+        Test that the trips and fuel expenses recorded offline count too
+        """
+        ingest_events(
+            self.vehicle.pk,
+            [
+                {
+                    "key": "trip-1",
+                    "type": "trip_start",
+                    "starting_mileage": 150,
+                    "starting_time": "2024-05-02T08:00:00+02:00",
+                    "driver_name": "Driver",
+                    "purpose": "DPS",
+                },
+                {
+                    "key": "trip-1-end",
+                    "type": "trip_end",
+                    "ending_mileage": 190,
+                    "ending_time": "2024-05-02T09:30:00+02:00",
+                },
+                {
+                    "key": "fuel-1",
+                    "type": "fuel_expense",
+                    "date": "2024-05-02",
+                    "mileage": 190,
+                    "amount": "50",
+                    "quantity": "30",
+                    "form_of_payment": "FUEL CARD",
+                },
+            ],
+        )
+
+        self.assertEqual(
+            self.get_usages()[-1],
+            (
+                datetime.date(2024, 5, 1),
+                1,
+                40,
+                datetime.timedelta(hours=1, minutes=30),
+                Decimal("50"),
+            ),
+        )
+
+    def test_archived_trips(self):
+        """
+        Test that the archived trips still count
+        """
+        self.create_trip(150, datetime.datetime(2024, 3, 20, tzinfo=PARIS))
+        before = self.get_usages()
+
+        archive_trips(datetime.datetime(2025, 1, 1, tzinfo=PARIS), keep=1)
+        usage.refresh([(self.vehicle.pk, datetime.date(2024, 3, 1))])
+
+        self.assertEqual(self.get_usages(), before)
+
+    def test_rebuild(self):
+        """
+        Test the rebuild_usage command
+        """
+        MonthlyUsage.objects.all().delete()
+        out = io.StringIO()
+
+        call_command("rebuild_usage", stdout=out)
+
+        self.assertIn("1 mois de véhicule recalculé(s)", out.getvalue())
+        self.assertEqual(self.get_usages()[0][1:3], (1, 50))
+
+    def test_dashboard(self):
+        """
+        Test that the dashboard shows the usages of the year
+        """
+        self.create_trip(150, datetime.datetime(2024, 4, 2, tzinfo=PARIS), hours=1.5)
+        self.create_trip(200, datetime.datetime(2023, 4, 2, tzinfo=PARIS))
+
+        (vehicle,) = usage.get_dashboard(2024)
+
+        self.assertEqual(vehicle.vehicle, "VPS Test")
+        self.assertEqual(len(vehicle.months), 2)
+        self.assertEqual(vehicle.trip_count, 2)
+        self.assertEqual(vehicle.distance, 100)
+        self.assertEqual(vehicle.hours, Decimal("3.5"))
+
+        # AND it should be shown in the administration
+        self.client.force_login(User.objects.create_superuser("admin"))
+        response = self.client.get("/admin/main/vehicle/")
+        self.assertContains(response, "/admin/main/vehicle/usage/")
+
+        response = self.client.get("/admin/main/vehicle/usage/", {"year": 2024})
+        self.assertContains(response, "VPS Test", count=1)
+        self.assertContains(response, "Mars 2024")
+        self.assertContains(response, "3,5")
+        self.assertNotContains(response, "2023")
@@ -0,0 +1,247 @@
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import OperationalError, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from main.models import Defect, Notification, Setting, Vehicle
+from main.utils import deliver_notifications
+
+
+class NotificationOutboxTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        Setting.manager.create(
+            key="defect_notification_email", value="vehicules@mail.com"
+        )
+
+    def create_defect(self, comment="Flat tyre"):
+        return Defect.objects.create(
+            vehicle=self.vehicle, comment=comment, reporter_name="Jane Doe"
+        )
+
+    def test_notification_queued_with_defect(self):
+        """
+        Test that creating a defect queues a notification without sending it
+        """
+        # WHEN a defect is created
+        self.create_defect()
+
+        # THEN a notification should be queued but not sent
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.NotificationStatus.PENDING)
+        self.assertEqual(notification.recipient_list, ["vehicules@mail.com"])
+        self.assertIn("Flat tyre", notification.text_body)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_notification_rolled_back_with_defect(self):
+        """
+        Test that the notification is not queued when the defect is not saved
+        """
+        # WHEN the transaction creating a defect is rolled back
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_defect()
+                raise RuntimeError()
+
+        # THEN no notification should be queued
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_deliver_batch_over_one_connection(self):
+        """
+        Test that the due notifications are sent over a single connection
+        """
+        # GIVEN several queued notifications
+        for i in range(3):
+            self.create_defect(f"Defect {i}")
+
+        # WHEN the outbox is processed
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.open"
+        ) as open_connection:
+            sent = deliver_notifications()
+
+        # THEN every notification should be sent, after opening a single connection
+        self.assertEqual(sent, 3)
+        self.assertEqual(open_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(
+            Notification.objects.exclude(
+                status=Notification.NotificationStatus.SENT
+            ).exists()
+        )
+
+        # AND they should not be sent again
+        self.assertEqual(deliver_notifications(), 0)
+
+    def test_retry_with_backoff(self):
+        """
+        Test that a failed delivery is retried later, with an increasing delay
+        """
+        # GIVEN a queued notification
+        self.create_defect()
+
+        # WHEN the mail server fails
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=SMTPException("Connection refused"),
+        ):
+            self.assertEqual(deliver_notifications(), 0)
+
+        # THEN the notification should be kept and retried later
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.NotificationStatus.PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertIn("Connection refused", notification.last_error)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+        first_delay = notification.next_attempt_at - timezone.now()
+
+        # AND not sent before the next attempt is due
+        self.assertEqual(deliver_notifications(), 0)
+
+        # WHEN it fails again, THEN the delay should increase
+        notification.mark_failed(SMTPException("Connection refused"))
+        self.assertGreater(notification.next_attempt_at - timezone.now(), first_delay)
+
+        # WHEN the server is back and the attempt is due
+        Notification.objects.update(next_attempt_at=timezone.now())
+        call_command("process_outbox", stdout=StringIO())
+
+        # THEN the notification should be sent
+        self.assertEqual(len(mail.outbox), 1)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, Notification.NotificationStatus.SENT)
+
+    def test_daemon_survives_errors(self):
+        """
+        Test that the outbox daemon keeps polling after an error
+        """
+        stderr = StringIO()
+
+        # WHEN a poll fails, such as on a locked database
+        with mock.patch(
+            "main.utils.deliver_notifications",
+            side_effect=[OperationalError("database is locked"), 0],
+        ) as deliver, mock.patch(
+            "main.management.commands.process_outbox.close_old_connections"
+        ) as close_old_connections, mock.patch(
+            "time.sleep", side_effect=[None, KeyboardInterrupt]
+        ):
+            call_command("process_outbox", daemon=True, stderr=stderr)
+
+        # THEN it should be logged and the outbox polled again, on a new
+        # connection if it was lost
+        self.assertEqual(deliver.call_count, 2)
+        close_old_connections.assert_called_once()
+        self.assertIn("database is locked", stderr.getvalue())
+
+    def test_give_up_after_max_attempts(self):
+        """
+        Test that a notification is marked as failed after too many attempts
+        """
+        # GIVEN a notification failing repeatedly
+        self.create_defect()
+        notification = Notification.objects.get()
+
+        # WHEN it reaches the maximum number of attempts
+        for _ in range(Notification.MAX_ATTEMPTS):
+            notification.mark_failed(SMTPException("Connection refused"))
+
+        # THEN it should be marked as failed
+        self.assertEqual(notification.status, Notification.NotificationStatus.FAILED)
+
+
+class NotificationDigestTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        Setting.manager.create(
+            key="defect_notification_email", value="vehicules@mail.com"
+        )
+        Setting.manager.create(key="notification_digest_minutes", value="15")
+
+    def create_defect(self, comment):
+        return Defect.objects.create(
+            vehicle=self.vehicle, comment=comment, reporter_name="Jane Doe"
+        )
+
+    def test_notifications_held_during_window(self):
+        """
+        Test that notifications are not sent before the end of the digest window
+        """
+        # WHEN defects are created
+        self.create_defect("Flat tyre")
+        self.create_defect("Broken mirror")
+
+        # THEN nothing should be sent before the end of the window
+        self.assertEqual(deliver_notifications(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # AND both notifications should share the same window
+        self.assertEqual(
+            Notification.objects.values("next_attempt_at").distinct().count(), 1
+        )
+
+    def test_digest_sent_at_end_of_window(self):
+        """
+        Test that the notifications of a window are sent as a single email
+        """
+        # GIVEN several defects reported during the window
+        self.create_defect("Flat tyre")
+        self.create_defect("Broken mirror")
+        self.create_defect("Empty tank")
+
+        # WHEN the window is over and the outbox is processed
+        Notification.objects.update(next_attempt_at=timezone.now())
+        deliver_notifications()
+
+        # THEN a single email should be sent, with every defect
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["vehicules@mail.com"])
+        self.assertIn("3 notifications", mail.outbox[0].subject)
+        for comment in ["Flat tyre", "Broken mirror", "Empty tank"]:
+            self.assertIn(comment, mail.outbox[0].body)
+
+        # AND the original notifications should be marked as merged
+        digest = Notification.objects.get(kind=Notification.NotificationKind.DIGEST)
+        self.assertEqual(digest.status, Notification.NotificationStatus.SENT)
+        self.assertEqual(digest.merged_notifications.count(), 3)
+
+    def test_single_notification_sent_as_is(self):
+        """
+        Test that a notification alone in its window is sent without a digest
+        """
+        # GIVEN a single defect reported during the window
+        self.create_defect("Flat tyre")
+
+        # WHEN the window is over and the outbox is processed
+        Notification.objects.update(next_attempt_at=timezone.now())
+        deliver_notifications()
+
+        # THEN the notification should be sent as is
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Anomalie signalée", mail.outbox[0].subject)
+        self.assertFalse(
+            Notification.objects.filter(
+                kind=Notification.NotificationKind.DIGEST
+            ).exists()
+        )
@@ -0,0 +1,276 @@
+import datetime
+import io
+import tempfile
+from unittest import mock
+
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from main import labels, qr_codes
+from main.models import LabelSheetJob, Vehicle
+
+
+class QrCodeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicles = [
+            Vehicle.objects.create(
+                name=f"VPS {i}",
+                type=Vehicle.VehicleType.VPSP,
+                model_name="Renault Master",
+                fuel=Vehicle.FuelChoice.DIESEL,
+                registration_number=f"{i}234ABCD",
+                status=Vehicle.VehicleStatus.OPERATIONAL,
+            )
+            for i in range(3)
+        ]
+        cls.user = User.objects.create_superuser("admin")
+
+    def setUp(self):
+        cache.clear()
+        caches[qr_codes.QR_CODE_CACHE].clear()
+        self.client.force_login(self.user)
+
+    def print_labels(self):
+        return self.client.post(
+            "/admin/main/vehicle/",
+            {
+                "action": "get_qr_code",
+                "_selected_action": [vehicle.pk for vehicle in self.vehicles],
+            },
+        )
+
+    def test_labels_printed_from_cache(self):
+        """
+        Test that the QR codes are only encoded the first time they are printed
+        """
+        with mock.patch(
+            "main.qr_codes.make_qr_code", wraps=qr_codes.make_qr_code
+        ) as make_qr_code:
+            # WHEN the labels are printed twice
+            response = self.print_labels()
+            self.assertEqual(make_qr_code.call_count, 3)
+            cached_response = self.print_labels()
+
+        # THEN the QR codes should be encoded once
+        self.assertEqual(make_qr_code.call_count, 3)
+
+        # AND the same labels should be printed
+        self.assertContains(cached_response, "<svg", count=3)
+        self.assertEqual(response.content, cached_response.content)
+
+    def test_large_fleet_kept_in_cache(self):
+        """
+        Test that the QR codes of a large fleet all stay cached, whatever the
+        pages cached meanwhile
+        """
+        urls = [f"https://carbon.example.com/vehicles/{i}" for i in range(400)]
+
+        with mock.patch(
+            "main.qr_codes.make_qr_code", side_effect=lambda url, style: url
+        ) as make_qr_code:
+            # WHEN the labels of the fleet are printed, with pages cached after
+            qr_codes.get_qr_codes(urls)
+            cache.set_many({f"page-{i}": i for i in range(400)})
+
+            # THEN they should be printed again without being encoded again
+            self.assertEqual(qr_codes.get_qr_codes(urls)[urls[0]], urls[0])
+            self.assertEqual(make_qr_code.call_count, 400)
+
+    def test_cache_warmed_on_creation(self):
+        """
+        Test that the QR code of a vehicle is encoded when it is created
+        """
+        # WHEN a vehicle is created in the administration
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/admin/main/vehicle/add/",
+                {
+                    "name": "VPS Nouveau",
+                    "type": Vehicle.VehicleType.VPSP,
+                    "model_name": "Renault Master",
+                    "fuel": Vehicle.FuelChoice.DIESEL,
+                    "registration_number": "9999ZZZZ",
+                    "status": Vehicle.VehicleStatus.OPERATIONAL,
+                    "current_mileage": 0,
+                    "defect_set-TOTAL_FORMS": 0,
+                    "defect_set-INITIAL_FORMS": 0,
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+        vehicle = Vehicle.objects.get(name="VPS Nouveau")
+
+        # THEN its label should be printed without encoding its QR code
+        self.vehicles = [vehicle]
+        with mock.patch("main.qr_codes.make_qr_code") as make_qr_code:
+            response = self.print_labels()
+
+        make_qr_code.assert_not_called()
+        self.assertContains(response, "<svg")
+
+
+class LabelSheetJobTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # More vehicles than labels on a sheet
+        cls.vehicles = [
+            Vehicle.objects.create(
+                name=f"VPS {i:02}",
+                type=Vehicle.VehicleType.VPSP,
+                model_name="Renault Master",
+                fuel=Vehicle.FuelChoice.DIESEL,
+                registration_number=f"{i:02}34ABCD",
+                status=Vehicle.VehicleStatus.OPERATIONAL,
+            )
+            for i in range(labels.LABELS_PER_SHEET + 1)
+        ]
+        cls.user = User.objects.create_superuser("admin")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_sheets_generated(self):
+        """
+        Test that the sheets requested from the administration are generated
+        in the background and downloaded once done
+        """
+        # WHEN the sheets of every vehicle are requested
+        response = self.client.post(
+            "/admin/main/vehicle/",
+            {
+                "action": "generate_label_sheets",
+                "_selected_action": [vehicle.pk for vehicle in self.vehicles],
+            },
+            follow=True,
+        )
+
+        # THEN a job should be pending
+        job = LabelSheetJob.objects.get()
+        self.assertEqual(job.status, LabelSheetJob.JobStatus.PENDING)
+        self.assertEqual(job.site_url, "http://testserver")
+        self.assertContains(response, f"/admin/main/labelsheetjob/{job.pk}/change/")
+
+        # WHEN the jobs are processed
+        call_command("process_label_jobs", workers=2, stdout=io.StringIO())
+
+        # THEN the sheets should be generated
+        job.refresh_from_db()
+        self.assertEqual(job.status, LabelSheetJob.JobStatus.DONE)
+        self.assertEqual(job.progress(), "2 / 2")
+
+        # AND they should be printed from the administration
+        response = self.client.get(f"/admin/main/labelsheetjob/{job.pk}/download/")
+        self.assertEqual(response.status_code, 200)
+        document = b"".join(response.streaming_content).decode()
+        self.assertEqual(document.count('class="sheet"'), 2)
+        self.assertEqual(document.count('class="segno"'), len(self.vehicles))
+        self.assertIn("VPS 12", document)
+        # AND the coordinates should not be localized
+        self.assertIn('<rect x="70.0" y="0.0"', document)
+
+    def test_failed_job(self):
+        """
+        Test that a failing job is recorded and can be retried
+        """
+        job = LabelSheetJob.objects.create(site_url="http://testserver")
+        job.vehicles.set(self.vehicles)
+
+        with mock.patch(
+            "main.labels.generate_job", side_effect=RuntimeError("Disque plein")
+        ):
+            self.assertEqual(labels.process_label_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, LabelSheetJob.JobStatus.FAILED)
+        self.assertIn("Disque plein", job.last_error)
+
+        # AND it cannot be downloaded
+        response = self.client.get(f"/admin/main/labelsheetjob/{job.pk}/download/")
+        self.assertEqual(response.status_code, 404)
+
+        # AND it can be retried
+        self.client.post(
+            "/admin/main/labelsheetjob/",
+            {"action": "retry", helpers.ACTION_CHECKBOX_NAME: [job.pk]},
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.status, LabelSheetJob.JobStatus.PENDING)
+        self.assertEqual(job.last_error, "")
+
+    def test_daemon_survives_errors(self):
+        """
+        Test that the label sheet daemon keeps polling after an error
+        """
+        stderr = io.StringIO()
+
+        # WHEN a poll fails, such as on a locked database
+        with mock.patch(
+            "main.labels.process_label_jobs",
+            side_effect=[OperationalError("database is locked"), 0],
+        ) as process_label_jobs, mock.patch(
+            "main.management.commands.process_label_jobs.close_old_connections"
+        ), mock.patch(
+            "time.sleep", side_effect=[None, KeyboardInterrupt]
+        ):
+            call_command("process_label_jobs", daemon=True, stderr=stderr)
+
+        # THEN it should be logged and the jobs polled again
+        self.assertEqual(process_label_jobs.call_count, 2)
+        self.assertIn("database is locked", stderr.getvalue())
+
+    def test_interrupted_job(self):
+        """
+        Test that a job left running by a dead worker is generated again once
+        its lease expired, and only then
+        """
+        running = LabelSheetJob.objects.create(
+            site_url="http://testserver",
+            status=LabelSheetJob.JobStatus.RUNNING,
+            lease_expires_at=timezone.now() + datetime.timedelta(minutes=1),
+        )
+        running.vehicles.set(self.vehicles[:1])
+        interrupted = LabelSheetJob.objects.create(
+            site_url="http://testserver",
+            status=LabelSheetJob.JobStatus.RUNNING,
+            lease_expires_at=timezone.now() - datetime.timedelta(minutes=1),
+        )
+        interrupted.vehicles.set(self.vehicles[:1])
+
+        # WHEN both are retried from the administration
+        response = self.client.post(
+            "/admin/main/labelsheetjob/",
+            {
+                "action": "retry",
+                helpers.ACTION_CHECKBOX_NAME: [running.pk, interrupted.pk],
+            },
+            follow=True,
+        )
+
+        # THEN the one still being generated should be left to its worker
+        self.assertContains(response, "peuvent être relancées")
+        running.refresh_from_db()
+        self.assertEqual(running.status, LabelSheetJob.JobStatus.RUNNING)
+        interrupted.refresh_from_db()
+        self.assertEqual(interrupted.status, LabelSheetJob.JobStatus.PENDING)
+
+        # AND an interrupted job should be claimed again without being retried
+        LabelSheetJob.objects.filter(pk=interrupted.pk).update(
+            status=LabelSheetJob.JobStatus.RUNNING
+        )
+        self.assertEqual(labels.process_label_jobs(), 1)
+
+        interrupted.refresh_from_db()
+        self.assertEqual(interrupted.status, LabelSheetJob.JobStatus.DONE)
+        running.refresh_from_db()
+        self.assertEqual(running.status, LabelSheetJob.JobStatus.RUNNING)
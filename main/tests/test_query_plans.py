@@ -0,0 +1,143 @@
+import unittest
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from main.models import Defect, FuelExpense, Trip, Vehicle
+from main.tests.query_plans import assert_indexed_queries
+
+
+class QueryPlanTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        Trip.objects.create(
+            vehicle=cls.vehicle,
+            starting_mileage=0,
+            ending_mileage=10,
+            starting_time="2024-01-01T08:00Z",
+            ending_time="2024-01-01T09:00Z",
+            driver_name="John Doe",
+            purpose="DPS",
+            finished=True,
+        )
+        Defect.objects.create(
+            vehicle=cls.vehicle, comment="Flat tyre", reporter_name="Jane Doe"
+        )
+        cls.user = User.objects.create_superuser("admin")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_pages(self):
+        """
+        Test that the queries of the public pages use indexes
+        """
+        url = f"/vehicles/{self.vehicle.pk}"
+        trip = {
+            "starting_mileage": 10,
+            "starting_time": "2024-01-02T08:00",
+            "driver_name": "John Doe",
+            "purpose": "DPS",
+        }
+
+        with assert_indexed_queries(self):
+            self.client.get(url)
+            self.client.post(f"{url}/trip-start", trip)
+            self.client.get(url)
+            self.client.post(
+                f"{url}/trip-end",
+                {**trip, "ending_mileage": 20, "ending_time": "2024-01-02T09:00"},
+            )
+            self.client.post(
+                f"{url}/defect", {"comment": "Broken mirror", "reporter_name": "A"}
+            )
+            self.client.post(
+                f"{url}/fuel-expense",
+                {
+                    "date": "2024-01-02",
+                    "mileage": 20,
+                    "amount": "80",
+                    "quantity": "45",
+                    "form_of_payment": FuelExpense.FormOfPaymentChoice.FUEL_CARD,
+                },
+            )
+
+        self.assertEqual(self.vehicle.trip_set.count(), 2)
+
+    def test_dashboard_and_admin(self):
+        """
+        Test that the queries of the dashboard and the administration use
+        indexes, except for the paginated lists of trips
+        """
+        self.client.force_login(self.user)
+
+        with assert_indexed_queries(self, allowed_tables=["main_trip"]):
+            self.client.get("/vehicles")
+            self.client.get("/admin/main/vehicle/")
+            self.client.get(f"/admin/main/vehicle/{self.vehicle.pk}/change/")
+            self.client.get("/admin/main/trip/")
+
+    def test_model_queries(self):
+        """
+        Test that the annotations and the odometer rebuild use indexes
+        """
+        with assert_indexed_queries(self):
+            vehicle = (
+                Vehicle.objects.with_mileage()
+                .with_current_trip()
+                .with_open_defect_count()
+                .get(pk=self.vehicle.pk)
+            )
+            vehicle.refresh_mileage()
+            list(vehicle.open_defects)
+            vehicle.trip_set.get().delete()
+
+        self.assertEqual(vehicle.open_defect_count, 1)
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "SQLite query plans")
+    def test_composite_indexes(self):
+        """
+        Test that the hot queries are answered by the composite indexes,
+        without sorting
+        """
+        trip_indexes = {index.fields[1]: index.name for index in Trip._meta.indexes}
+        queries = [
+            (
+                # Odometer
+                Trip.objects.filter(vehicle=self.vehicle, ending_mileage__isnull=False)
+                .order_by("-ending_mileage")
+                .values("ending_mileage")[:1],
+                trip_indexes["ending_mileage"],
+            ),
+            (
+                # Last finished trip
+                self.vehicle.trip_set.filter(
+                    finished=True, ending_time__isnull=False
+                ).order_by("-ending_time")[:1],
+                trip_indexes["ending_time"],
+            ),
+            (
+                self.vehicle.open_defects,
+                Defect._meta.indexes[0].name,
+            ),
+            (
+                FuelExpense.objects.filter(vehicle=self.vehicle).order_by("-date"),
+                FuelExpense._meta.indexes[0].name,
+            ),
+        ]
+
+        for queryset, index_name in queries:
+            with self.subTest(index=index_name):
+                plan = queryset.explain()
+                self.assertIn(index_name, plan)
+                self.assertNotIn("TEMP B-TREE", plan)
@@ -0,0 +1,132 @@
+import copy
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Trip, Vehicle
+from main.routers import REPLICA_DB_ALIAS, use_replica
+
+
+class ReplicaMixin:
+    """
+    Adds a replica alias, reading the test database through its own
+    connection.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings_dict = copy.deepcopy(connections[DEFAULT_DB_ALIAS].settings_dict)
+        settings_dict["TEST"]["MIRROR"] = DEFAULT_DB_ALIAS
+        connections.settings[REPLICA_DB_ALIAS] = settings_dict
+        cls.databases = cls.databases | {REPLICA_DB_ALIAS}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+        super().tearDownClass()
+
+
+class ReplicaRouterTestCase(SimpleTestCase):
+    def test_without_replica(self):
+        """
+        Test that the reads stay on the primary when no replica is configured
+        """
+        with use_replica():
+            self.assertEqual(router.db_for_read(Trip), DEFAULT_DB_ALIAS)
+
+    def test_migrations(self):
+        """
+        Test that the replica is not migrated
+        """
+        self.assertFalse(router.allow_migrate(REPLICA_DB_ALIAS, "main"))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, "main"))
+
+
+class ReplicaRoutingTestCase(ReplicaMixin, SimpleTestCase):
+    def test_reads(self):
+        """
+        Test that only the reads of use_replica() go to the replica
+        """
+        self.assertEqual(router.db_for_read(Trip), DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(router.db_for_read(Trip), REPLICA_DB_ALIAS)
+            # AND the writes should stay on the primary
+            self.assertEqual(router.db_for_write(Trip), DEFAULT_DB_ALIAS)
+
+    def test_objects_read_from_the_replica(self):
+        """
+        Test that the objects read from the replica are saved on the primary
+        """
+        trip = Trip(starting_mileage=0)
+        trip._state.db = REPLICA_DB_ALIAS
+        self.assertEqual(router.db_for_write(Trip, instance=trip), DEFAULT_DB_ALIAS)
+
+
+class ReplicaChangeListTestCase(ReplicaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=0,
+            driver_name="Driver",
+            purpose="DPS",
+        )
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+    def test_changelist(self):
+        """
+        Test that the trips list is read from the replica
+        """
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica:
+            response = self.client.get("/admin/main/trip/")
+
+        self.assertContains(response, "Driver")
+        self.assertTrue(
+            any(
+                'FROM "main_trip"' in query["sql"] for query in replica.captured_queries
+            )
+        )
+
+    def test_changelist_after_change(self):
+        """
+        Test that the list shown after a change is read from the primary
+        """
+        trip = Trip.objects.get()
+
+        # WHEN a trip is changed from the administration
+        response = self.client.post(
+            f"/admin/main/trip/{trip.pk}/change/",
+            {
+                "vehicle": self.vehicle.pk,
+                "starting_mileage": 0,
+                "ending_mileage": 10,
+                "starting_time_0": "2023-10-01",
+                "starting_time_1": "10:00",
+                "driver_name": "Other driver",
+                "purpose": "DPS",
+                "finished": "on",
+            },
+        )
+        self.assertRedirects(
+            response, "/admin/main/trip/", fetch_redirect_response=False
+        )
+
+        # THEN the list showing the change should not be read from the replica
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica:
+            response = self.client.get("/admin/main/trip/")
+
+        self.assertContains(response, "Other driver")
+        self.assertEqual(replica.captured_queries, [])
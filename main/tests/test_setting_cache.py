@@ -0,0 +1,153 @@
+import subprocess
+import sys
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.test import TestCase, TransactionTestCase
+
+from main.models import SETTINGS_VERSION_CACHE_KEY, Setting
+
+
+class SettingReadTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Setting.manager.create(key="email_port", value="587")
+        Setting.manager.create(key="email_use_tls", value="yes")
+        Setting.manager.create(
+            key="defect_notification_email", value=" a@mail.com, ,b@mail.com "
+        )
+
+    def test_typed_accessors(self):
+        """
+        Test that the typed accessors parse the stored values
+        """
+        self.assertEqual(Setting.manager.read_int("email_port"), 587)
+        self.assertEqual(Setting.manager.read_int("missing", 25), 25)
+        self.assertTrue(Setting.manager.read_boolean("email_use_tls"))
+        self.assertFalse(Setting.manager.read_boolean("missing"))
+        self.assertEqual(
+            Setting.manager.read_list("defect_notification_email"),
+            ["a@mail.com", "b@mail.com"],
+        )
+        self.assertEqual(Setting.manager.read_list("missing"), [])
+
+    def test_read_many(self):
+        """
+        Test that several settings are read in a single query
+        """
+        with self.assertNumQueries(1):
+            values = Setting.manager.read_many(["email_port", "missing"], "?")
+
+        self.assertEqual(values, {"email_port": "587", "missing": "?"})
+
+
+class SettingCacheTestCase(TransactionTestCase):
+    def tearDown(self):
+        Setting.manager.invalidate()
+
+    def test_reads_served_from_memory(self):
+        """
+        Test that the settings are loaded once and then read from memory
+        """
+        # GIVEN some settings
+        Setting.manager.create(key="email_host", value="smtp.mail.com")
+        Setting.manager.create(key="from_email", value="carbon@mail.com")
+
+        # WHEN they are read several times
+        # THEN only the first read should hit the database
+        with self.assertNumQueries(1):
+            Setting.manager.read("email_host")
+            self.assertEqual(Setting.manager.read("email_host"), "smtp.mail.com")
+            self.assertEqual(Setting.manager.read("from_email"), "carbon@mail.com")
+
+    def test_invalidated_on_save_and_delete(self):
+        """
+        Test that saving or deleting a setting invalidates the cache
+        """
+        # GIVEN a cached setting
+        setting = Setting.manager.create(key="email_host", value="smtp.mail.com")
+        self.assertEqual(Setting.manager.read("email_host"), "smtp.mail.com")
+
+        # WHEN it is modified, THEN the new value should be read
+        setting.value = "smtp.example.com"
+        setting.save()
+        self.assertEqual(Setting.manager.read("email_host"), "smtp.example.com")
+
+        # WHEN it is deleted, THEN the default value should be read
+        setting.delete()
+        self.assertEqual(Setting.manager.read("email_host", "localhost"), "localhost")
+
+    def test_invalidated_by_other_worker(self):
+        """
+        Test that a version stamp bumped by another worker invalidates the cache
+        """
+        # GIVEN a cached setting
+        Setting.manager.create(key="email_host", value="smtp.mail.com")
+        self.assertEqual(Setting.manager.read("email_host"), "smtp.mail.com")
+
+        # WHEN another worker modifies it, without signals in this process
+        Setting.manager.filter(key="email_host").update(value="smtp.example.com")
+        self.assertEqual(Setting.manager.read("email_host"), "smtp.mail.com")
+        cache.set(SETTINGS_VERSION_CACHE_KEY, "other-worker", timeout=None)
+
+        # THEN the new value should be read once the version stamp is checked
+        # again
+        self.assertEqual(Setting.manager.read("email_host"), "smtp.mail.com")
+        with mock.patch(
+            "time.monotonic",
+            return_value=time.monotonic() + settings.CARBON_SETTINGS_CHECK_INTERVAL,
+        ):
+            self.assertEqual(Setting.manager.read("email_host"), "smtp.example.com")
+
+    def test_version_checked_periodically(self):
+        """
+        Test that the settings are read from the process memory, without
+        reading the shared cache on each read
+        """
+        # GIVEN loaded settings
+        Setting.manager.create(key="email_host", value="smtp.mail.com")
+        Setting.manager.read("email_host")
+
+        # WHEN they are read again and again
+        with mock.patch.object(cache, "get_or_set", wraps=cache.get_or_set) as get:
+            for _ in range(10):
+                Setting.manager.read("email_host")
+
+        # THEN the version stamp should not be read again
+        get.assert_not_called()
+
+    def test_cache_apart_from_deployment(self):
+        """
+        Test that the tests do not clear the caches of the deployment
+        """
+        for alias in settings.CACHES:
+            location = caches[alias]._dir
+            self.assertFalse(location.startswith(str(settings.BASE_DIR)), alias)
+
+    def test_version_shared_with_other_processes(self):
+        """
+        Test that the version stamp is seen by the other processes, such as
+        the outbox daemon
+        """
+        # WHEN a setting is saved in this process
+        Setting.manager.create(key="email_host", value="smtp.mail.com")
+        version = cache.get(SETTINGS_VERSION_CACHE_KEY)
+
+        # THEN another process should read the same version stamp
+        output = subprocess.run(
+            [
+                sys.executable,
+                "manage.py",
+                "shell",
+                "-c",
+                "from django.core.cache import cache; "
+                f"print(cache.get({SETTINGS_VERSION_CACHE_KEY!r}))",
+            ],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        self.assertEqual(output.splitlines()[-1], version)
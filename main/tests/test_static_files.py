@@ -0,0 +1,42 @@
+import json
+import pathlib
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+PRODUCTION_STORAGES = {
+    **settings.STORAGES,
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    },
+}
+
+
+class StaticFilesTestCase(SimpleTestCase):
+    def test_collectstatic(self):
+        """
+        Test that the production storage writes hashed and compressed files
+        """
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATIC_ROOT=static_root, STORAGES=PRODUCTION_STORAGES
+        ):
+            # WHEN the static files are collected
+            call_command("collectstatic", interactive=False, verbosity=0)
+
+            # THEN the templates should refer to their hashed names
+            root = pathlib.Path(static_root)
+            manifest = json.loads((root / "staticfiles.json").read_text())
+            hashed_name = manifest["paths"]["css/pico.css"]
+            self.assertRegex(hashed_name, r"^css/pico\.[0-9a-f]{12}\.css$")
+            self.assertEqual(
+                staticfiles_storage.url("css/pico.css"), f"/static/{hashed_name}"
+            )
+
+            # AND their compressed variants should be smaller
+            size = (root / hashed_name).stat().st_size
+            for extension in [".gz", ".br"]:
+                compressed = root / f"{hashed_name}{extension}"
+                self.assertLess(compressed.stat().st_size, size / 3)
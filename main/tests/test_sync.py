@@ -0,0 +1,234 @@
+from django.test import TestCase
+
+from main.models import (
+    FuelExpense,
+    IngestedEvent,
+    Notification,
+    Setting,
+    Trip,
+    Vehicle,
+)
+
+
+class VehicleSyncTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        Trip.objects.create(
+            vehicle=cls.vehicle,
+            starting_mileage=5,
+            ending_mileage=100,
+            starting_time="2024-01-01T08:00Z",
+            ending_time="2024-01-01T09:00Z",
+            driver_name="John Doe",
+            purpose="DPS",
+            finished=True,
+        )
+        Setting.manager.create(
+            key="defect_notification_email", value="vehicules@mail.com"
+        )
+
+    def sync(self, events):
+        return self.client.post(
+            f"/api/v1/vehicles/{self.vehicle.pk}/sync",
+            {"events": events},
+            content_type="application/json",
+        )
+
+    def trip_start(self, key, mileage, time="2024-01-02T08:00Z"):
+        return {
+            "key": key,
+            "type": "trip_start",
+            "starting_mileage": mileage,
+            "starting_time": time,
+            "driver_name": "John Doe",
+            "purpose": "DPS",
+        }
+
+    def trip_end(self, key, mileage, time="2024-01-02T10:00Z"):
+        return {
+            "key": key,
+            "type": "trip_end",
+            "ending_mileage": mileage,
+            "ending_time": time,
+        }
+
+    def test_batch_recorded(self):
+        """
+        Test that trips and fuel expenses recorded offline are saved in one request
+        """
+        # WHEN a batch of two trips and a fuel expense is synchronised
+        response = self.sync(
+            [
+                self.trip_start("a", 100),
+                self.trip_end("b", 150),
+                {
+                    "key": "c",
+                    "type": "fuel_expense",
+                    "date": "2024-01-02",
+                    "mileage": 150,
+                    "amount": "80.50",
+                    "quantity": "45",
+                },
+                self.trip_start("d", 150, "2024-01-03T08:00Z"),
+                self.trip_end("e", 180, "2024-01-03T09:00Z"),
+            ]
+        )
+
+        # THEN every event should be accepted
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], ["accepted"] * 5)
+        self.assertEqual(results[0]["id"], results[1]["id"])
+
+        # AND the trips and the expense should be saved
+        self.assertEqual(self.vehicle.trip_set.filter(finished=True).count(), 3)
+        self.assertEqual(FuelExpense.objects.get().mileage, 150)
+
+        # AND the odometer of the vehicle should be updated
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.mileage, 180)
+        self.assertEqual(self.vehicle.last_trip_distance, 30)
+
+    def test_duplicates_ignored(self):
+        """
+        Test that a batch sent twice is only recorded once
+        """
+        # GIVEN a synchronised batch
+        events = [self.trip_start("a", 100), self.trip_end("b", 150)]
+        self.sync(events)
+
+        # WHEN it is sent again
+        response = self.sync(events)
+
+        # THEN its events should be reported as duplicates
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["duplicate", "duplicate"],
+        )
+        self.assertEqual(self.vehicle.trip_set.count(), 2)
+        self.assertEqual(IngestedEvent.objects.count(), 2)
+
+    def test_key_of_other_vehicle_rejected(self):
+        """
+        Test that a key already used by another vehicle is not taken for a
+        duplicate
+        """
+        # GIVEN an event recorded for another vehicle
+        other = Vehicle.objects.create(
+            name="VL Test",
+            type=Vehicle.VehicleType.VL,
+            model_name="Renault Clio",
+            fuel=Vehicle.FuelChoice.UNLEADED_95_10,
+            registration_number="5678EFGH",
+        )
+        self.client.post(
+            f"/api/v1/vehicles/{other.pk}/sync",
+            {"events": [self.trip_start("a", 10)]},
+            content_type="application/json",
+        )
+
+        # WHEN an event of this vehicle reuses its key
+        response = self.sync([self.trip_start("a", 100)])
+
+        # THEN it should be rejected
+        (result,) = response.json()["results"]
+        self.assertEqual(result["status"], "rejected")
+        self.assertIn("key", result["errors"])
+        self.assertEqual(self.vehicle.trip_set.count(), 1)
+
+    def test_timeline_validated(self):
+        """
+        Test that the events are validated against the odometer and the current trip
+        """
+        response = self.sync(
+            [
+                # Before the current mileage
+                self.trip_start("a", 50),
+                # No trip in progress
+                self.trip_end("b", 150),
+                self.trip_start("c", 100),
+                # A trip is already in progress
+                self.trip_start("d", 100),
+                # Before the start of the trip
+                self.trip_end("e", 90),
+                {"key": "f", "type": "unknown"},
+                self.trip_end("g", 120),
+            ]
+        )
+
+        results = response.json()["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            [
+                "rejected",
+                "rejected",
+                "accepted",
+                "rejected",
+                "rejected",
+                "rejected",
+                "accepted",
+            ],
+        )
+        self.assertIn("starting_mileage", results[0]["errors"])
+        self.assertIn("ending_mileage", results[4]["errors"])
+
+        # AND only the accepted events should be recorded
+        trip = self.vehicle.trip_set.latest("starting_time")
+        self.assertEqual((trip.starting_mileage, trip.ending_mileage), (100, 120))
+        self.assertEqual(IngestedEvent.objects.count(), 2)
+
+        # AND the rejected events can be sent again once corrected
+        response = self.sync([self.trip_start("a", 120, "2024-01-03T08:00Z")])
+        self.assertEqual(response.json()["results"][0]["status"], "accepted")
+
+    def test_current_trip_ended(self):
+        """
+        Test that a batch ends a trip started online
+        """
+        # GIVEN a trip in progress
+        Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=100,
+            starting_time="2024-01-02T08:00Z",
+            driver_name="John Doe",
+            purpose="DPS",
+        )
+
+        # WHEN it is aborted offline
+        response = self.sync([{"key": "a", "type": "trip_abort"}])
+
+        # THEN it should be finished, and the abortion notified
+        self.assertEqual(response.json()["results"][0]["status"], "accepted")
+        self.assertFalse(self.vehicle.trip_set.filter(finished=False).exists())
+        self.assertTrue(
+            Notification.objects.filter(
+                kind=Notification.NotificationKind.TRIP_ABORT
+            ).exists()
+        )
+
+    def test_invalid_requests(self):
+        """
+        Test the requests rejected as a whole
+        """
+        response = self.client.post(
+            f"/api/v1/vehicles/{self.vehicle.pk}/sync", {"events": "[]"}
+        )
+        self.assertEqual(response.status_code, 415)
+
+        response = self.sync({"key": "a"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            "/api/v1/vehicles/00000000-0000-0000-0000-000000000000/sync",
+            {"events": []},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,184 @@
+import datetime
+import io
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+
+from main.archive import archive_trips
+from main.models import ArchivedTrip, Trip, TripHistory, Vehicle
+
+
+class TripArchiveTestCase(TestCase):
+    def setUp(self):
+        self.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+        self.now = timezone.now()
+        self.before = self.now - datetime.timedelta(days=365)
+
+        # Four trips two years ago, then one last week
+        self.old_trips = [
+            self.create_trip(i * 10, self.now - datetime.timedelta(days=730 - i))
+            for i in range(4)
+        ]
+        self.recent_trip = self.create_trip(40, self.now - datetime.timedelta(days=7))
+
+    def create_trip(self, starting_mileage, starting_time, **kwargs):
+        return Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=starting_mileage,
+            ending_mileage=starting_mileage + 10,
+            starting_time=starting_time,
+            ending_time=starting_time + datetime.timedelta(hours=1),
+            driver_name="Driver",
+            purpose="DPS",
+            finished=True,
+            **kwargs,
+        )
+
+    def test_archive(self):
+        """
+        Test that the old trips are moved to the archive
+        """
+        odometer = (
+            self.vehicle.current_mileage,
+            self.vehicle.last_trip_distance,
+            self.vehicle.last_trip_ending_time,
+        )
+
+        # WHEN the trips older than a year are archived, keeping the last two
+        archived = archive_trips(self.before, keep=2, batch_size=2)
+
+        # THEN the oldest three should be in the archive, with their ids
+        self.assertEqual(archived, 3)
+        self.assertQuerySetEqual(
+            ArchivedTrip.objects.order_by("pk").values_list("pk", flat=True),
+            [trip.pk for trip in self.old_trips[:3]],
+        )
+        self.assertEqual(
+            ArchivedTrip.objects.get(pk=self.old_trips[0].pk).purpose, "DPS"
+        )
+
+        # AND the latest ones should stay in place
+        self.assertQuerySetEqual(
+            Trip.objects.order_by("pk"), [self.old_trips[3], self.recent_trip]
+        )
+
+        # AND the odometer rebuilt from the remaining trips should not change
+        self.vehicle.refresh_mileage()
+        self.assertEqual(
+            (
+                self.vehicle.current_mileage,
+                self.vehicle.last_trip_distance,
+                self.vehicle.last_trip_ending_time,
+            ),
+            odometer,
+        )
+        self.assertEqual(
+            Vehicle.objects.with_mileage().get(pk=self.vehicle.pk).mileage, 50
+        )
+
+    def test_highest_mileage_kept(self):
+        """
+        Test that the trip with the highest mileage of a vehicle is not archived
+        """
+        highest = self.old_trips[0]
+        highest.ending_mileage = 1000
+        highest.save()
+
+        archive_trips(self.before, keep=1)
+
+        self.assertTrue(Trip.objects.filter(pk=highest.pk).exists())
+        self.assertEqual(Trip.objects.count(), 2)
+
+    def test_unfinished_trips(self):
+        """
+        Test that a trip in progress is never archived
+        """
+        self.recent_trip.delete()
+        in_progress = Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=40,
+            starting_time=self.now - datetime.timedelta(days=500),
+            driver_name="Driver",
+            purpose="DPS",
+        )
+
+        archive_trips(self.before, keep=1)
+
+        self.assertTrue(Trip.objects.filter(pk=in_progress.pk).exists())
+
+    def test_history(self):
+        """
+        Test that the history shows the trips and the archived trips together
+        """
+        archive_trips(self.before, keep=1)
+
+        self.assertQuerySetEqual(
+            TripHistory.objects.order_by("pk").values_list("pk", "archived"),
+            [(trip.pk, True) for trip in self.old_trips[:4]]
+            + [(self.recent_trip.pk, False)],
+        )
+
+        # AND deleting the vehicle should delete its archived trips
+        self.vehicle.delete()
+        self.assertFalse(TripHistory.objects.exists())
+
+    def test_history_admin(self):
+        """
+        Test that the history is shown read-only in the administration
+        """
+        archive_trips(self.before, keep=1)
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+        response = self.client.get("/admin/main/triphistory/")
+        self.assertContains(response, "VPS Test", count=5)
+
+        response = self.client.get(
+            f"/admin/main/triphistory/{self.old_trips[0].pk}/change/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="_save"')
+
+    def test_command(self):
+        """
+        Test the archive_trips command
+        """
+        out = io.StringIO()
+        call_command("archive_trips", days=365, keep=2, stdout=out)
+
+        self.assertIn("3 trajet(s) archivé(s)", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("archive_trips", keep=0)
+
+    def test_daemon_survives_errors(self):
+        """
+        Test that the archive daemon keeps running after an error
+        """
+        out, stderr = io.StringIO(), io.StringIO()
+
+        # WHEN an archival fails, such as on a locked database
+        with mock.patch(
+            "main.archive.archive_trips",
+            side_effect=[OperationalError("database is locked"), 3],
+        ) as archive, mock.patch(
+            "main.management.commands.archive_trips.close_old_connections"
+        ), mock.patch(
+            "time.sleep", side_effect=[None, KeyboardInterrupt]
+        ):
+            call_command("archive_trips", daemon=True, stdout=out, stderr=stderr)
+
+        # THEN it should be logged and the trips archived at the next run
+        self.assertEqual(archive.call_count, 2)
+        self.assertIn("database is locked", stderr.getvalue())
+        self.assertIn("3 trajet(s) archivé(s)", out.getvalue())
@@ -0,0 +1,104 @@
+import threading
+
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TransactionTestCase
+from django.utils import timezone
+
+from main.models import Trip, Vehicle
+
+# Drivers scanning the same vehicle at the same time
+CONCURRENT_STARTS = 8
+
+
+def run_concurrently(target, count=CONCURRENT_STARTS):
+    """
+    Runs target in several threads, released at the same time, each with its
+    own database connection.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = []
+
+    def run(i):
+        try:
+            barrier.wait()
+            results[i] = target(i)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return results
+
+
+class TripConcurrencyTestCase(TransactionTestCase):
+    def setUp(self):
+        self.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+        )
+
+    def test_single_open_trip_constraint(self):
+        """
+        Test that the database refuses a second unfinished trip for a vehicle
+        """
+        Trip.objects.create(
+            vehicle=self.vehicle, starting_mileage=0, driver_name="A", purpose="DPS"
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Trip.objects.create(
+                vehicle=self.vehicle, starting_mileage=0, driver_name="B", purpose="DPS"
+            )
+
+        # AND finished trips are not limited
+        Trip.objects.update(finished=True)
+        Trip.objects.create(
+            vehicle=self.vehicle, starting_mileage=0, driver_name="B", purpose="DPS"
+        )
+
+    def test_concurrent_starts(self):
+        """
+        Test that a single trip is started when several drivers start one at once
+        """
+
+        # WHEN several drivers start a trip at the same time
+        def start_trip(i):
+            return Client().post(
+                f"/vehicles/{self.vehicle.id}/trip-start",
+                {
+                    "starting_mileage": 0,
+                    "starting_time": timezone.now().strftime("%Y-%m-%dT%H:%M"),
+                    "driver_name": f"Driver {i}",
+                    "purpose": "DPS",
+                },
+            )
+
+        responses = run_concurrently(start_trip)
+
+        # THEN every driver should be redirected to the vehicle page
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [302] * CONCURRENT_STARTS,
+        )
+
+        # AND a single trip should be in progress
+        self.assertEqual(self.vehicle.trip_set.filter(finished=False).count(), 1)
+
+        # AND the vehicle page should show it
+        response = Client().get(f"/vehicles/{self.vehicle.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["trip_started"])
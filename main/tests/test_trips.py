@@ -3,6 +3,7 @@ from django.test import TestCase
 from django.utils import timezone
 
 from main.models import Setting, Trip, Vehicle
+from main.utils import deliver_notifications
 
 
 class TripTestCase(TestCase):
@@ -91,9 +92,16 @@ class TripTestCase(TestCase):
             },
         )
 
-        # THEN the trip should not be started and the user should be redirected to the vehicle details page
-        self.assertEqual(response.status_code, 302)
-        self.assertEqual(response.url, f"/vehicles/{self.vehicle.id}")
+        # THEN the trip should not be started and the vehicle details page should show the error
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(
+            response.context["trip_start_form"].has_error("starting_mileage")
+        )
+        self.assertContains(
+            response,
+            "Le kilométrage de départ ne peut pas être inférieur",
+            status_code=422,
+        )
 
         vehicle = Vehicle.objects.get(pk=self.vehicle.id)
         self.assertEqual(vehicle.trip_set.count(), 1)
@@ -135,6 +143,7 @@ class TripTestCase(TestCase):
         )
 
         # AND a notification should be sent as the starting mileage is higher than the mileage of the vehicle
+        deliver_notifications()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(sorted(mail.outbox[0].to), sorted(self.email_recipients))
         self.assertIn(
@@ -227,9 +236,12 @@ class TripTestCase(TestCase):
             },
         )
 
-        # THEN the trip should not be ended and the user should be redirected to the vehicle details page
-        self.assertEqual(response.status_code, 302)
-        self.assertEqual(response.url, f"/vehicles/{self.vehicle.id}")
+        # THEN the trip should not be ended and the vehicle details page should show the error
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(response.context["trip_end_form"].has_error("ending_time"))
+        self.assertContains(
+            response, "L&#x27;arrivée doit avoir lieu après le départ", status_code=422
+        )
 
         vehicle = Vehicle.objects.get(pk=self.vehicle.id)
         self.assertEqual(vehicle.trip_set.count(), 2)
@@ -259,9 +271,9 @@ class TripTestCase(TestCase):
             },
         )
 
-        # THEN the trip should not be ended and the data should not be saved. The user should be redirected to the vehicle details page.
-        self.assertEqual(response.status_code, 302)
-        self.assertEqual(response.url, f"/vehicles/{self.vehicle.id}")
+        # THEN the trip should not be ended and the data should not be saved. The vehicle details page should show the error.
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(response.context["trip_end_form"].has_error("ending_mileage"))
 
         vehicle = Vehicle.objects.get(pk=self.vehicle.id)
         self.assertEqual(vehicle.trip_set.count(), 2)
@@ -293,6 +305,7 @@ class TripTestCase(TestCase):
         self.assertEqual(vehicle.trip_set.last().ending_time, None)
 
         # AND a notification should be sent as the trip was aborted
+        deliver_notifications()
         self.assertEqual(len(mail.outbox), 2)
         self.assertEqual(sorted(mail.outbox[0].to), sorted(self.email_recipients))
         self.assertIn(
@@ -0,0 +1,240 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+
+from main.models import Defect, Location, Trip, Vehicle
+
+# Vehicle with its location, current trip and open defects
+VEHICLE_DETAIL_QUERY_BUDGET = 3
+# The open defects are read from the cached fragments
+VEHICLE_DETAIL_CACHED_QUERY_BUDGET = 2
+
+
+class VehicleDetailTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(
+            name="Garage", address="1 rue du Test", zip_code="38000", city="Grenoble"
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+            parking_location=cls.location,
+        )
+        Trip.objects.create(
+            vehicle=cls.vehicle,
+            starting_mileage=5,
+            ending_mileage=10,
+            starting_time=timezone.now(),
+            ending_time=timezone.now(),
+            driver_name="John Doe",
+            purpose="DPS",
+            finished=True,
+        )
+
+    def setUp(self):
+        # The cached pages would outlive the rolled back data of other tests
+        cache.clear()
+
+    def get_details(self, query_budget=VEHICLE_DETAIL_QUERY_BUDGET, **headers):
+        with self.assertNumQueries(query_budget):
+            response = self.client.get(f"/vehicles/{self.vehicle.id}", **headers)
+        return response
+
+
+class VehicleDetailQueryBudgetTestCase(VehicleDetailTestCase):
+    def test_query_budget_without_trip(self):
+        """
+        Test the number of queries of the page when no trip is in progress
+        """
+        response = self.get_details()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["trip_started"])
+        self.assertContains(response, "Grenoble")
+
+    def test_query_budget_with_trip_and_defects(self):
+        """
+        Test that the number of queries does not depend on the trip and defects
+        """
+        # GIVEN a trip in progress and several open defects
+        Trip.objects.create(
+            vehicle=self.vehicle,
+            starting_mileage=10,
+            driver_name="John Doe",
+            purpose="DPS",
+        )
+        for i in range(5):
+            Defect.objects.create(
+                vehicle=self.vehicle,
+                comment=f"Defect {i}",
+                reporter_name="Jane Doe",
+                severity=Defect.DefectSeverity.MAJOR,
+            )
+        Defect.objects.create(
+            vehicle=self.vehicle,
+            comment="Solved defect",
+            reporter_name="Jane Doe",
+            status=Defect.DefectStatus.SOLVED,
+        )
+
+        # WHEN the page is displayed
+        response = self.get_details()
+
+        # THEN the trip and the open defects should be displayed
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["trip_started"])
+        self.assertContains(response, "Defect 4", count=2)
+        self.assertNotContains(response, "Solved defect")
+        self.assertEqual(
+            response.context["trip_end_form"].initial["starting_mileage"], 10
+        )
+
+    def test_query_budget_with_cached_fragments(self):
+        """
+        Test the number of queries of the page once its fragments are cached
+        """
+        # GIVEN a page already displayed
+        self.get_details()
+
+        # WHEN it is displayed again, without conditional request
+        response = self.get_details(VEHICLE_DETAIL_CACHED_QUERY_BUDGET)
+
+        # THEN it should be rendered from the cached fragments
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Grenoble")
+
+
+class VehicleDetailConditionalGetTestCase(VehicleDetailTestCase):
+    def test_not_modified(self):
+        """
+        Test that an unchanged page is answered with a 304 without any query
+        """
+        # GIVEN a page displayed twice, the first visit setting the CSRF cookie
+        self.get_details()
+        response = self.get_details(VEHICLE_DETAIL_CACHED_QUERY_BUDGET)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        # WHEN it is requested again with its ETag
+        response = self.get_details(0, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        # THEN it should not be sent again
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_after_a_minute(self):
+        """
+        Test that the page is sent again once the time filling its forms changed
+        """
+        # GIVEN a page displayed twice, the first visit setting the CSRF cookie
+        self.get_details()
+        response = self.get_details(VEHICLE_DETAIL_CACHED_QUERY_BUDGET)
+
+        # WHEN it is requested again with its validators a minute later
+        later = timezone.now() + datetime.timedelta(seconds=61)
+        with mock.patch("main.caching.timezone.now", return_value=later):
+            response = self.get_details(
+                VEHICLE_DETAIL_CACHED_QUERY_BUDGET,
+                HTTP_IF_NONE_MATCH=response["ETag"],
+                HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+            )
+
+            # THEN it should be sent again, with the current time
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                parse_http_date(response["Last-Modified"]),
+                int(later.replace(second=0).timestamp()),
+            )
+
+            # AND a request with only the previous date should not get a 304
+            response = self.get_details(
+                VEHICLE_DETAIL_CACHED_QUERY_BUDGET,
+                HTTP_IF_MODIFIED_SINCE=http_date(later.timestamp() - 61),
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_defect(self):
+        """
+        Test that a change shown on the page invalidates the cached page
+        """
+        # GIVEN a page already displayed
+        response = self.get_details()
+
+        # WHEN a defect is reported
+        with self.captureOnCommitCallbacks(execute=True):
+            Defect.objects.create(
+                vehicle=self.vehicle,
+                comment="Flat tyre",
+                reporter_name="Jane Doe",
+                severity=Defect.DefectSeverity.MAJOR,
+            )
+
+        # THEN the page should be sent again, with the new defect
+        response = self.get_details(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Flat tyre")
+
+    def test_modified_after_location_change(self):
+        """
+        Test that a change of the parking location invalidates the cached page
+        """
+        # GIVEN a page already displayed
+        response = self.get_details()
+
+        # WHEN the parking location is modified
+        self.location.city = "Échirolles"
+        self.location.save()
+
+        # THEN the page should be sent again, with the new address
+        response = self.get_details(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Échirolles")
+
+    def test_message_not_cached(self):
+        """
+        Test that a page showing a message is never answered with a 304
+        """
+        # GIVEN a page already displayed
+        etag = self.get_details()["ETag"]
+
+        # WHEN a defect is reported, which shows a message on the page
+        self.client.post(
+            f"/vehicles/{self.vehicle.id}/defect",
+            {"comment": "Flat tyre", "reporter_name": "Jane Doe"},
+        )
+        response = self.client.get(
+            f"/vehicles/{self.vehicle.id}", HTTP_IF_NONE_MATCH=etag
+        )
+
+        # THEN the page should be sent with the message, without ETag
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "anomalie a été signalée")
+        self.assertFalse(response.has_header("ETag"))
+
+
+class VehicleDetailInvalidFormTestCase(VehicleDetailTestCase):
+    def test_invalid_form_rendered_inline(self):
+        """
+        Test that an invalid form is shown with its errors in response to the POST
+        """
+        # WHEN an incomplete defect is submitted
+        response = self.client.post(
+            f"/vehicles/{self.vehicle.id}/defect", {"comment": "Flat tyre"}
+        )
+
+        # THEN the page should be rendered directly with the submitted form
+        self.assertEqual(response.status_code, 422)
+        self.assertTrue(response.context["defect_form"].has_error("reporter_name"))
+        self.assertContains(response, "Flat tyre", status_code=422)
+        self.assertFalse(self.vehicle.defect_set.exists())
+
+        # AND the next display of the page should not show it anymore
+        response = self.get_details(VEHICLE_DETAIL_CACHED_QUERY_BUDGET)
+        self.assertFalse(response.context["defect_form"].is_bound)
@@ -0,0 +1,100 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Location, Vehicle
+
+
+class VehicleListTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", password="user")
+        cls.garage = Location.objects.create(
+            name="Garage", address="1 rue du Test", zip_code="38000", city="Grenoble"
+        )
+        cls.parking = Location.objects.create(
+            name="Parking", address="2 rue du Test", zip_code="38000", city="Grenoble"
+        )
+        for i in range(60):
+            Vehicle.objects.create(
+                name=f"VL {i:02}",
+                type=Vehicle.VehicleType.VL,
+                model_name="Peugeot 308",
+                fuel=Vehicle.FuelChoice.DIESEL,
+                registration_number=f"AB-{i:03}-CD",
+                status=Vehicle.VehicleStatus.OPERATIONAL,
+                parking_location=cls.garage,
+            )
+        cls.vpsp = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.UNLEADED_98,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.IN_REPAIR,
+            parking_location=cls.parking,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_login_required(self):
+        """
+        Test that the dashboard is only shown to logged in users
+        """
+        self.client.logout()
+        response = self.client.get("/vehicles")
+        self.assertEqual(response.status_code, 302)
+
+    def test_pagination(self):
+        """
+        Test that the vehicles are paginated
+        """
+        response = self.client.get("/vehicles")
+        self.assertEqual(len(response.context["object_list"]), 50)
+        self.assertTrue(response.context["is_paginated"])
+
+        response = self.client.get("/vehicles", {"page": 2})
+        self.assertEqual(len(response.context["object_list"]), 11)
+
+    def test_filters(self):
+        """
+        Test the filters of the dashboard
+        """
+        for filters in [
+            {"status": Vehicle.VehicleStatus.IN_REPAIR},
+            {"type": Vehicle.VehicleType.VPSP},
+            {"fuel": Vehicle.FuelChoice.UNLEADED_98},
+            {"location": self.parking.pk},
+            {"q": "vps"},
+            {"q": "1234ab"},
+        ]:
+            with self.subTest(filters=filters):
+                response = self.client.get("/vehicles", filters)
+                self.assertEqual(list(response.context["object_list"]), [self.vpsp])
+
+    def test_summary(self):
+        """
+        Test the counts by status of the whole fleet
+        """
+        response = self.client.get("/vehicles", {"q": "vps"})
+        self.assertEqual(response.context["total_count"], 61)
+        self.assertIn(("Opérationnel", 60), response.context["status_counts"])
+        self.assertIn(("En réparation", 1), response.context["status_counts"])
+
+    def test_query_count_is_constant(self):
+        """
+        Test that the number of queries does not depend on the number of vehicles
+        """
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.client.get("/vehicles")
+            return len(context.captured_queries)
+
+        initial_count = count_queries()
+        Vehicle.objects.filter(name__startswith="VL 1").update(
+            parking_location=self.parking
+        )
+        self.assertEqual(count_queries(), initial_count)
@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Defect, Location, Trip, Vehicle
+
+
+class VehicleQuerySetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(
+            name="Garage", address="1 rue du Test", zip_code="38000", city="Grenoble"
+        )
+        cls.vehicle = Vehicle.objects.create(
+            name="VPS Test",
+            type=Vehicle.VehicleType.VPSP,
+            model_name="Renault Master",
+            fuel=Vehicle.FuelChoice.DIESEL,
+            registration_number="1234ABCD",
+            status=Vehicle.VehicleStatus.OPERATIONAL,
+            parking_location=cls.location,
+        )
+        Trip.objects.create(
+            vehicle=cls.vehicle,
+            starting_mileage=5,
+            ending_mileage=10,
+            driver_name="John Doe",
+            purpose="DPS",
+            finished=True,
+        )
+        Trip.objects.create(
+            vehicle=cls.vehicle,
+            starting_mileage=10,
+            driver_name="John Doe",
+            purpose="DPS",
+        )
+        for status in Defect.DefectStatus:
+            Defect.objects.create(
+                vehicle=cls.vehicle, status=status, reporter_name="Jane Doe"
+            )
+
+    def test_annotations(self):
+        """
+        Test that the queryset annotations match the per-vehicle values
+        """
+        # WHEN the vehicles are fetched with all the annotations
+        vehicle = (
+            Vehicle.objects.with_mileage()
+            .with_open_defect_count()
+            .with_current_trip()
+            .get(pk=self.vehicle.pk)
+        )
+
+        # THEN the annotations should be used without additional queries
+        current_trip = self.vehicle.trip_set.get(finished=False)
+        with self.assertNumQueries(0):
+            self.assertEqual(vehicle.mileage, 10)
+            self.assertEqual(vehicle.open_defect_count, 2)
+            self.assertTrue(vehicle.trip_started)
+            self.assertEqual(vehicle.current_trip_id, current_trip.pk)
+
+    def test_admin_changelist_query_count_is_constant(self):
+        """
+        Test that the admin changelists do not run queries per row
+        """
+        # GIVEN a logged in superuser
+        user = User.objects.create_superuser("admin", password="admin")
+        self.client.force_login(user)
+
+        def count_queries(url):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries)
+
+        initial_counts = [
+            count_queries("/admin/main/vehicle/"),
+            count_queries("/admin/main/location/"),
+        ]
+
+        # WHEN more vehicles are added
+        for i in range(5):
+            vehicle = Vehicle.objects.create(
+                name=f"VL {i}",
+                type=Vehicle.VehicleType.VL,
+                model_name="Peugeot 308",
+                fuel=Vehicle.FuelChoice.DIESEL,
+                registration_number=f"VL{i}",
+                parking_location=Location.objects.create(
+                    name=f"Parking {i}", address="", zip_code="", city=""
+                ),
+            )
+            Defect.objects.create(vehicle=vehicle, reporter_name="Jane Doe")
+
+        # THEN the number of queries should not change
+        self.assertEqual(
+            initial_counts,
+            [
+                count_queries("/admin/main/vehicle/"),
+                count_queries("/admin/main/location/"),
+            ],
+        )
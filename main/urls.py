@@ -1,37 +1,81 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic.base import RedirectView
 
-from main.views import (
-    DefectCreateView,
-    FuelExpenseCreateView,
-    TripAbortFormView,
-    TripEndFormView,
-    TripStartFormView,
-    VehicleDetailView,
-    VehicleListView,
-)
+from main import async_views, views
+from main.api import RESOURCES, ResourceDetailView, ResourceListView, VehicleSyncView
+from main.views import VehicleListView
+
+
+def public_view_patterns(asynchronous: bool = False):
+    """
+    Patterns of the public vehicle pages, served by async views when running
+    on ASGI workers.
+    """
+    if asynchronous:
+        detail_view = async_views.AsyncVehicleDetailView
+        defect_view = async_views.AsyncDefectCreateView
+        fuel_expense_view = async_views.AsyncFuelExpenseCreateView
+        trip_start_view = async_views.AsyncTripStartFormView
+        trip_end_view = async_views.AsyncTripEndFormView
+        trip_abort_view = async_views.AsyncTripAbortFormView
+    else:
+        detail_view = views.VehicleDetailView
+        defect_view = views.DefectCreateView
+        fuel_expense_view = views.FuelExpenseCreateView
+        trip_start_view = views.TripStartFormView
+        trip_end_view = views.TripEndFormView
+        trip_abort_view = views.TripAbortFormView
+
+    return [
+        path(
+            "vehicles/<uuid:pk>",
+            view=detail_view.as_view(),
+            name="vehicle_details",
+        ),
+        path("vehicles/<uuid:pk>/defect", defect_view.as_view(), name="defect"),
+        path(
+            "vehicles/<uuid:pk>/fuel-expense",
+            fuel_expense_view.as_view(),
+            name="fuel_expense",
+        ),
+        path(
+            "vehicles/<uuid:pk>/trip-start",
+            trip_start_view.as_view(),
+            name="trip_start",
+        ),
+        path("vehicles/<uuid:pk>/trip-end", trip_end_view.as_view(), name="trip_end"),
+        path(
+            "vehicles/<uuid:pk>/trip-abortion",
+            trip_abort_view.as_view(),
+            name="trip_abort",
+        ),
+    ]
+
 
 urlpatterns = [
-    path(
-        "vehicles/<uuid:pk>",
-        view=VehicleDetailView.as_view(),
-        name="vehicle_details",
-    ),
+    *public_view_patterns(settings.CARBON_ASYNC_VIEWS),
     path("vehicles", VehicleListView.as_view(), name="vehicles_list"),
-    path("vehicles/<uuid:pk>/defect", DefectCreateView.as_view(), name="defect"),
-    path(
-        "vehicles/<uuid:pk>/fuel-expense",
-        FuelExpenseCreateView.as_view(),
-        name="fuel_expense",
-    ),
-    path(
-        "vehicles/<uuid:pk>/trip-start", TripStartFormView.as_view(), name="trip_start"
-    ),
-    path("vehicles/<uuid:pk>/trip-end", TripEndFormView.as_view(), name="trip_end"),
+    *[
+        pattern
+        for name, resource in RESOURCES.items()
+        for pattern in [
+            path(
+                f"api/v1/{name}",
+                ResourceListView.as_view(resource=resource),
+                name=f"api_{name}_list",
+            ),
+            path(
+                f"api/v1/{name}/<str:pk>",
+                ResourceDetailView.as_view(resource=resource),
+                name=f"api_{name}_detail",
+            ),
+        ]
+    ],
     path(
-        "vehicles/<uuid:pk>/trip-abortion",
-        TripAbortFormView.as_view(),
-        name="trip_abort",
+        "api/v1/vehicles/<uuid:pk>/sync",
+        VehicleSyncView.as_view(),
+        name="api_vehicle_sync",
     ),
     path("", RedirectView.as_view(pattern_name="vehicles_list", permanent=True)),
 ]
@@ -0,0 +1,227 @@
+"""
+Monthly use of the vehicles: distance, trips, time in use and fuel spend.
+
+The trips and the fuel expenses are summed once per vehicle and month into the
+MonthlyUsage table, read by the dashboard instead of the whole history. The
+months are those of the local time of the fleet (settings.TIME_ZONE): a trip
+counts in the month it started in. Saving or deleting a trip or a fuel expense
+recomputes the months it was and is counted in, from the history of these
+months only. The archived trips still count, through the TripHistory view.
+"""
+
+from __future__ import annotations
+
+import datetime
+import decimal
+import zoneinfo
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, DurationField, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import FuelExpense, MonthlyUsage, TripHistory
+
+USAGE_FIELDS = ["trip_count", "distance", "duration", "fuel_amount", "fuel_quantity"]
+
+CENT = decimal.Decimal("0.01")
+
+# A trip or a fuel expense of a vehicle, by the date or time it counts at
+Cell = tuple[object, datetime.date]
+
+
+def get_timezone() -> datetime.tzinfo:
+    return zoneinfo.ZoneInfo(settings.TIME_ZONE)
+
+
+def month_of(value: datetime.date) -> datetime.date:
+    """
+    Returns the first day of the local month of a date or a time, even not
+    parsed yet or naive like the database would take it.
+    """
+    if isinstance(value, str):
+        value = models.DateTimeField().to_python(value)
+    if isinstance(value, datetime.datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value, get_timezone())
+        value = timezone.localtime(value, get_timezone()).date()
+
+    return value.replace(day=1)
+
+
+def next_month(month: datetime.date) -> datetime.date:
+    return (month + datetime.timedelta(days=31)).replace(day=1)
+
+
+def get_start(month: datetime.date) -> datetime.datetime:
+    return datetime.datetime(month.year, month.month, 1, tzinfo=get_timezone())
+
+
+def to_hours(duration: datetime.timedelta) -> decimal.Decimal:
+    return decimal.Decimal(duration.total_seconds() / 3600).quantize(
+        decimal.Decimal("0.1")
+    )
+
+
+def summarize(
+    trips: Iterable[models.QuerySet],
+    expenses: models.QuerySet,
+    usage_model=MonthlyUsage,
+) -> dict[Cell, MonthlyUsage]:
+    """
+    Returns the usages of the vehicles and months of the given trips, from one
+    or several tables, and fuel expenses.
+    """
+    usages: dict[Cell, MonthlyUsage] = {}
+
+    def get_usage(vehicle_id, month: datetime.date) -> MonthlyUsage:
+        key = (vehicle_id, month_of(month))
+        if key not in usages:
+            usages[key] = usage_model(vehicle_id=vehicle_id, month=key[1])
+        return usages[key]
+
+    for trip_queryset in trips:
+        # Aborted trips do not count
+        rows = (
+            trip_queryset.filter(finished=True, ending_time__isnull=False)
+            .annotate(month=TruncMonth("starting_time", tzinfo=get_timezone()))
+            .values("vehicle_id", "month")
+            .annotate(
+                total_trips=Count("pk"),
+                total_distance=Sum(F("ending_mileage") - F("starting_mileage")),
+                total_duration=Sum(
+                    F("ending_time") - F("starting_time"),
+                    output_field=DurationField(),
+                ),
+            )
+            .order_by()
+        )
+        for row in rows:
+            usage = get_usage(row["vehicle_id"], row["month"])
+            usage.trip_count += row["total_trips"]
+            usage.distance += row["total_distance"] or 0
+            usage.duration += row["total_duration"] or datetime.timedelta()
+
+    rows = (
+        expenses.annotate(month=TruncMonth("date"))
+        .values("vehicle_id", "month")
+        .annotate(total_amount=Sum("amount"), total_quantity=Sum("quantity"))
+        .order_by()
+    )
+    for row in rows:
+        usage = get_usage(row["vehicle_id"], row["month"])
+        # Summed without their decimal places by SQLite
+        usage.fuel_amount = row["total_amount"].quantize(CENT)
+        usage.fuel_quantity = row["total_quantity"].quantize(CENT)
+
+    return usages
+
+
+def refresh(cells: Iterable[Cell]):
+    """
+    Recomputes the usages of the vehicles over the months of the given dates
+    or times.
+    """
+    months: dict[object, set[datetime.date]] = {}
+    for vehicle_id, value in cells:
+        months.setdefault(vehicle_id, set()).add(month_of(value))
+    if not months:
+        return
+
+    trip_filter, expense_filter, cell_filter = Q(pk__in=[]), Q(pk__in=[]), Q()
+    for vehicle_id, vehicle_months in months.items():
+        for month in vehicle_months:
+            trip_filter |= Q(
+                vehicle_id=vehicle_id,
+                starting_time__gte=get_start(month),
+                starting_time__lt=get_start(next_month(month)),
+            )
+            expense_filter |= Q(
+                vehicle_id=vehicle_id, date__gte=month, date__lt=next_month(month)
+            )
+        cell_filter |= Q(vehicle_id=vehicle_id, month__in=vehicle_months)
+
+    usages = summarize(
+        [TripHistory.objects.filter(trip_filter)],
+        FuelExpense.objects.filter(expense_filter),
+    )
+
+    with transaction.atomic():
+        # Months left without any trip or fuel expense
+        stale = [
+            usage.pk
+            for usage in MonthlyUsage.objects.filter(cell_filter)
+            if (usage.vehicle_id, usage.month) not in usages
+        ]
+        MonthlyUsage.objects.filter(pk__in=stale).delete()
+        MonthlyUsage.objects.bulk_create(
+            usages.values(),
+            update_conflicts=True,
+            unique_fields=["vehicle", "month"],
+            update_fields=USAGE_FIELDS,
+        )
+
+
+def rebuild(
+    trip_models=(TripHistory,), expense_model=FuelExpense, usage_model=MonthlyUsage
+) -> int:
+    """
+    Recomputes the usages of every vehicle and month. The models are given by
+    the migration which fills the table, without the TripHistory view. Returns
+    the number of usages.
+    """
+    usages = summarize(
+        [trip_model.objects.all() for trip_model in trip_models],
+        expense_model.objects.all(),
+        usage_model,
+    )
+
+    with transaction.atomic():
+        usage_model.objects.all().delete()
+        usage_model.objects.bulk_create(usages.values(), batch_size=500)
+
+    return len(usages)
+
+
+@dataclass
+class VehicleUsage:
+    vehicle: str
+    months: list[MonthlyUsage] = field(default_factory=list)
+    trip_count: int = 0
+    distance: int = 0
+    duration: datetime.timedelta = datetime.timedelta()
+    fuel_amount: decimal.Decimal = decimal.Decimal("0.00")
+
+    @property
+    def hours(self) -> decimal.Decimal:
+        return to_hours(self.duration)
+
+    def add(self, usage: MonthlyUsage):
+        self.months.append(usage)
+        self.trip_count += usage.trip_count
+        self.distance += usage.distance
+        self.duration += usage.duration
+        self.fuel_amount += usage.fuel_amount
+
+
+def get_dashboard(year: int) -> list[VehicleUsage]:
+    """
+    Returns the usage of each vehicle used during the given year, month by
+    month, from the usages only.
+    """
+    usages = (
+        MonthlyUsage.objects.filter(month__year=year)
+        .select_related("vehicle")
+        .order_by("vehicle__name", "vehicle", "month")
+    )
+
+    vehicles: dict[object, VehicleUsage] = {}
+    for usage in usages:
+        if usage.vehicle_id not in vehicles:
+            vehicles[usage.vehicle_id] = VehicleUsage(usage.vehicle.name)
+        vehicles[usage.vehicle_id].add(usage)
+
+    return list(vehicles.values())
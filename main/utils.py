@@ -1,10 +1,16 @@
+import datetime
 from typing import Any, Optional
 
-from django.core import mail
-from django.core.mail import get_connection
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
 from django.template import loader
+from django.utils import timezone
+from django.utils.translation import gettext as _
 
-from main.models import Setting
+from main.models import Notification, Setting
+
+# Time during which a batch claimed by a worker is not handed to another one
+DELIVERY_LEASE = datetime.timedelta(minutes=5)
 
 
 def get_email_backend():
@@ -19,7 +25,7 @@ def get_email_backend():
     return get_connection(
         backend=backend,
         host=Setting.manager.read("email_host", "localhost"),
-        port=int(Setting.manager.read("email_port", "25")),
+        port=Setting.manager.read_int("email_port", 25),
         username=Setting.manager.read("email_username", ""),
         password=Setting.manager.read("email_password", ""),
         use_tls=Setting.manager.read_boolean("email_use_tls", False),
@@ -35,20 +41,174 @@ def send_notification(
     text_template: str,
     context: Optional[dict[str, Any]] = None,
     html_template: Optional[str] = None,
+    kind: str = "",
 ):
-    email_backend = get_email_backend()
+    """
+    Renders a notification and queues it in the outbox. It is sent by the
+    process_outbox command, outside of the request.
+
+    When the `notification_digest_minutes` setting is set, notifications of a
+    given kind are held for that many minutes and sent as a single digest per
+    recipient list.
+    """
+    if not recipient_list:
+        return None
 
     plaintext_content = loader.render_to_string(text_template, context)
 
-    html_content = None
+    html_content = ""
     if html_template:
         html_content = loader.render_to_string(html_template, context)
 
-    mail.send_mail(
+    notification = Notification(
+        kind=kind,
         subject=subject,
-        message=plaintext_content,
         from_email=from_email,
-        recipient_list=recipient_list,
-        html_message=html_content,
-        connection=email_backend,
+        recipients=",".join(recipient_list),
+        text_body=plaintext_content,
+        html_body=html_content,
     )
+
+    digest_minutes = Setting.manager.read_int("notification_digest_minutes", 0)
+    if kind and digest_minutes > 0:
+        notification.digest = True
+        # The window starts with the first notification waiting for the recipients
+        pending_digest = (
+            Notification.objects.filter(
+                status=Notification.NotificationStatus.PENDING,
+                digest=True,
+                recipients=notification.recipients,
+                from_email=from_email,
+            )
+            .order_by("next_attempt_at")
+            .first()
+        )
+        if pending_digest:
+            notification.next_attempt_at = pending_digest.next_attempt_at
+        else:
+            notification.next_attempt_at = timezone.now() + datetime.timedelta(
+                minutes=digest_minutes
+            )
+
+    notification.save()
+    return notification
+
+
+def coalesce_digests() -> int:
+    """
+    Merges the notifications whose digest window is over into one notification
+    per recipient list. Returns the number of digests created.
+    """
+    groups: dict[tuple[str, str], list[Notification]] = {}
+    created = 0
+
+    with transaction.atomic():
+        due = (
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=Notification.NotificationStatus.PENDING,
+                digest=True,
+                next_attempt_at__lte=timezone.now(),
+            )
+            .order_by("created_at")
+        )
+        for notification in due:
+            key = (notification.recipients, notification.from_email)
+            groups.setdefault(key, []).append(notification)
+
+        for (recipients, from_email), notifications in groups.items():
+            if len(notifications) == 1:
+                # Nothing to merge, it is sent as is
+                notifications[0].digest = False
+                notifications[0].save(update_fields=["digest"])
+                continue
+
+            context = {"notifications": notifications}
+            digest = Notification.objects.create(
+                kind=Notification.NotificationKind.DIGEST,
+                subject=_("{count} notifications pour les véhicules").format(
+                    count=len(notifications)
+                ),
+                from_email=from_email,
+                recipients=recipients,
+                text_body=loader.render_to_string("main/email/digest.txt", context),
+                html_body=loader.render_to_string("main/email/digest.html", context),
+            )
+            Notification.objects.filter(
+                pk__in=[notification.pk for notification in notifications]
+            ).update(
+                status=Notification.NotificationStatus.MERGED,
+                digest=False,
+                merged_into=digest,
+            )
+            created += 1
+
+    return created
+
+
+def claim_notifications(batch_size: int) -> list[Notification]:
+    """
+    Returns the notifications due for delivery, pushing back their next attempt
+    so that concurrent workers do not send them twice.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        notifications = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=Notification.NotificationStatus.PENDING,
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        Notification.objects.filter(
+            pk__in=[notification.pk for notification in notifications]
+        ).update(next_attempt_at=now + DELIVERY_LEASE)
+
+    return notifications
+
+
+def deliver_notifications(batch_size: int = 100) -> int:
+    """
+    Sends the due notifications of the outbox over a single connection.
+    Returns the number of notifications sent.
+    """
+    coalesce_digests()
+
+    notifications = claim_notifications(batch_size)
+    if not notifications:
+        return 0
+
+    connection = get_email_backend()
+    try:
+        connection.open()
+    except Exception as error:
+        for notification in notifications:
+            notification.mark_failed(error)
+        return 0
+
+    sent = 0
+    try:
+        for notification in notifications:
+            message = EmailMultiAlternatives(
+                subject=notification.subject,
+                body=notification.text_body,
+                from_email=notification.from_email or None,
+                to=notification.recipient_list,
+                connection=connection,
+            )
+            if notification.html_body:
+                message.attach_alternative(notification.html_body, "text/html")
+
+            try:
+                message.send()
+            except Exception as error:
+                notification.mark_failed(error)
+            else:
+                notification.mark_sent()
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent
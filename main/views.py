@@ -1,54 +1,182 @@
 import datetime
 import typing
 
+import django.conf
 import django.http
 import django.shortcuts
 import django.urls
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError
+from django.db.models import Count, Prefetch, Q
 from django.forms import BooleanField, HiddenInput, ModelForm
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
 from django.utils.translation import gettext as _
 from django.views.generic import CreateView, DetailView, ListView, UpdateView
 
-from . import forms, models
+from . import caching, forms, models
+from .db import retry_on_database_lock
 
 
 class VehicleListView(LoginRequiredMixin, ListView):
     model = models.Vehicle
     template_name = "main/vehicle_list.html"
+    paginate_by = 50
 
     login_url = django.urls.reverse_lazy("admin:login")
 
+    def get_queryset(self):
+        self.filter_form = forms.VehicleFilterForm(self.request.GET)
+        return self.filter_form.filter(
+            models.Vehicle.objects.select_related("parking_location").order_by(
+                "name", "pk"
+            )
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["filter_form"] = self.filter_form
+
+        # Counts by status of the whole fleet, in a single query
+        counts = models.Vehicle.objects.aggregate(
+            total=Count("pk"),
+            **{
+                status.value: Count("pk", filter=Q(status=status))
+                for status in models.Vehicle.VehicleStatus
+            },
+        )
+        context["total_count"] = counts["total"]
+        context["status_counts"] = [
+            (status.label, counts[status.value])
+            for status in models.Vehicle.VehicleStatus
+        ]
+
+        return context
+
 
 class VehicleDetailView(DetailView):
     model = models.Vehicle
     context_object_name = "vehicle"
     template_name = "main/vehicle_detail.html"
 
+    delegated_forms: dict[str, type[ModelForm]] = {
+        "defect_form": forms.DefectForm,
+        "fuel_expense_form": forms.FuelExpenseForm,
+        "trip_start_form": forms.TripStartForm,
+        "trip_end_form": forms.TripEndForm,
+    }
+
+    @classmethod
+    def render_invalid_form(
+        cls,
+        request: django.http.HttpRequest,
+        pk,
+        variable_name: str,
+        form: ModelForm,
+    ):
+        """
+        Renders the page of the vehicle with a submitted form and its errors,
+        in response to the POST request itself.
+        """
+        view = cls()
+        view.setup(request, pk=pk)
+        view.vehicle_version = caching.get_vehicle_version(pk)
+        view.bound_forms = {variable_name: form}
+        view.object = view.get_object()
+        context = view.get_context_data(object=view.object)
+        return view.render_to_response(context, status=422)
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.bound_forms: dict[str, ModelForm] = {}
+        self.validators: tuple[str, datetime.datetime] | None = None
+
+    def get(self, request: django.http.HttpRequest, *args, **kwargs):
+        self.vehicle_version = caching.get_vehicle_version(kwargs["pk"])
+
+        # Pages showing a message are specific to the session
+        conditional = len(messages.get_messages(request)) == 0
+
+        if conditional:
+            not_modified = self.get_not_modified_response(request)
+            if not_modified is not None:
+                return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        return self.patch_response(response, conditional)
+
+    def get_validators(self, request: django.http.HttpRequest):
+        # Computed once, so that the page is sent with the time it was checked at
+        if self.validators is None:
+            # The forms are filled with the current time: the page changes every
+            # minute, even when the vehicle does not
+            page_time = caching.get_page_time()
+            etag = caching.get_page_etag(
+                self.vehicle_version,
+                request.COOKIES.get(django.conf.settings.CSRF_COOKIE_NAME, ""),
+                page_time,
+            )
+            last_modified = max(
+                caching.get_version_datetime(self.vehicle_version), page_time
+            )
+            self.validators = etag, last_modified
+
+        return self.validators
+
+    def get_not_modified_response(self, request: django.http.HttpRequest):
+        etag, last_modified = self.get_validators(request)
+        return get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+
+    def patch_response(self, response, conditional: bool):
+        if conditional:
+            etag, last_modified = self.get_validators(self.request)
+            response.headers["ETag"] = etag
+            response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ["Cookie"])
+
+        return response
+
+    def get_queryset(self):
+        # Everything the page needs, in a fixed number of queries. The open
+        # defects are only queried when their cached fragments are missing.
+        return models.Vehicle.objects.select_related(
+            "parking_location"
+        ).prefetch_related(
+            Prefetch(
+                "trip_set",
+                queryset=models.Trip.objects.filter(finished=False),
+                to_attr="current_trips",
+            ),
+        )
+
+    def get_open_defects(self):
+        # Lazy, only evaluated when the cached fragment is missing
+        return self.object.open_defects
+
     def get_context_data(self, **kwargs):
         self.object: models.Vehicle
         context = super().get_context_data(**kwargs)
 
-        context["open_defects"] = context["vehicle"].open_defects.all()
+        context["open_defects"] = self.get_open_defects()
+        context["vehicle_version"] = self.vehicle_version
+        context["page_cache_timeout"] = caching.PAGE_CACHE_TIMEOUT
 
-        delegated_forms: dict[str, type[ModelForm]] = {
-            "defect_form": forms.DefectForm,
-            "fuel_expense_form": forms.FuelExpenseForm,
-            "trip_start_form": forms.TripStartForm,
-            "trip_end_form": forms.TripEndForm,
-        }
-
-        for variable_name, form in delegated_forms.items():
-            if variable_name in self.request.session:
-                context[variable_name] = form(
-                    self.request.session[variable_name], vehicle=self.object
-                )
-                del self.request.session[variable_name]
+        for variable_name, form in self.delegated_forms.items():
+            if variable_name in self.bound_forms:
+                context[variable_name] = self.bound_forms[variable_name]
             else:
                 context[variable_name] = form(vehicle=self.object)
 
-        try:
-            current_trip = self.object.trip_set.get(finished=False)
+        if self.object.current_trips:
+            current_trip = self.object.current_trips[0]
             initial: dict[str, typing.Any] = {
                 "starting_mileage": current_trip.starting_mileage,
                 "starting_time": current_trip.starting_time,
@@ -60,7 +188,7 @@ class VehicleDetailView(DetailView):
             context["trip_end_form"].instance.vehicle = self.object
             context["trip_started"] = True
 
-        except models.Trip.DoesNotExist:
+        else:
             # Pas de trajet en cours
             if context["trip_start_form"].is_bound:
                 context["trip_start_form"].fields["force_validation"] = BooleanField(
@@ -70,35 +198,28 @@ class VehicleDetailView(DetailView):
             context["trip_start_form"].instance.vehicle = self.object
             context["trip_started"] = False
 
-        except models.Trip.MultipleObjectsReturned:
-            raise models.Trip.MultipleObjectsReturned(
-                _(
-                    "Corruption de la base de données : plusieurs trajets sont en cours !"
-                )
-            )
-
-        try:
-            context["last_trip_distance"] = (
-                self.object.trip_set.filter(finished=True)
-                .latest("ending_time")
-                .distance
-            )
-        except models.Trip.DoesNotExist:
-            pass
+        context["last_trip_distance"] = self.object.last_trip_distance
 
         return context
 
 
-class DelegationCreationView(CreateView):
+class VehicleMixin:
+    kwargs: dict[str, typing.Any]
+
+    def get_vehicle(self) -> models.Vehicle:
+        # Loaded once, before the transaction saving the form
+        if not hasattr(self, "vehicle"):
+            self.vehicle = django.shortcuts.get_object_or_404(
+                models.Vehicle, pk=self.kwargs.get("pk")
+            )
+        return self.vehicle
+
+
+class DelegationCreationView(VehicleMixin, CreateView):
     http_method_names = ["post"]
     success_message = ""
     variable_name = ""
 
-    def get_vehicle(self):
-        return django.shortcuts.get_object_or_404(
-            models.Vehicle, pk=self.kwargs.get("pk")
-        )
-
     def post(self, request: django.http.HttpRequest, *args, **kwargs):
         form = self.form_class(request.POST, vehicle=self.get_vehicle())
         form.instance.vehicle = self.get_vehicle()
@@ -109,8 +230,8 @@ class DelegationCreationView(CreateView):
             return self.form_invalid(form)
 
     def form_valid(self, form):
-        form.instance.vehicle = self.get_vehicle()
-        form.save()
+        self.save_form(form)
+        # Once committed, a retried transaction would queue it twice
         messages.info(self.request, self.success_message)
         return django.http.HttpResponseRedirect(
             django.urls.reverse_lazy(
@@ -118,12 +239,14 @@ class DelegationCreationView(CreateView):
             )
         )
 
+    @retry_on_database_lock
+    def save_form(self, form):
+        form.instance.vehicle = self.get_vehicle()
+        form.save()
+
     def form_invalid(self, form):
-        self.request.session[self.variable_name] = form.data
-        return django.http.HttpResponseRedirect(
-            django.urls.reverse_lazy(
-                "vehicle_details", kwargs={"pk": self.kwargs.get("pk")}
-            )
+        return VehicleDetailView.render_invalid_form(
+            self.request, self.kwargs.get("pk"), self.variable_name, form
         )
 
 
@@ -145,33 +268,24 @@ class TripStartFormView(DelegationCreationView):
     success_message = _("Début du trajet enregistré")
 
     def form_valid(self, form):
-        vehicle = self.get_vehicle()
-
-        if vehicle.trip_set.filter(finished=False).count() > 0:
-            messages.error(
-                self.request,
-                _(f"Un trajet est déjà en cours !"),
-            )
+        try:
+            # Only one unfinished trip per vehicle is allowed by the database,
+            # the transaction saving it is rolled back
+            return super().form_valid(form)
+        except IntegrityError:
+            messages.error(self.request, _("Un trajet est déjà en cours !"))
             return django.http.HttpResponseRedirect(
                 django.urls.reverse_lazy(
                     "vehicle_details", kwargs={"pk": self.kwargs.get("pk")}
                 )
             )
 
-        else:
-            return super().form_valid(form)
-
 
-class TripEndFormView(UpdateView):
+class TripEndFormView(VehicleMixin, UpdateView):
     http_method_names = ["post"]
     model = models.Trip
     form_class = forms.TripEndForm
 
-    def get_vehicle(self):
-        return django.shortcuts.get_object_or_404(
-            models.Vehicle, pk=self.kwargs.get("pk")
-        )
-
     def get_object(self, queryset=None):
         vehicle = self.get_vehicle()
 
@@ -183,15 +297,7 @@ class TripEndFormView(UpdateView):
             ...
 
     def form_valid(self, form):
-        if not form.cleaned_data["update_initial"]:
-            form.instance.starting_mileage = form.initial["starting_mileage"]
-            form.instance.starting_time = form.initial["starting_time"]
-            form.instance.purpose = form.initial["purpose"]
-            form.instance.driver_name = form.initial["driver_name"]
-
-        form.instance.finished = True
-
-        form.save()
+        self.save_form(form)
 
         distance = form.instance.ending_mileage - form.initial["starting_mileage"]
 
@@ -207,32 +313,34 @@ class TripEndFormView(UpdateView):
             )
         )
 
+    @retry_on_database_lock
+    def save_form(self, form):
+        if not form.cleaned_data["update_initial"]:
+            form.instance.starting_mileage = form.initial["starting_mileage"]
+            form.instance.starting_time = form.initial["starting_time"]
+            form.instance.purpose = form.initial["purpose"]
+            form.instance.driver_name = form.initial["driver_name"]
+
+        form.instance.finished = True
+
+        form.save()
+
     def form_invalid(self, form):
-        self.request.session["trip_end_form"] = form.data
-        return django.http.HttpResponseRedirect(
-            django.urls.reverse_lazy(
-                "vehicle_details", kwargs={"pk": self.kwargs.get("pk")}
-            )
+        return VehicleDetailView.render_invalid_form(
+            self.request, self.kwargs.get("pk"), "trip_end_form", form
         )
 
 
-class TripAbortFormView(UpdateView):
+class TripAbortFormView(VehicleMixin, UpdateView):
     http_method_names = ["post"]
     model = models.Trip
     form_class = forms.TripEndForm
 
-    def get_vehicle(self):
-        return django.shortcuts.get_object_or_404(
-            models.Vehicle, pk=self.kwargs.get("pk")
-        )
-
     def post(self, request, *args, **kwargs):
         vehicle = self.get_vehicle()
 
         try:
-            current_trip = vehicle.trip_set.get(finished=False)
-            current_trip.finished = True
-            current_trip.save()
+            self.abort_trip(vehicle)
 
             messages.info(self.request, _("Le trajet a été abandonné"))
 
@@ -246,3 +354,9 @@ class TripAbortFormView(UpdateView):
             ...
         except models.Trip.MultipleObjectsReturned:
             ...
+
+    @retry_on_database_lock
+    def abort_trip(self, vehicle: models.Vehicle):
+        current_trip = vehicle.trip_set.get(finished=False)
+        current_trip.finished = True
+        current_trip.save()
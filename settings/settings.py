@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import copy
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -70,6 +72,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "settings.wsgi.application"
 
+# Serve the public vehicle pages with async views, when running on ASGI
+# workers (see entrypoint.sh)
+CARBON_ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "") == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -87,6 +93,136 @@ DATABASES = {
     }
 }
 
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Tuning of the production database, see the README. WAL lets the pages
+    # be read while a trip is written, and writers wait for each other.
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.environ.get("DJANGO_SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("DJANGO_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": os.environ.get("DJANGO_SQLITE_BUSY_TIMEOUT", "5000"),
+        "mmap_size": os.environ.get("DJANGO_SQLITE_MMAP_SIZE", "134217728"),
+        "temp_store": os.environ.get("DJANGO_SQLITE_TEMP_STORE", "MEMORY"),
+    }
+    DATABASES["default"]["OPTIONS"] = {
+        "init_command": ";".join(
+            f"PRAGMA {name} = {value}"
+            for name, value in SQLITE_PRAGMAS.items()
+            if value
+        ),
+        # Writers take the lock when their transaction begins, waiting for it
+        # up to busy_timeout, rather than failing to upgrade a read lock
+        "transaction_mode": os.environ.get(
+            "DJANGO_SQLITE_TRANSACTION_MODE", "IMMEDIATE"
+        ),
+    }
+
+    # Tested on a file rather than in memory, so that concurrent connections
+    # wait for each other's locks like on the real database
+    DATABASES["default"]["TEST"] = {
+        "NAME": Path(tempfile.gettempdir()) / "carbon_test.sqlite3"
+    }
+
+
+if os.environ.get("DJANGO_DATABASE_POOL", "") == "1":
+    # psycopg's pool, shared by the threads of each worker process, see
+    # https://docs.djangoproject.com/en/5.2/ref/databases/#connection-pool
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": int(os.environ.get("DJANGO_DATABASE_POOL_MIN_SIZE", 2)),
+        "max_size": int(os.environ.get("DJANGO_DATABASE_POOL_MAX_SIZE", 10)),
+        "timeout": float(os.environ.get("DJANGO_DATABASE_POOL_TIMEOUT", 30)),
+    }
+
+# Connections kept open between the requests of a worker, see
+# https://docs.djangoproject.com/en/5.2/ref/databases/#persistent-connections
+# The async views do not close their connections in the thread which opened
+# them: with ASGI workers, only a pool reuses connections safely.
+DATABASES["default"]["CONN_MAX_AGE"] = int(
+    os.environ.get(
+        "DJANGO_DATABASE_CONN_MAX_AGE",
+        (
+            0
+            if CARBON_ASYNC_VIEWS or "pool" in DATABASES["default"].get("OPTIONS", {})
+            else 60
+        ),
+    )
+)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = (
+    os.environ.get("DJANGO_DATABASE_CONN_HEALTH_CHECKS", "1") == "1"
+)
+
+
+# Optional read-only replica of the primary, for the reporting queries and the
+# administration lists (see main/routers.py). Its settings default to the
+# primary's.
+REPLICA_SETTINGS = {
+    key: os.environ.get(f"DJANGO_DATABASE_REPLICA_{key}", "")
+    for key in ("HOST", "PORT", "NAME", "USER", "PASSWORD")
+}
+if any(REPLICA_SETTINGS.values()):
+    DATABASES["replica"] = copy.deepcopy(DATABASES["default"])
+    DATABASES["replica"].update(
+        {key: value for key, value in REPLICA_SETTINGS.items() if value}
+    )
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["main.routers.ReplicaRouter"]
+
+
+# Writes failing on a locked database are run again, this many times, after
+# an exponential delay starting at this many seconds
+CARBON_DATABASE_LOCK_RETRIES = int(os.environ.get("DJANGO_DATABASE_LOCK_RETRIES", 3))
+CARBON_DATABASE_LOCK_BACKOFF = float(
+    os.environ.get("DJANGO_DATABASE_LOCK_BACKOFF", 0.1)
+)
+
+
+# Finished trips older than this many days are moved to the archive by the
+# archive_trips command, except the latest ones of each vehicle
+CARBON_TRIP_ARCHIVE_DAYS = int(os.environ.get("DJANGO_TRIP_ARCHIVE_DAYS", 365))
+CARBON_TRIP_ARCHIVE_KEEP = int(os.environ.get("DJANGO_TRIP_ARCHIVE_KEEP", 10))
+
+
+# Seconds during which a process serves the settings from its memory without
+# checking whether another process modified them
+CARBON_SETTINGS_CHECK_INTERVAL = float(
+    os.environ.get("DJANGO_SETTINGS_CHECK_INTERVAL", 5)
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Shared by the processes by default: the version stamps of the settings and
+# of the vehicle pages are bumped by the web workers and read by the daemons
+# of entrypoint.sh as well
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", BASE_DIR / "data/cache"),
+    },
+    # QR codes of the vehicle labels, which never expire: kept apart from the
+    # versions and fragments of the pages, whose writes would cull them
+    "qr_codes": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "DJANGO_QR_CODE_CACHE_LOCATION", BASE_DIR / "data/qr_codes"
+        ),
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("DJANGO_QR_CODE_CACHE_MAX_ENTRIES", 10000)
+            ),
+        },
+    },
+}
+
+
+# Run with caches of their own, see main/tests/runner.py
+TEST_RUNNER = "main.tests.runner.TestRunner"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -125,6 +261,15 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = "./static"
 
+# Generated files, such as the label sheets, downloaded from the administration
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "data/media"
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 